@@ -1,8 +1,12 @@
 import sqlite3
+from typing import Optional
 
 
 class Database:
 
+    def __init__(self, path: str = 'database.db'):
+        self._path = path
+
     def get_link(self, **kwargs) -> list:
         self._open_connection()
         params = []
@@ -95,8 +99,101 @@ class Database:
         self._connection.commit()
         self._close_connection()
 
+    def create_key_pool_table(self):
+        self._open_connection()
+        self._cursor.execute('''
+            CREATE TABLE IF NOT EXISTS key_pool (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                public_key BLOB NOT NULL,
+                private_key BLOB NOT NULL
+            )
+        ''')
+        self._cursor.execute('''
+            CREATE TABLE IF NOT EXISTS key_pool_refill (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                started REAL NOT NULL,
+                finished REAL,
+                generated INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        self._connection.commit()
+        self._close_connection()
+
+    def start_pool_refill(self, started: float) -> int:
+        """ Record a refill of the key pool started at the given time (seconds since the epoch), return its id """
+        self._open_connection()
+        self._cursor.execute('''
+            INSERT INTO key_pool_refill (started) VALUES (?)
+        ''', (started,))
+        self._connection.commit()
+        refill_id = self._cursor.lastrowid
+        self._close_connection()
+        return refill_id
+
+    def add_pool_key(self, public_key: bytes, private_key: bytes, refill_id: Optional[int] = None,
+                     added: Optional[float] = None):
+        """ Add a keypair to the pool, counting it for the refill with refill_id (if given) at the time added """
+        self._open_connection()
+        self._cursor.execute('''
+            INSERT INTO key_pool (public_key, private_key) VALUES (?, ?)
+        ''', (public_key, private_key,))
+        if refill_id is not None:
+            self._cursor.execute('''
+                UPDATE key_pool_refill SET generated = generated + 1, finished = ? WHERE id = ?
+            ''', (added, refill_id,))
+        self._connection.commit()
+        self._close_connection()
+
+    def get_pool_refill_totals(self) -> list:
+        """ Return the number of keypairs generated by all refills and the seconds the refills took """
+        self._open_connection()
+        self._cursor.execute('''
+            SELECT COALESCE(SUM(generated), 0), COALESCE(SUM(finished - started), 0)
+            FROM key_pool_refill
+            WHERE finished IS NOT NULL
+        ''')
+        result = self._cursor.fetchone()
+        self._close_connection()
+        return [i for i in result]
+
+    def claim_pool_key(self) -> Optional[list]:
+        """ Remove the oldest keypair from the pool and return it, None if the pool is empty """
+        self._open_connection()
+        # The write lock is taken before reading, so concurrent claims never get the same keypair
+        self._connection.isolation_level = None
+        self._cursor.execute('BEGIN IMMEDIATE')
+        try:
+            self._cursor.execute('''
+                SELECT id, public_key, private_key
+                FROM key_pool
+                ORDER BY id
+                LIMIT 1
+            ''')
+            result = self._cursor.fetchone()
+            if result is not None:
+                self._cursor.execute('''
+                    DELETE FROM key_pool WHERE id = ?
+                ''', (result[0],))
+            self._cursor.execute('COMMIT')
+        except sqlite3.Error:
+            self._cursor.execute('ROLLBACK')
+            raise
+        finally:
+            self._close_connection()
+        return [i for i in result[1:]] if result is not None else None
+
+    def get_pool_depth(self) -> int:
+        self._open_connection()
+        self._cursor.execute('''
+            SELECT COUNT(*)
+            FROM key_pool
+        ''')
+        result = self._cursor.fetchone()
+        self._close_connection()
+        return result[0]
+
     def _open_connection(self):
-        self._connection = sqlite3.connect('database.db')
+        self._connection = sqlite3.connect(self._path)
         self._cursor = self._connection.cursor()
 
     def _close_connection(self):
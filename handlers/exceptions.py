@@ -26,3 +26,8 @@ class InvalidPassword(Exception):
 class ArgumentNotProvided(Exception):
     def __init__(self, argument: str):
         super().__init__(f'The argument: {argument} has not been provided')
+
+
+class KeyPoolDisabled(Exception):
+    def __init__(self):
+        super().__init__('The key pool is disabled, set the KEY_POOL_PASSWORD environment variable')
@@ -0,0 +1,121 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import partial
+from typing import Optional, Tuple
+
+from cryptography.hazmat.primitives import serialization
+
+from handlers.database import Database
+from models import KeyPoolMetrics
+from steganography.security.encryptors.rsa_encryptor import RsaEncryptor
+
+logger = logging.getLogger(__name__)
+
+
+def _generate_keypair(pool_password: str) -> Tuple[bytes, bytes]:
+    """ Runs in the worker processes, returns the public and the private key encrypted with the pool password """
+    public_key, private_key = RsaEncryptor(password=pool_password, create=True).get_keys()
+    return public_key, private_key
+
+
+class KeyPool:
+    """Pool of pre-generated RSA keypairs, so registering music does not wait for the key generation
+
+    Worker processes started by refill fill the key_pool table of the database up to DEPTH unused keypairs, with the
+    private keys encrypted with the password in the POOL_PASSWORD_VARIABLE environment variable (the refill-pool
+    command of main.py). claim removes one keypair atomically and encrypts its private key with the music password.
+    Without the environment variable, or if the pool is empty, the keypair is generated synchronously as before.
+    """
+
+    DEPTH = 16
+    POOL_PASSWORD_VARIABLE = 'KEY_POOL_PASSWORD'
+
+    def __init__(self, database_path: str = 'database.db', depth: int = DEPTH, max_workers: Optional[int] = None):
+        # The keypairs are added from a callback thread, which uses its own Database (connection)
+        self._database_path = database_path
+        self._database = Database(database_path)
+        self._depth = depth
+        self._max_workers = max_workers
+        self._pool_password = os.environ.get(self.POOL_PASSWORD_VARIABLE)
+        self._executor = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        if self.enabled:
+            self._database.create_key_pool_table()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._pool_password)
+
+    def claim(self, password: str) -> Tuple[bytes, bytes]:
+        """ Return a public key and a private key encrypted with password, taken from the pool if possible """
+        keypair = self._database.claim_pool_key() if self.enabled else None
+        if keypair is None:
+            logger.info('The key pool is empty, generating a keypair')
+            return RsaEncryptor(password=password, create=True).get_keys()
+        return keypair[0], self._reencrypt(keypair[1], password)
+
+    def refill(self):
+        """ Start generating the keypairs missing from the pool, shutdown waits for them """
+        if not self.enabled:
+            return
+        with self._lock:
+            missing = self._depth - self._database.get_pool_depth() - self._pending
+            if missing <= 0:
+                return
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self._max_workers)
+            self._pending += missing
+        # The refills are recorded in the database, so the metrics can be read by other processes
+        refill_id = self._database.start_pool_refill(time.time())
+        for _ in range(missing):
+            self._executor.submit(_generate_keypair, self._pool_password).add_done_callback(
+                partial(self._add_keypair, refill_id)
+            )
+
+    def metrics(self) -> KeyPoolMetrics:
+        """ Return the metrics of the pool, the generated keypairs and the refill rate are those of all refills """
+        if not self.enabled:
+            return KeyPoolMetrics(depth=0, target_depth=0, pending=0, generated=0, refill_rate=0.0)
+        with self._lock:
+            pending = self._pending
+        generated, refill_seconds = self._database.get_pool_refill_totals()
+        return KeyPoolMetrics(
+            depth=self._database.get_pool_depth(),
+            target_depth=self._depth,
+            pending=pending,
+            generated=generated,
+            refill_rate=generated / refill_seconds if refill_seconds > 0 else 0.0,
+        )
+
+    def shutdown(self, wait: bool = True):
+        """ Stop the worker processes, by default after the started keypairs have been added to the pool """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=not wait)
+
+    def _add_keypair(self, refill_id: int, future: Future):
+        try:
+            if future.cancelled():
+                return
+            error = future.exception()
+            if error is not None:
+                logger.error('Could not generate a keypair for the key pool', exc_info=error)
+                return
+            Database(self._database_path).add_pool_key(*future.result(), refill_id, time.time())
+        finally:
+            with self._lock:
+                self._pending -= 1
+        logger.debug('Added a keypair to the key pool: %s', self.metrics())
+
+    def _reencrypt(self, private_key: bytes, password: str) -> bytes:
+        key = serialization.load_pem_private_key(private_key, password=self._pool_password.encode('UTF-8'))
+        return key.private_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PrivateFormat.PKCS8,
+            encryption_algorithm=serialization.BestAvailableEncryption(password.encode('UTF-8'))
+        )
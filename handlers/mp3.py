@@ -1,3 +1,5 @@
+from typing import Optional
+
 from handlers.exceptions import (
     NoDataSpecifiedException,
 )
@@ -7,17 +9,43 @@ from steganography.wav_steganography.wav_file import WAVFile
 
 class AudioFingerprintHandler:
 
-    def __init__(self, path: str = None, private_key: bytes = None, password: str = None):
+    def __init__(
+            self,
+            path: str = None,
+            private_key: bytes = None,
+            password: str = None,
+            scatter: bool = False,
+            music_id: Optional[int] = None,
+    ):
         if path is None or private_key is None or password is None:
             raise NoDataSpecifiedException()
         self._path = path
         self._private_key = private_key
         self._password = password
-        self.wav_file = WAVFile(self._path)
+        self._music_id = music_id
+        self._encryptor = None
+        # Scatter the fingerprint over the file in an order derived from the music key
+        self._scatter_key = private_key if scatter else None
+        self.wav_file = self._open_wav_file(self._path)
+
+    @staticmethod
+    def _open_wav_file(path: str) -> WAVFile:
+        # 24-bit samples cannot be memory-mapped, these files are streamed and only the changed samples are patched
+        wav_file = WAVFile(path, mmap_mode='c')
+        if wav_file.header["BitsPerSample"] == 24:
+            return WAVFile(path, stream=True)
+        return wav_file
+
+    def _get_encryptor(self) -> RsaEncryptor:
+        # Loading the private key decrypts it with the password, so it is done once per handler
+        if self._encryptor is None:
+            self._encryptor = RsaEncryptor(
+                password=self._password, private_key=self._private_key, music_id=self._music_id
+            )
+        return self._encryptor
 
     def read_fingerprint(self):
-        encryptor = RsaEncryptor(password=self._password, private_key=self._private_key)
-        return self.wav_file.decode(encryptor).decode('UTF-8')
+        return self.wav_file.decode(self._get_encryptor(), scatter_key=self._scatter_key).decode('UTF-8')
 
     def _is_exists(self, fingerprint: str) -> bool:
         return bool(fingerprint == self.read_fingerprint())
@@ -25,13 +53,13 @@ class AudioFingerprintHandler:
     def set_fingerprint(self, fingerprint: str):
         # if self._is_exists(fingerprint):
         #     raise FingerprintAlreadyExists()
-        encryptor = RsaEncryptor(password=self._password, private_key=self._private_key)
         self.wav_file.encode(
             bytes(fingerprint, "utf-8"),
             least_significant_bits=2,
             redundant_bits=8,
             every_nth_byte=4,
-            encryptor=encryptor,
+            encryptor=self._get_encryptor(),
             repeat_data=False,
+            scatter_key=self._scatter_key,
         )
-        self.wav_file.write(filename=self._path, overwrite=True)
+        self.wav_file.write(filename=self._path, overwrite=True, patch=True)
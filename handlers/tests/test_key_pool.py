@@ -0,0 +1,59 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from cryptography.hazmat.primitives import serialization
+
+from handlers.database import Database
+from handlers.key_pool import KeyPool
+
+
+def test_concurrent_key_pool_claims(tmp_path):
+    database = Database(str(tmp_path / "database.db"))
+    database.create_key_pool_table()
+    keypairs = [(f"public {i}".encode(), f"private {i}".encode()) for i in range(50)]
+    for keypair in keypairs:
+        database.add_pool_key(*keypair)
+
+    # Every claim uses its own connection, as the claims of different processes would
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        claimed = list(executor.map(lambda _: Database(str(tmp_path / "database.db")).claim_pool_key(), range(60)))
+    claimed_keypairs = [tuple(keypair) for keypair in claimed if keypair is not None]
+    assert sorted(claimed_keypairs) == sorted(keypairs)
+    assert claimed.count(None) == 10
+    assert database.get_pool_depth() == 0
+
+
+def test_key_pool_claim(tmp_path, monkeypatch):
+    monkeypatch.setenv(KeyPool.POOL_PASSWORD_VARIABLE, "pool password")
+    key_pool = KeyPool(str(tmp_path / "database.db"), depth=1)
+
+    # An empty pool falls back to generating the keypair, without starting the worker processes
+    public_key, private_key = key_pool.claim("password")
+    serialization.load_pem_private_key(private_key, password=b"password")
+    assert key_pool.metrics().depth == 0 and key_pool._executor is None
+
+    key_pool.refill()
+    key_pool.shutdown()
+    assert key_pool.metrics().depth == 1 and key_pool.metrics().generated == 1
+    pooled_public_key, pooled_private_key = key_pool.claim("password")
+    assert pooled_public_key != public_key
+    serialization.load_pem_private_key(pooled_private_key, password=b"password")
+    assert key_pool.metrics().depth == 0
+
+
+def test_key_pool_metrics_of_other_processes(tmp_path, monkeypatch):
+    monkeypatch.setenv(KeyPool.POOL_PASSWORD_VARIABLE, "pool password")
+    database_path = str(tmp_path / "database.db")
+    key_pool = KeyPool(database_path, depth=2)
+    key_pool.refill()
+    key_pool.shutdown()
+
+    # e.g. the pool-metrics command of main.py, run after the refill-pool command
+    metrics = KeyPool(database_path, depth=2).metrics()
+    assert (metrics.depth, metrics.target_depth, metrics.pending, metrics.generated) == (2, 2, 0, 2)
+    assert metrics.refill_rate > 0
+
+    KeyPool(database_path, depth=2).claim("password")
+    key_pool = KeyPool(database_path, depth=2)
+    key_pool.refill()
+    key_pool.shutdown()
+    assert KeyPool(database_path, depth=2).metrics().generated == 3
@@ -4,9 +4,9 @@ from pathlib import Path
 
 from handlers.database import Database
 from handlers.exceptions import *
+from handlers.key_pool import KeyPool
 from handlers.mp3 import AudioFingerprintHandler
 from models import Music, Person
-from steganography.security.encryptors.rsa_encryptor import RsaEncryptor
 
 
 class ArgumentsHandler(ArgumentParser):
@@ -15,15 +15,15 @@ class ArgumentsHandler(ArgumentParser):
         self.add_argument(
             'action',
             type=str,
-            help='action type (encode, decode)',
+            help='action type (encode, decode, refill-pool, pool-metrics)',
             default='encode'
         )
         self.add_argument(
             '--wav',
             type=str,
-            help='WAV file path',
+            help='WAV file path (required for encode and decode)',
             default=None,
-            required=True
+            required=False
         )
         self.add_argument(
             '--password',
@@ -47,9 +47,18 @@ class ArgumentsHandler(ArgumentParser):
             required=False
         )
         self._database = Database()
+        self._key_pool = KeyPool()
         self._arguments = self.parse_args()
 
     def handle_args(self):
+        if self._arguments.action == 'refill-pool':
+            self._handle_refill_pool()
+            return
+        if self._arguments.action == 'pool-metrics':
+            self._print_pool_metrics()
+            return
+        if self._arguments.wav is None:
+            raise ArgumentNotProvided('--wav')
         filename = self._check_file(self._arguments.wav)
         if self._arguments.action == 'encode':
             self._handle_encode(filename)
@@ -64,7 +73,8 @@ class ArgumentsHandler(ArgumentParser):
         audio_handler = AudioFingerprintHandler(
             path=self._arguments.wav,
             private_key=music.private_key,
-            password=self._arguments.password
+            password=self._arguments.password,
+            music_id=music.id,
         )
         self._get_or_create_link(audio_handler, person, music)
 
@@ -73,12 +83,26 @@ class ArgumentsHandler(ArgumentParser):
         audio_handler = AudioFingerprintHandler(
             path=self._arguments.wav,
             private_key=music.private_key,
-            password=self._arguments.password
+            password=self._arguments.password,
+            music_id=music.id,
         )
         result = self._database.get_person(audio_handler.read_fingerprint())
         person = Person(id=result[0], full_name=result[1], passport=result[2], hash=result[3])
         print(f'The owner information:\n\tFull name: {person.full_name}\n\tPassport: {person.passport}\n')
 
+    def _handle_refill_pool(self):
+        if not self._key_pool.enabled:
+            raise KeyPoolDisabled()
+        self._key_pool.refill()
+        # Waits until the missing keypairs have been generated and added
+        self._key_pool.shutdown()
+        self._print_pool_metrics()
+
+    def _print_pool_metrics(self):
+        metrics = self._key_pool.metrics()
+        print(f'Key pool:\n\tKeypairs: {metrics.depth}/{metrics.target_depth}\n\tGenerating: {metrics.pending}'
+              f'\n\tGenerated: {metrics.generated} ({metrics.refill_rate:.2f}/s)\n')
+
     def _get_or_create_link(self, audio_handler, person, music):
         if not self._database.is_link_exists(person.full_name, person.passport, music.name):
             audio_handler.set_fingerprint(person.hash)
@@ -109,7 +133,7 @@ class ArgumentsHandler(ArgumentParser):
         return Music(id=result[0], name=result[1], password=result[2], public_key=result[3], private_key=result[4])
 
     def _create_music(self, filename):
-        public_key, private_key = RsaEncryptor(password=self._arguments.password, create=True).get_keys()
+        public_key, private_key = self._key_pool.claim(self._arguments.password)
         password = hashlib.sha256(self._arguments.password.encode()).hexdigest()
         return self._database.add_music(
             name=filename, password=password, public_key=public_key, private_key=private_key
@@ -16,3 +16,13 @@ class Person:
     full_name: str
     passport: str
     hash: str
+
+
+@dataclass
+class KeyPoolMetrics:
+    depth: int
+    target_depth: int
+    pending: int
+    generated: int
+    # Keypairs added to the pool per second of refilling, over all refills recorded in the database
+    refill_rate: float
@@ -0,0 +1,54 @@
+import struct
+import time
+from pathlib import Path
+from typing import Callable, Tuple
+
+import numpy as np
+
+from steganography.wav_steganography.int24 import Int24
+from steganography.wav_steganography.wav_file import WAVFile
+
+SAMPLE_FORMATS = {
+    "16-bit PCM": (16, WAVFile.WAVE_FORMAT_PCM),
+    "24-bit PCM": (24, WAVFile.WAVE_FORMAT_PCM),
+    "32-bit float": (32, WAVFile.WAVE_FORMAT_IEEE_FLOAT),
+}
+
+
+def create_wav_file(
+        file_path: Path,
+        seconds: float,
+        bits_per_sample: int = 16,
+        audio_format: int = WAVFile.WAVE_FORMAT_PCM,
+        num_channels: int = 2,
+        sample_rate: int = 44100,
+) -> Path:
+    """ Write a WAV file with a noisy sine wave of the given length and sample format """
+    sample_count = int(seconds * sample_rate) * num_channels
+    signal = np.sin(np.arange(sample_count) / 50) * 0.5 + np.random.uniform(-0.01, 0.01, sample_count)
+    if audio_format == WAVFile.WAVE_FORMAT_IEEE_FLOAT:
+        raw_samples = signal.astype("<f4").tobytes()
+    elif bits_per_sample == 24:
+        raw_samples = Int24.pack((signal * 2 ** 23).astype(np.int32)).tobytes()
+    else:
+        raw_samples = (signal * 2 ** (bits_per_sample - 1)).astype(f"<i{bits_per_sample // 8}").tobytes()
+
+    block_align = num_channels * bits_per_sample // 8
+    fmt = struct.pack("<HHIIHH", audio_format, num_channels, sample_rate, sample_rate * block_align, block_align,
+                      bits_per_sample)
+    chunks = struct.pack("<4sI", b"fmt ", len(fmt)) + fmt + struct.pack("<4sI", b"data", len(raw_samples))
+    file_path.write_bytes(b"RIFF" + struct.pack("<I", len(chunks) + len(raw_samples) + 4) + b"WAVE" + chunks)
+    with open(file_path, "ab") as file:
+        file.write(raw_samples)
+    return file_path
+
+
+def measure(function: Callable, repeat: int = 3) -> Tuple[float, object]:
+    """ Returns the best time in seconds out of repeat runs and the result of the last run """
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
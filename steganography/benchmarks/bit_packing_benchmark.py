@@ -0,0 +1,65 @@
+import os
+import textwrap
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+import numpy as np
+
+from steganography.benchmarks.benchmark_utils import create_wav_file, measure
+from steganography.wav_steganography.bit_packing import BitPacking
+from steganography.wav_steganography.data_chunk import DataChunk
+from steganography.wav_steganography.wav_file import WAVFile
+
+PAYLOAD_BYTES = 2 ** 18
+# textwrap scales badly with the input length, time the legacy version on a slice and extrapolate
+LEGACY_PAYLOAD_BYTES = 2 ** 12
+LEAST_SIGNIFICANT_BITS = [1, 2, 3, 8, 13, 16]
+
+
+def legacy_bytes_to_symbols(data: bytes, bits_per_symbol: int) -> list:
+    """ The string based implementation _write_chunk used before BitPacking, for comparison """
+    binary_data = ''.join(map(lambda b: f"{b:08b}", data))
+    lsb_bits = textwrap.wrap(binary_data, bits_per_symbol)
+    return list(map(lambda b: int(b, 2), lsb_bits))
+
+
+def legacy_symbols_to_bytes(symbols: np.ndarray, bits_per_symbol: int, byte_count: int) -> bytes:
+    """ The string based implementation _get_bytes used before BitPacking, for comparison """
+    divisor, remainder = divmod(byte_count * 8, bits_per_symbol)
+    ones = np.full(divisor + (remainder != 0), 2 ** bits_per_symbol - 1, dtype=symbols.dtype)
+    if remainder > 0:
+        ones[-1] = 2 ** remainder - 1
+    relevant_bits = symbols[:len(ones)] & ones
+    bits_to_format = np.log2(ones.astype(np.float64) + 1).astype(int)
+    bits_as_str = ''.join(f"{data:0{format_bits}b}" for data, format_bits in zip(relevant_bits, bits_to_format))
+    return bytes(map(lambda b: int(b, 2), textwrap.wrap(bits_as_str, 8)))
+
+
+def main():
+    data = os.urandom(PAYLOAD_BYTES)
+    megabytes = PAYLOAD_BYTES / 2 ** 20
+    scale = PAYLOAD_BYTES / LEGACY_PAYLOAD_BYTES
+    with TemporaryDirectory() as tmp_dir:
+        wav_file = WAVFile(create_wav_file(Path(tmp_dir) / "benchmark.wav", seconds=60))
+        wav_file.data  # load the samples before measuring
+
+        print(f"Embedding and extracting {PAYLOAD_BYTES} bytes, throughput in MB of payload per second")
+        for lsb in LEAST_SIGNIFICANT_BITS:
+            legacy_time, _ = measure(lambda: legacy_bytes_to_symbols(data[:LEGACY_PAYLOAD_BYTES], lsb), repeat=1)
+            symbols_time, _ = measure(lambda: BitPacking.bytes_to_symbols(data, lsb))
+            amplitudes = slice(0, -(-PAYLOAD_BYTES * 8 // lsb), 1)
+            embed_time, _ = measure(lambda: wav_file._write_symbols(DataChunk(data, lsb, 1), amplitudes))
+            print(f"lsb={lsb:2d}: symbols before {megabytes / (legacy_time * scale):7.1f} MB/s, "
+                  f"after {megabytes / symbols_time:7.1f} MB/s, embedding {megabytes / embed_time:7.1f} MB/s")
+
+            symbols = wav_file._get_sample_bits()
+            legacy_time, _ = measure(lambda: legacy_symbols_to_bytes(symbols, lsb, LEGACY_PAYLOAD_BYTES), repeat=1)
+            bytes_time, _ = measure(lambda: BitPacking.symbols_to_bytes(symbols, lsb, PAYLOAD_BYTES))
+            extract_time, extracted = measure(lambda: wav_file._read_bytes(amplitudes, lsb, PAYLOAD_BYTES))
+            assert extracted == data
+            print(f"        bytes before {megabytes / (legacy_time * scale):7.1f} MB/s, "
+                  f"after {megabytes / bytes_time:7.1f} MB/s, extracting {megabytes / extract_time:7.1f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
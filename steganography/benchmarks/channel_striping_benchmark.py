@@ -0,0 +1,38 @@
+import os
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from steganography.benchmarks.benchmark_utils import create_wav_file, measure
+from steganography.error_correction.none_error_correction import NoneErrorCorrection
+from steganography.wav_steganography.embedding_layout import EmbeddingLayout
+from steganography.wav_steganography.wav_file import WAVFile
+
+SECONDS = 60
+CHANNELS = [2, 6, 8]
+PAYLOAD_BYTES = 2 ** 21
+LEAST_SIGNIFICANT_BITS = 4
+
+
+def main():
+    print(f"Embedding and extracting {PAYLOAD_BYTES} bytes in {SECONDS} s files, contiguous vs. channel striped")
+    data = os.urandom(PAYLOAD_BYTES)
+    with TemporaryDirectory() as tmp_dir:
+        for num_channels in CHANNELS:
+            file_path = create_wav_file(Path(tmp_dir) / f"{num_channels}.wav", SECONDS, num_channels=num_channels)
+            times = []
+            for layout in EmbeddingLayout:
+                wav_file = WAVFile(file_path)
+                wav_file.data  # load the samples before measuring
+                encode_time, _ = measure(lambda: wav_file.encode(
+                    data, LEAST_SIGNIFICANT_BITS, error_correction=NoneErrorCorrection(), verify="none", layout=layout
+                ))
+                decode_time, _ = measure(lambda: wav_file.decode(error_correction=NoneErrorCorrection()))
+                times.append((encode_time, decode_time))
+
+            (contiguous_encode, contiguous_decode), (striped_encode, striped_decode) = times
+            print(f"{num_channels} channels: encode {contiguous_encode * 1000:6.1f} ms -> "
+                  f"{striped_encode * 1000:6.1f} ms, decode {contiguous_decode * 1000:6.1f} ms -> {striped_decode * 1000:6.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+import os
+
+from steganography.benchmarks.benchmark_utils import measure
+from steganography.error_correction.hamming_error_correction import HammingErrorCorrection
+
+PAYLOAD_BYTES = [2 ** 10, 2 ** 16, 2 ** 20, 2 ** 24]
+
+
+def main():
+    print("Hamming(12,8) throughput in MB of payload per second")
+    table_time, _ = measure(HammingErrorCorrection._get_tables.__wrapped__, repeat=1)
+    print(f"Building the lookup tables (once per process): {table_time * 1000:.1f} ms")
+
+    for payload_bytes in PAYLOAD_BYTES:
+        data = os.urandom(payload_bytes)
+        megabytes = payload_bytes / 2 ** 20
+        encode_time, encoded = measure(lambda: HammingErrorCorrection.encode(data, 4))
+
+        # Flip one bit in every codeword, so that every codeword has to be corrected
+        corrupted = bytearray(encoded)
+        for index in range(0, len(corrupted) - 2, 3):
+            corrupted[index] ^= 0x10
+            corrupted[index + 2] ^= 0x01
+        decode_time, decoded = measure(lambda: HammingErrorCorrection.decode(bytes(corrupted), 4))
+        assert decoded == data
+
+        print(f"{payload_bytes:9d} bytes: encoding {megabytes / encode_time:7.1f} MB/s, "
+              f"decoding with corrections {megabytes / decode_time:7.1f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import os
+import random
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from reedsolo import ReedSolomonError
+
+from steganography.benchmarks.benchmark_utils import create_wav_file, measure
+from steganography.error_correction.reed_solomon_error_correction import ReedSolomonErrorCorrection
+from steganography.wav_steganography.block_interleaver import BlockInterleaver
+from steganography.wav_steganography.message import Message
+from steganography.wav_steganography.wav_file import WAVFile
+
+PAYLOAD_BYTES = 2 ** 12
+REDUNDANT_BITS = 8
+LEAST_SIGNIFICANT_BITS = 2
+BURST_BYTES = [64, 128, 512, 2048]
+TRIALS = 5
+THROUGHPUT_BYTES = 2 ** 24
+
+
+def main():
+    encoded_size = ReedSolomonErrorCorrection.encoded_size(PAYLOAD_BYTES, REDUNDANT_BITS)
+    chunk_count = -(-encoded_size // ReedSolomonErrorCorrection.REED_SOLOMON_CHUNK_SIZE)
+    depths = [1, 4, 16, chunk_count]
+    amplitudes_per_byte = 8 // LEAST_SIGNIFICANT_BITS
+    data_start = Message.header_byte_size(ReedSolomonErrorCorrection()) * 8
+
+    print(f"Decoding {PAYLOAD_BYTES} bytes ({chunk_count} Reed Solomon chunks) after a dropout of the amplitudes "
+          f"of a number of bytes, success rate of {TRIALS} random dropouts per depth")
+    print("burst bytes " + "".join(f"{f'depth {depth}':>10s}" for depth in depths))
+    random.seed(0)
+    data = os.urandom(PAYLOAD_BYTES)
+    with TemporaryDirectory() as tmp_dir:
+        wav_file = WAVFile(create_wav_file(Path(tmp_dir) / "benchmark.wav", seconds=10))
+        original_samples = wav_file.data.copy()
+        encoded_samples = {}
+        for depth in depths:
+            wav_file.data[:] = original_samples
+            wav_file.encode(data, LEAST_SIGNIFICANT_BITS, redundant_bits=REDUNDANT_BITS, interleave_depth=depth,
+                            verify="none")
+            encoded_samples[depth] = wav_file.data.copy()
+
+        for burst_bytes in BURST_BYTES:
+            burst_amplitudes = burst_bytes * amplitudes_per_byte
+            rates = []
+            for depth in depths:
+                successes = 0
+                for _ in range(TRIALS):
+                    wav_file.data[:] = encoded_samples[depth]
+                    burst_start = data_start + random.randrange(encoded_size * amplitudes_per_byte - burst_amplitudes)
+                    wav_file.data[burst_start:burst_start + burst_amplitudes] = 0
+                    try:
+                        successes += wav_file.decode() == data
+                    except (ReedSolomonError, UnicodeDecodeError, ValueError):
+                        pass
+                rates.append(successes / TRIALS)
+            print(f"{burst_bytes:11d} " + "".join(f"{rate:10.0%}" for rate in rates))
+
+    data = os.urandom(THROUGHPUT_BYTES)
+    megabytes = THROUGHPUT_BYTES / 2 ** 20
+    print(f"Interleaving {THROUGHPUT_BYTES} bytes, throughput in MB per second")
+    for depth in depths[1:]:
+        interleaved_time, interleaved = measure(lambda: BlockInterleaver.interleave(data, depth))
+        deinterleaved_time, _ = measure(lambda: BlockInterleaver.deinterleave(interleaved, depth))
+        print(f"depth {depth:3d}: interleaving {megabytes / interleaved_time:7.1f} MB/s, "
+              f"deinterleaving {megabytes / deinterleaved_time:7.1f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
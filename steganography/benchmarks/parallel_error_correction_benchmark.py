@@ -0,0 +1,60 @@
+import os
+import random
+
+from steganography.benchmarks.benchmark_utils import measure
+from steganography.error_correction.error_correction_pool import ErrorCorrectionPool
+from steganography.error_correction.hamming_error_correction import HammingErrorCorrection
+from steganography.error_correction.reed_solomon_error_correction import ReedSolomonErrorCorrection
+
+PAYLOAD_BYTES = 2 ** 22
+REDUNDANT_BITS = 8
+# One corrupted byte in every nth Reed Solomon chunk
+CORRUPTED_CHUNK_INTERVAL = 64
+# Sizes for comparing the cost of sending data to the workers with the in-process error correction
+OVERHEAD_SIZES = [2 ** 14, 2 ** 16, 2 ** 18, 2 ** 20, 2 ** 22]
+
+
+def measure_overhead():
+    """ Print the round trip of data through two workers next to the in-process error correction time """
+    print(f"Pool overhead (MIN_PARALLEL_SIZE = {ErrorCorrectionPool.MIN_PARALLEL_SIZE}), wall clock time in ms")
+    print("     bytes  pool round trip  Hamming encode  RS encode")
+    ErrorCorrectionPool.MAX_WORKERS = 2
+    ErrorCorrectionPool.map(abs, [0, 1])
+    for size in OVERHEAD_SIZES:
+        data = os.urandom(size)
+        parts = [data[:size // 2], data[size // 2:]]
+        round_trip_time, _ = measure(lambda: ErrorCorrectionPool.map(bytes, parts))
+        hamming_time, _ = measure(lambda: HammingErrorCorrection.encode(data, 4))
+        # in the calling process, as the data is not split
+        rs_time, _ = measure(lambda: [ReedSolomonErrorCorrection.encode(part, REDUNDANT_BITS) for part in parts])
+        print(f"{size:10d} {round_trip_time * 1000:16.2f} {hamming_time * 1000:15.2f} {rs_time * 1000:10.2f}")
+
+
+def main():
+    measure_overhead()
+    worker_counts = sorted({1, 2, 4, os.cpu_count() or 1})
+    print(f"Error correction of {PAYLOAD_BYTES} bytes with {os.cpu_count()} CPUs, wall clock time in s")
+    data = os.urandom(PAYLOAD_BYTES)
+    encoded_reed_solomon = bytearray(ReedSolomonErrorCorrection.encode(data, REDUNDANT_BITS))
+    chunk_size = ReedSolomonErrorCorrection.REED_SOLOMON_CHUNK_SIZE
+    for chunk_start in range(0, len(encoded_reed_solomon), chunk_size * CORRUPTED_CHUNK_INTERVAL):
+        encoded_reed_solomon[chunk_start + random.randrange(chunk_size)] ^= 0xff
+    encoded_reed_solomon = bytes(encoded_reed_solomon)
+
+    print("workers  RS encode  RS decode with errors")
+    for worker_count in worker_counts:
+        ErrorCorrectionPool.MAX_WORKERS = worker_count
+        # start the worker processes before measuring
+        ErrorCorrectionPool.map(abs, list(range(worker_count)))
+
+        rs_encode_time, _ = measure(lambda: ReedSolomonErrorCorrection.encode(data, REDUNDANT_BITS))
+        rs_decode_time, decoded = measure(
+            lambda: ReedSolomonErrorCorrection.decode(encoded_reed_solomon, REDUNDANT_BITS), repeat=1
+        )
+        assert decoded == data
+        print(f"{worker_count:7d} {rs_encode_time:10.3f} {rs_decode_time:22.3f}")
+    ErrorCorrectionPool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import os
+
+from reedsolo import RSCodec
+
+from steganography.benchmarks.benchmark_utils import measure
+from steganography.error_correction.reed_solomon_error_correction import ReedSolomonErrorCorrection
+
+REDUNDANT_BITS = 8
+PAYLOAD_BYTES = [2 ** 10, 2 ** 16, 2 ** 20]
+MESSAGE_COUNT = 256
+LEGACY_BYTES = 2 ** 14
+
+
+def main():
+    ecc_byte_count = ReedSolomonErrorCorrection._get_ecc_byte_count_per_chunk(REDUNDANT_BITS)
+    print(f"Reed-Solomon with {REDUNDANT_BITS} redundant bits ({ecc_byte_count} ecc bytes per chunk), "
+          f"throughput in MB of payload per second")
+
+    codec_time, _ = measure(lambda: RSCodec(ecc_byte_count))
+    header = os.urandom(24)
+    header_time, _ = measure(lambda: ReedSolomonErrorCorrection.decode(
+        ReedSolomonErrorCorrection.encode(header, REDUNDANT_BITS), REDUNDANT_BITS
+    ))
+    print(f"Creating a codec: {codec_time * 1000:.2f} ms, encoding and decoding a header: {header_time * 1000:.2f} ms")
+
+    # reedsolo on its own, on a smaller payload as it is slow
+    data = os.urandom(LEGACY_BYTES)
+    codec = RSCodec(ecc_byte_count)
+    encoded = bytes(codec.encode(data))
+    legacy_encode_time, _ = measure(lambda: codec.encode(data), repeat=1)
+    legacy_decode_time, _ = measure(lambda: codec.decode(encoded), repeat=1)
+    megabytes = LEGACY_BYTES / 2 ** 20
+    print(f"reedsolo:      encoding {megabytes / legacy_encode_time:7.2f} MB/s, "
+          f"decoding {megabytes / legacy_decode_time:7.2f} MB/s")
+
+    for payload_bytes in PAYLOAD_BYTES:
+        data = os.urandom(payload_bytes)
+        megabytes = payload_bytes / 2 ** 20
+        encode_time, encoded = measure(lambda: ReedSolomonErrorCorrection.encode(data, REDUNDANT_BITS))
+        decode_time, _ = measure(lambda: ReedSolomonErrorCorrection.decode(encoded, REDUNDANT_BITS))
+
+        # One corrupted byte in every 16th chunk, which have to be corrected by reedsolo
+        corrupted = bytearray(encoded)
+        corrupted[::255 * 16] = bytes(byte ^ 0xff for byte in corrupted[::255 * 16])
+        corrected_time, decoded = measure(lambda: ReedSolomonErrorCorrection.decode(bytes(corrupted), REDUNDANT_BITS))
+        assert decoded == data
+
+        print(f"{payload_bytes:8d} bytes: encoding {megabytes / encode_time:7.2f} MB/s, "
+              f"decoding {megabytes / decode_time:7.2f} MB/s, with errors {megabytes / corrected_time:7.2f} MB/s")
+
+    messages = [os.urandom(64) for _ in range(MESSAGE_COUNT)]
+    encoded_messages = ReedSolomonErrorCorrection.encode_many(messages, REDUNDANT_BITS)
+    single_time, _ = measure(lambda: [ReedSolomonErrorCorrection.decode(message, REDUNDANT_BITS)
+                                      for message in encoded_messages])
+    batch_time, _ = measure(lambda: ReedSolomonErrorCorrection.decode_many(encoded_messages, REDUNDANT_BITS))
+    print(f"Decoding {MESSAGE_COUNT} headers: one by one {single_time * 1000:.1f} ms, "
+          f"batched {batch_time * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from steganography.benchmarks.benchmark_utils import SAMPLE_FORMATS, create_wav_file, measure
+from steganography.security.utils.hash_utils import HashUtils
+from steganography.wav_steganography.wav_file import WAVFile
+
+SECONDS = 60
+PAYLOAD_BYTES = 20000
+
+
+def benchmark_sample_format(tmp_dir: Path, name: str, bits_per_sample: int, audio_format: int):
+    file_path = create_wav_file(tmp_dir / f"{bits_per_sample}_{audio_format}.wav", SECONDS, bits_per_sample,
+                                audio_format)
+    megabytes = file_path.stat().st_size / 2 ** 20
+    data = HashUtils.get_random_string(PAYLOAD_BYTES).encode("UTF-8")
+
+    load_time, wav_file = measure(lambda: WAVFile(file_path).data)
+    wav_file = WAVFile(file_path)
+    encode_time, _ = measure(lambda: wav_file.encode(data, redundant_bits=8))
+    write_time, _ = measure(lambda: wav_file.write(tmp_dir / "written.wav", overwrite=True))
+    decode_time, _ = measure(lambda: WAVFile(tmp_dir / "written.wav", stream=True).decode())
+
+    print(f"{name:>12}: load {megabytes / load_time:8.1f} MB/s, write {megabytes / write_time:8.1f} MB/s, "
+          f"encode {encode_time * 1000:7.1f} ms, streamed decode {decode_time * 1000:7.1f} ms")
+
+
+def main():
+    print(f"{SECONDS} s stereo files, {PAYLOAD_BYTES} bytes payload")
+    with TemporaryDirectory() as tmp_dir:
+        for name, (bits_per_sample, audio_format) in SAMPLE_FORMATS.items():
+            benchmark_sample_format(Path(tmp_dir), name, bits_per_sample, audio_format)
+
+
+if __name__ == "__main__":
+    main()
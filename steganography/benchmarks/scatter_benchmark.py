@@ -0,0 +1,44 @@
+import os
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from steganography.benchmarks.benchmark_utils import create_wav_file, measure
+from steganography.error_correction.none_error_correction import NoneErrorCorrection
+from steganography.wav_steganography.scatter_positions import ScatterPositions
+from steganography.wav_steganography.wav_file import WAVFile
+
+SECONDS = 600
+PAYLOAD_BYTES = [2 ** 10, 2 ** 14, 2 ** 18]
+SCATTER_KEY = b"benchmark music key"
+
+
+def main():
+    print(f"Decoding from a {SECONDS} s stereo file, in memory and streamed, contiguous and scattered")
+    print("The scattered positions are generated on every decode (cold cache)")
+    with TemporaryDirectory() as tmp_dir:
+        file_path = create_wav_file(Path(tmp_dir) / "benchmark.wav", SECONDS)
+
+        for payload_bytes in PAYLOAD_BYTES:
+            data = os.urandom(payload_bytes)
+            times = []
+            for scatter_key in [None, SCATTER_KEY]:
+                wav_file = WAVFile(file_path)
+                wav_file.encode(data, error_correction=NoneErrorCorrection(), scatter_key=scatter_key, verify="none")
+                encoded_path = Path(tmp_dir) / "encoded.wav"
+                wav_file.write(encoded_path, overwrite=True)
+                decode = (lambda: ScatterPositions.clear() or wav_file.decode(
+                    error_correction=NoneErrorCorrection(), scatter_key=scatter_key
+                ))
+                streamed_decode = (lambda: ScatterPositions.clear() or WAVFile.decode_from_path(
+                    encoded_path, error_correction=NoneErrorCorrection(), scatter_key=scatter_key
+                ))
+                times.append((measure(decode)[0], measure(streamed_decode)[0]))
+
+            (contiguous, contiguous_streamed), (scattered, scattered_streamed) = times
+            print(f"{payload_bytes:7d} bytes: in memory {contiguous * 1000:7.1f} ms -> {scattered * 1000:7.1f} ms "
+                  f"({scattered / contiguous:4.1f}x), streamed {contiguous_streamed * 1000:7.1f} ms -> "
+                  f"{scattered_streamed * 1000:7.1f} ms ({scattered_streamed / contiguous_streamed:4.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,8 @@
-from error_correction.error_correction_type import ErrorCorrectionType
-from error_correction.generic_error_correction import GenericErrorCorrection
-from error_correction.hamming_error_correction import HammingErrorCorrection
-from error_correction.none_error_correction import NoneErrorCorrection
-from error_correction.reed_solomon_error_correction import ReedSolomonErrorCorrection
+from steganography.error_correction.error_correction_type import ErrorCorrectionType
+from steganography.error_correction.generic_error_correction import GenericErrorCorrection
+from steganography.error_correction.hamming_error_correction import HammingErrorCorrection
+from steganography.error_correction.none_error_correction import NoneErrorCorrection
+from steganography.error_correction.reed_solomon_error_correction import ReedSolomonErrorCorrection
 
 
 class ErrorCorrectionProvider:
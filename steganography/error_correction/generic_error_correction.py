@@ -17,3 +17,19 @@ class GenericErrorCorrection(ABC):
     @abstractmethod
     def decode(data: bytes, redundant_bits: int) -> bytes:
         pass
+
+    @staticmethod
+    @abstractmethod
+    def encoded_size(data_size: int, redundant_bits: int) -> int:
+        """ Return the size of the encoded data for data of data_size bytes """
+        pass
+
+    @staticmethod
+    def block_size(redundant_bits: int) -> int:
+        """ Encoding data in pieces of a multiple of this many bytes (but the last) equals encoding it at once """
+        return 1
+
+    @classmethod
+    def extract(cls, data: bytes, redundant_bits: int) -> bytes:
+        """ Return the data of encoded data which is known to be intact, without checking or correcting it """
+        return cls.decode(data, redundant_bits)
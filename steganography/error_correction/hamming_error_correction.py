@@ -1,274 +1,134 @@
+from functools import lru_cache
+from typing import Tuple
+
 import numpy as np
 
-from error_correction.error_correction_type import ErrorCorrectionType
-from error_correction.generic_error_correction import GenericErrorCorrection
+from steganography.error_correction.error_correction_type import ErrorCorrectionType
+from steganography.error_correction.generic_error_correction import GenericErrorCorrection
 
 
 class HammingErrorCorrection(GenericErrorCorrection):
+    """Hamming(12,8) code, correcting one flipped bit per encoded byte
 
-    def __init__(self):
-        super().__init__(ErrorCorrectionType.HAMMING)
-
-    @staticmethod
-    def encode(data: bytes, redundant_bits: int) -> bytes:
-
-        redundant_bits = 4
-
-        hamming_code = []
-
-        data_as_bits = HammingErrorCorrection.__return_as_bits(data[::-1])
-
-        number_of_data_and_redundant_bits = 8 + redundant_bits
-
-        while len(data_as_bits) > 0:
-            next_bits = data_as_bits[-8:]
-
-            hamming_code_with_placeholders = \
-                HammingErrorCorrection.__add_placeholder_redundant_bits(next_bits, number_of_data_and_redundant_bits)
-
-            hamming_code_calculated = \
-                HammingErrorCorrection.__calculate_values_for_redundant_bits(redundant_bits,
-                                                                             number_of_data_and_redundant_bits,
-                                                                             hamming_code_with_placeholders)
-
-            hamming_code.extend(hamming_code_calculated)
-
-            data_as_bits = data_as_bits[:-8]
-
-        return b''.join(HammingErrorCorrection.__convert_bits_to_bytes(hamming_code))
-
-    @staticmethod
-    def decode(decoded_data: bytes, redundant_bits: int) -> bytes:
-
-        redundant_bits = 4
-
-        corrected_data = []
-
-        hamming_code_as_bits = HammingErrorCorrection.__return_as_bits(decoded_data)
-
-        hamming_code_as_bits = HammingErrorCorrection.__add_lost_bits(hamming_code_as_bits)
-
-        number_of_data_and_redundant_bits = 8 + redundant_bits
-
-        while len(hamming_code_as_bits) > 0:
-            next_hamming_bits = hamming_code_as_bits[:number_of_data_and_redundant_bits]
-
-            number_of_iterations, error_syndrome = 0, []
-
-            while number_of_iterations < redundant_bits:
-                position_of_next_redundant_bit = 2 ** number_of_iterations
-
-                sum_of_bit_values = HammingErrorCorrection.__calculate_sum_of_bit_values(
-                    number_of_data_and_redundant_bits,
-                    position_of_next_redundant_bit,
-                    next_hamming_bits)
-
-                error_syndrome.extend([sum_of_bit_values % 2])
-
-                number_of_iterations += 1
-
-            # Check if a bit is flipped
-            sum_of_parity_bit_values, number_of_iterations, position_of_flipped_bit = 0, 0, 0
-
-            for value in error_syndrome:
-                sum_of_parity_bit_values += value
-                if value == 1:
-                    position_of_flipped_bit += 2 ** number_of_iterations
-                number_of_iterations += 1
-
-            position_of_flipped_bit -= 1  # Subtract one to get the correct position in the array
-
-            if position_of_flipped_bit < 0:
-                position_of_flipped_bit = 0
-
-            # Correct the flipped bit if there is one
-            if sum_of_parity_bit_values != 0:
-                if position_of_flipped_bit >= 12:
-                    print("More than one flipped bit (error) found! Could not correct any bits")
-                else:
-                    if next_hamming_bits[position_of_flipped_bit] == 0:
-                        next_hamming_bits[position_of_flipped_bit] = 1
-                    else:
-                        next_hamming_bits[position_of_flipped_bit] = 0
-
-            corrected_data.extend(next_hamming_bits)
-
-            hamming_code_as_bits = hamming_code_as_bits[number_of_data_and_redundant_bits:]
-
-            if HammingErrorCorrection.__ignore_remaining_bits(hamming_code_as_bits, number_of_data_and_redundant_bits):
-                break
-
-        corrected_data_as_byte_string = b''.join(HammingErrorCorrection.__convert_bits_to_bytes(corrected_data))
-
-        corrected_decoded_data =\
-            HammingErrorCorrection.__correct_errors(corrected_data_as_byte_string, redundant_bits)
-
-        return corrected_decoded_data
-
-    @staticmethod
-    def __correct_errors(data: bytes, redundant_bits: int) -> bytes:
-
-        decoded_hamming_code = []
-
-        data_as_bits = HammingErrorCorrection.__return_as_bits(data)
-
-        data_as_bits = HammingErrorCorrection.__add_lost_bits(data_as_bits)
-
-        number_of_data_and_redundant_bits = 8 + redundant_bits
-
-        while len(data_as_bits) > 0:
-            next_hamming_bits = data_as_bits[:number_of_data_and_redundant_bits]
-
-            cleaned_hamming_bits = HammingErrorCorrection.__remove_all_redundant_bits(next_hamming_bits, redundant_bits)
+    Every byte is encoded as a codeword of 12 bits: the parity bits are at the positions 1, 2, 4 and 8
+    (1-based, from the most significant bit of the codeword), the data bits (most significant first) at the
+    positions 3, 5, 6, 7, 9, 10, 11 and 12. Parity bit p is the even parity of all positions which have the
+    bit p set. The codewords are concatenated and padded with zero bits to full bytes.
+    https://users.cis.fiu.edu/~downeyt/cop3402/hamming.html
 
-            decoded_hamming_code.extend(cleaned_hamming_bits)
+    Encoding and decoding use lookup tables over all 256 bytes and all 4096 codewords, applied to numpy arrays.
+    They stay in the calling process: sending the data to the ErrorCorrectionPool takes about as long as the lookups
+    (see parallel_error_correction_benchmark).
+    """
 
-            data_as_bits = data_as_bits[number_of_data_and_redundant_bits:]
+    CODEWORD_BITS = 12
+    PARITY_POSITIONS = (1, 2, 4, 8)
+    DATA_POSITIONS = (3, 5, 6, 7, 9, 10, 11, 12)
 
-            if HammingErrorCorrection.__ignore_remaining_bits(data_as_bits, number_of_data_and_redundant_bits):
-                break
-
-        return b''.join(HammingErrorCorrection.__convert_bits_to_bytes(decoded_hamming_code))
+    def __init__(self):
+        super().__init__(ErrorCorrectionType.HAMMING)
 
     @staticmethod
-    def __add_placeholder_redundant_bits(data_as_bits: list, number_of_data_and_redundant_bits: int) -> list:
-
-        j, k, hamming_code_with_placeholders = 0, 0, []
-
-        for i in range(0, number_of_data_and_redundant_bits):
-            position_of_next_redundant_bit = 2 ** j
+    def encoded_size(data_size: int, redundant_bits: int) -> int:
 
-            if position_of_next_redundant_bit == i + 1:
-                hamming_code_with_placeholders.append(0)
-                j += 1
-            else:
-                hamming_code_with_placeholders.append(int(data_as_bits[k]))
-                k += 1
-
-            i += 1
-
-        return hamming_code_with_placeholders
+        # Every byte is encoded as 12 bits (4 redundant bits, independent of redundant_bits)
+        return -(-data_size * 12 // 8)
 
     @staticmethod
-    def __calculate_sum_of_bit_values(number_of_data_and_redundant_bits: int, position_of_next_redundant_bit: int,
-                                      hamming_code: list) -> int:
-
-        sum_of_bit_values = 0
-        j = position_of_next_redundant_bit - 1
+    def block_size(redundant_bits: int) -> int:
 
-        # Check all relevant bits in the array for their value
-        # https://users.cis.fiu.edu/~downeyt/cop3402/hamming.html
-        while j < number_of_data_and_redundant_bits:
-            for i in range(position_of_next_redundant_bit):
-                sum_of_bit_values += hamming_code[j]
-                j += 1
-                if j >= number_of_data_and_redundant_bits:
-                    break
-
-            j += position_of_next_redundant_bit
-
-        return sum_of_bit_values
+        # Two codewords make up whole bytes
+        return 2
 
     @staticmethod
-    def __calculate_values_for_redundant_bits(redundant_bits: int, number_of_data_and_redundant_bits: int,
-                                              hamming_code: list) -> list:
-
-        number_of_iterations = 0
-
-        while number_of_iterations < redundant_bits:
-            position_of_next_redundant_bit = 2 ** number_of_iterations
-
-            sum_of_bit_values = HammingErrorCorrection.__calculate_sum_of_bit_values(number_of_data_and_redundant_bits,
-                                                                                     position_of_next_redundant_bit,
-                                                                                     hamming_code)
-
-            # Check if all relevant bits have an even number of 1's
-            # If not, update redundant bit value for even parity
-            if sum_of_bit_values % 2 != 0:
-                hamming_code[position_of_next_redundant_bit - 1] = 1
-
-            number_of_iterations += 1
-
-        return hamming_code
-
-    @staticmethod
-    def __get_bytes(bits: iter) -> bytes:
-
-        done = False
-        while not done:
-            byte = 0
-            for _ in range(0, 8):
-                try:
-                    bit = next(bits)
-                except StopIteration:
-                    bit = 0
-                    done = True
-                byte = (byte << 1) | bit
-            yield byte
-
-    @staticmethod
-    def __convert_bits_to_bytes(hamming_code: list) -> list:
-
-        byte_array, number_of_iterations = [], 0
-
-        for b in HammingErrorCorrection.__get_bytes(iter(hamming_code)):
-            number_of_iterations += 1
-            byte_array.append(bytes([b]))
-
-        number_of_bytes = len(hamming_code) / 8
+    def encode(data: bytes, redundant_bits: int) -> bytes:
 
-        # Remove possible empty byte that can occur
-        if number_of_bytes + 1 == number_of_iterations:
-            byte_array = byte_array[:-1]
+        encode_table, _, _ = HammingErrorCorrection._get_tables()
+        codewords = encode_table[np.frombuffer(data, dtype=np.uint8)]
 
-        return byte_array
+        return HammingErrorCorrection._pack_codewords(codewords)[:HammingErrorCorrection.encoded_size(len(data), 4)]
 
     @staticmethod
-    def __remove_all_redundant_bits(list_of_hamming_bits: list, redundant_bits: int) -> list:
-
-        number_of_iterations = 0
-
-        while number_of_iterations < redundant_bits:
-            position_of_next_redundant_bit = 2 ** number_of_iterations - 1 - number_of_iterations
+    def decode(decoded_data: bytes, redundant_bits: int) -> bytes:
 
-            if position_of_next_redundant_bit < len(list_of_hamming_bits):
-                del list_of_hamming_bits[position_of_next_redundant_bit]
-            else:
-                break
+        _, decode_table, uncorrectable = HammingErrorCorrection._get_tables()
 
-            number_of_iterations += 1
+        # The padding to full bytes is shorter than a codeword, so only whole codewords are decoded
+        codeword_count = len(decoded_data) * 8 // HammingErrorCorrection.CODEWORD_BITS
+        codewords = HammingErrorCorrection._unpack_codewords(decoded_data)[:codeword_count]
 
-        return list_of_hamming_bits
+        if uncorrectable[codewords].any():
+            print("More than one flipped bit (error) found! Could not correct any bits")
+        return decode_table[codewords].tobytes()
 
     @staticmethod
-    def __ignore_remaining_bits(decoded_hamming_code: list, number_of_data_and_redundant_bits: int) -> bool:
-
-        if len(decoded_hamming_code) <= number_of_data_and_redundant_bits:
-
-            bit_sum = 0
-
-            for bit in decoded_hamming_code:
-                bit_sum += bit
-
-            if bit_sum == 0:
-                return True
-
-        return False
+    def _pack_codewords(codewords: np.ndarray) -> bytes:
+        """ Concatenate the 12 bit codewords, two codewords at a time make up 3 bytes """
+        if len(codewords) % 2:
+            codewords = np.append(codewords, np.uint16(0))
+        pairs = codewords.reshape(-1, 2)
+
+        packed = np.empty((len(pairs), 3), dtype=np.uint8)
+        packed[:, 0] = pairs[:, 0] >> 4
+        packed[:, 1] = ((pairs[:, 0] & 0xF) << 4) | (pairs[:, 1] >> 8)
+        packed[:, 2] = pairs[:, 1] & 0xFF
+        return packed.tobytes()
 
     @staticmethod
-    def __return_as_bits(data: bytes) -> list:
-
-        data_as_bits = []
+    def _unpack_codewords(data: bytes) -> np.ndarray:
+        """ Split the concatenated codewords into an array of 12 bit codewords, padding the last one with zeros """
+        raw = np.frombuffer(data, dtype=np.uint8)
+        triples = np.zeros((-(-len(raw) // 3), 3), dtype=np.uint16)
+        triples.reshape(-1)[:len(raw)] = raw
 
-        for value in data:
-            data_as_bits.extend([int(i) for i in str(np.binary_repr(value, 8))])
-
-        return data_as_bits
+        codewords = np.empty((len(triples), 2), dtype=np.uint16)
+        codewords[:, 0] = (triples[:, 0] << 4) | (triples[:, 1] >> 4)
+        codewords[:, 1] = ((triples[:, 1] & 0xF) << 8) | triples[:, 2]
+        return codewords.reshape(-1)
 
     @staticmethod
-    def __add_lost_bits(data: list) -> list:
+    @lru_cache(maxsize=None)
+    def _get_tables() -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """ Return the codeword of every byte, the corrected byte of every codeword and which are uncorrectable """
+        codeword_bits = HammingErrorCorrection.CODEWORD_BITS
+
+        def bit(value: int, position: int) -> int:
+            """ Bit at the 1-based position from the most significant bit of a codeword """
+            return (value >> (codeword_bits - position)) & 1
+
+        def syndrome(codeword: int) -> int:
+            """ Position of the flipped bit, 0 if all parity checks hold """
+            return sum(
+                parity for parity in HammingErrorCorrection.PARITY_POSITIONS
+                if sum(bit(codeword, position) for position in range(1, codeword_bits + 1) if position & parity) % 2
+            )
+
+        encode_table = np.zeros(256, dtype=np.uint16)
+        for byte in range(256):
+            codeword = 0
+            for index, position in enumerate(HammingErrorCorrection.DATA_POSITIONS):
+                codeword |= ((byte >> (7 - index)) & 1) << (codeword_bits - position)
+            for parity in HammingErrorCorrection.PARITY_POSITIONS:
+                if syndrome(codeword) & parity:
+                    codeword |= 1 << (codeword_bits - parity)
+            encode_table[byte] = codeword
+
+        decode_table = np.zeros(2 ** codeword_bits, dtype=np.uint8)
+        uncorrectable = np.zeros(2 ** codeword_bits, dtype=bool)
+        for codeword in range(2 ** codeword_bits):
+            corrected = codeword
+            flipped_position = syndrome(codeword)
+            if flipped_position > codeword_bits:
+                # Positions beyond the codeword can only be caused by multiple flipped bits, the bits are kept
+                uncorrectable[codeword] = True
+            elif flipped_position > 0:
+                corrected ^= 1 << (codeword_bits - flipped_position)
 
-        while len(data) % 12 != 0:
-            data.extend([0])
+            byte = 0
+            for position in HammingErrorCorrection.DATA_POSITIONS:
+                byte = (byte << 1) | bit(corrected, position)
+            decode_table[codeword] = byte
 
-        return data
+        for table in (encode_table, decode_table, uncorrectable):
+            table.flags.writeable = False
+        return encode_table, decode_table, uncorrectable
@@ -21,3 +21,8 @@ class NoneErrorCorrection(GenericErrorCorrection):
     def decode(data: bytes, redundant_bits: int) -> bytes:
 
         return data
+
+    @staticmethod
+    def encoded_size(data_size: int, redundant_bits: int) -> int:
+
+        return data_size
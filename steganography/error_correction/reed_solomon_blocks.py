@@ -0,0 +1,86 @@
+from functools import lru_cache
+
+import numpy as np
+
+
+class ReedSolomonBlocks:
+    """Reed-Solomon arithmetic over GF(2^8) for many blocks at once, using numpy lookup tables
+
+    The parameters are the reedsolo defaults (primitive polynomial 0x11d, generator 2, first consecutive root 0),
+    so the ecc bytes are the same as the ones of reedsolo.RSCodec(nsym).
+
+    Blocks are the rows of a uint8 array. Shorter blocks have to be padded with zeros at the front, which changes
+    neither the ecc bytes nor the validity of a (shortened) Reed-Solomon codeword.
+    """
+
+    PRIMITIVE_POLYNOMIAL = 0x11d
+    GENERATOR = 2
+    FIELD_SIZE = 256
+
+    @staticmethod
+    def encode(blocks: np.ndarray, nsym: int) -> np.ndarray:
+        """ Return the nsym ecc bytes of every data block (row) """
+        generator_products = ReedSolomonBlocks._get_multiplication_table()[:, ReedSolomonBlocks._get_generator(nsym)]
+
+        # Polynomial division by the generator, as a linear feedback shift register running over all blocks at once.
+        # Instead of shifting, the register is a window moving over the columns, ending up at the remainder.
+        block_count, data_size = blocks.shape
+        register = np.zeros((block_count, data_size + nsym), dtype=np.uint8)
+        for column_index in range(data_size):
+            feedback = blocks[:, column_index] ^ register[:, column_index]
+            register[:, column_index + 1:column_index + 1 + nsym] ^= generator_products[feedback]
+        return register[:, data_size:]
+
+    @staticmethod
+    def intact(codewords: np.ndarray, nsym: int) -> np.ndarray:
+        """ Return for every codeword (row) whether it is a valid codeword, i.e. whether all its syndromes are zero
+
+        A codeword is valid if and only if it is a multiple of the generator polynomial, which holds exactly if its
+        ecc bytes are the ones of its data bytes (same as reedsolo.rs_check).
+        """
+        ecc = ReedSolomonBlocks.encode(codewords[:, :-nsym], nsym)
+        return (ecc == codewords[:, -nsym:]).all(axis=1)
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _get_generator(nsym: int) -> np.ndarray:
+        """ Coefficients of the generator polynomial without the leading 1, highest degree first """
+        exp_table, _ = ReedSolomonBlocks._get_tables()
+        multiplication_table = ReedSolomonBlocks._get_multiplication_table()
+
+        generator = np.ones(1, dtype=np.uint8)
+        for power in range(nsym):
+            # Multiply by (x - 2^power), subtraction is addition (xor) in GF(2^8)
+            generator = np.append(generator, 0) ^ np.append(0, multiplication_table[generator, exp_table[power]])
+        generator = generator[1:]
+        generator.flags.writeable = False
+        return generator
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _get_tables():
+        """ Return the exponential (antilog) and logarithm tables of the field """
+        exp_table = np.zeros(ReedSolomonBlocks.FIELD_SIZE - 1, dtype=np.uint8)
+        log_table = np.zeros(ReedSolomonBlocks.FIELD_SIZE, dtype=np.intp)
+        value = 1
+        for power in range(ReedSolomonBlocks.FIELD_SIZE - 1):
+            exp_table[power] = value
+            log_table[value] = power
+            value *= ReedSolomonBlocks.GENERATOR
+            if value >= ReedSolomonBlocks.FIELD_SIZE:
+                value ^= ReedSolomonBlocks.PRIMITIVE_POLYNOMIAL
+        exp_table.flags.writeable = False
+        log_table.flags.writeable = False
+        return exp_table, log_table
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _get_multiplication_table() -> np.ndarray:
+        """ Return the product of all pairs of field elements """
+        exp_table, log_table = ReedSolomonBlocks._get_tables()
+        logs = log_table[:, np.newaxis] + log_table[np.newaxis, :]
+        multiplication_table = exp_table[logs % (ReedSolomonBlocks.FIELD_SIZE - 1)]
+        multiplication_table[0, :] = 0
+        multiplication_table[:, 0] = 0
+        multiplication_table.flags.writeable = False
+        return multiplication_table
@@ -1,7 +1,13 @@
+from functools import lru_cache, partial
+from typing import Callable, List, Sequence, Tuple
+
+import numpy as np
 from reedsolo import RSCodec
 
+from steganography.error_correction.error_correction_pool import ErrorCorrectionPool
 from steganography.error_correction.error_correction_type import ErrorCorrectionType
 from steganography.error_correction.generic_error_correction import GenericErrorCorrection
+from steganography.error_correction.reed_solomon_blocks import ReedSolomonBlocks
 
 
 class ReedSolomonErrorCorrection(GenericErrorCorrection):
@@ -12,14 +18,22 @@ class ReedSolomonErrorCorrection(GenericErrorCorrection):
     use the reedsolo package.
 
     https://pypi.org/project/reedsolo/
+
+    The chunks of all messages passed to encode_many/decode_many are processed together: the ecc bytes are computed
+    and the chunks are checked with ReedSolomonBlocks, only chunks with errors are corrected by reedsolo.
+    For large data, the chunks are split into groups which are processed by the ErrorCorrectionPool.
     """
 
+    REED_SOLOMON_CHUNK_SIZE = 255
+    # Correcting a chunk with reedsolo takes about as long as checking this many bytes, see ErrorCorrectionPool
+    CORRECTION_COST = 2 ** 16
+
     def __init__(self):
         super().__init__(ErrorCorrectionType.REED_SOLOMON)
 
     @staticmethod
     def _get_ecc_byte_count_per_chunk(redundant_bits):
-        reed_solomon_chunk_size = 255
+        reed_solomon_chunk_size = ReedSolomonErrorCorrection.REED_SOLOMON_CHUNK_SIZE
         if not (0 <= redundant_bits < reed_solomon_chunk_size * 8):
             raise ValueError(f"ERROR: Too many redundant bits: {redundant_bits},"
                              f" must be less than {reed_solomon_chunk_size * 8}.")
@@ -31,29 +45,158 @@ class ReedSolomonErrorCorrection(GenericErrorCorrection):
         return ecc_bits
 
     @staticmethod
-    def encode(data: bytes, redundant_bits: int) -> bytes:
+    def encoded_size(data_size: int, redundant_bits: int) -> int:
 
         if redundant_bits == 0:
-            return data
+            return data_size
+
+        ecc_byte_count_per_chunk = ReedSolomonErrorCorrection._get_ecc_byte_count_per_chunk(redundant_bits)
+
+        # reedsolo splits the data into chunks of 255 bytes minus the ecc bytes, the last chunk may be shorter
+        data_bytes_per_chunk = ReedSolomonErrorCorrection.REED_SOLOMON_CHUNK_SIZE - ecc_byte_count_per_chunk
+        return data_size + ecc_byte_count_per_chunk * -(-data_size // data_bytes_per_chunk)
+
+    @staticmethod
+    def block_size(redundant_bits: int) -> int:
+
+        if redundant_bits == 0:
+            return 1
 
+        # Each chunk is encoded independently
         ecc_byte_count_per_chunk = ReedSolomonErrorCorrection._get_ecc_byte_count_per_chunk(redundant_bits)
+        return ReedSolomonErrorCorrection.REED_SOLOMON_CHUNK_SIZE - ecc_byte_count_per_chunk
 
-        rsc = RSCodec(ecc_byte_count_per_chunk)
-        encoded_data = rsc.encode(data)
+    @staticmethod
+    def encode(data: bytes, redundant_bits: int) -> bytes:
 
-        return bytes(encoded_data)
+        return ReedSolomonErrorCorrection.encode_many([data], redundant_bits)[0]
 
     @staticmethod
     def decode(data: bytes, redundant_bits: int) -> bytes:
 
+        return ReedSolomonErrorCorrection.decode_many([data], redundant_bits)[0]
+
+    @staticmethod
+    def encode_many(messages: Sequence[bytes], redundant_bits: int) -> List[bytes]:
+        """ Encode all messages at once, each result is the same as the one of encode """
+
+        if redundant_bits == 0:
+            return [bytes(message) for message in messages]
+
+        ecc_byte_count_per_chunk = ReedSolomonErrorCorrection._get_ecc_byte_count_per_chunk(redundant_bits)
+        data_bytes_per_chunk = ReedSolomonErrorCorrection.REED_SOLOMON_CHUNK_SIZE - ecc_byte_count_per_chunk
+
+        chunks, locations = ReedSolomonErrorCorrection._split_into_chunks(messages, data_bytes_per_chunk)
+        ecc = ReedSolomonErrorCorrection._map_chunks(
+            partial(ReedSolomonBlocks.encode, nsym=ecc_byte_count_per_chunk), chunks
+        )
+        encoded_chunks = np.concatenate([chunks, ecc], axis=1)
+
+        return [
+            encoded_chunks[first_chunk:last_chunk].tobytes() + encoded_chunks[last_chunk, padding:].tobytes()
+            if first_chunk <= last_chunk else b""
+            for first_chunk, last_chunk, padding in locations
+        ]
+
+    @staticmethod
+    def decode_many(messages: Sequence[bytes], redundant_bits: int) -> List[bytes]:
+        """ Decode all messages at once, raises ReedSolomonError if any of them cannot be corrected """
+
+        if redundant_bits == 0:
+            return [bytes(message) for message in messages]
+
+        ecc_byte_count_per_chunk = ReedSolomonErrorCorrection._get_ecc_byte_count_per_chunk(redundant_bits)
+        chunk_size = ReedSolomonErrorCorrection.REED_SOLOMON_CHUNK_SIZE
+        data_bytes_per_chunk = chunk_size - ecc_byte_count_per_chunk
+
+        chunks, locations = ReedSolomonErrorCorrection._split_into_chunks(messages, chunk_size)
+        corrupted = ~ReedSolomonErrorCorrection._map_chunks(
+            partial(ReedSolomonBlocks.intact, nsym=ecc_byte_count_per_chunk), chunks
+        )
+        padding_of_chunk = np.zeros(len(chunks), dtype=int)
+        for first_chunk, last_chunk, padding in locations:
+            if first_chunk <= last_chunk:
+                padding_of_chunk[last_chunk] = padding
+        # Chunks too short to contain any data bytes are left to reedsolo as well
+        corrupted |= padding_of_chunk >= data_bytes_per_chunk
+
+        corrupted_chunks = np.flatnonzero(corrupted)
+        correction_cost = len(corrupted_chunks) * ReedSolomonErrorCorrection.CORRECTION_COST
+        worker_count = min(ErrorCorrectionPool.worker_count(correction_cost), max(1, len(corrupted_chunks)))
+        chunk_groups = np.array_split(corrupted_chunks, worker_count)
+        decoded_groups = ErrorCorrectionPool.map(
+            partial(ReedSolomonErrorCorrection._correct_chunks, ecc_byte_count_per_chunk),
+            [[chunks[chunk_index, padding_of_chunk[chunk_index]:].tobytes() for chunk_index in chunk_group]
+             for chunk_group in chunk_groups],
+        )
+        for chunk_group, decoded_group in zip(chunk_groups, decoded_groups):
+            for chunk_index, decoded_chunk in zip(chunk_group, decoded_group):
+                padding = padding_of_chunk[chunk_index]
+                chunks[chunk_index, padding:data_bytes_per_chunk] = np.frombuffer(decoded_chunk, dtype=np.uint8)
+
+        # important to return bytes, as reedsolo returns a bytearray, which causes errors in various encryptors
+        return [
+            chunks[first_chunk:last_chunk, :data_bytes_per_chunk].tobytes()
+            + chunks[last_chunk, padding:data_bytes_per_chunk].tobytes()
+            if first_chunk <= last_chunk else b""
+            for first_chunk, last_chunk, padding in locations
+        ]
+
+    @staticmethod
+    def extract(data: bytes, redundant_bits: int) -> bytes:
+
         if redundant_bits == 0:
             return data
 
+        # The code is systematic, each chunk starts with its data bytes
         ecc_byte_count_per_chunk = ReedSolomonErrorCorrection._get_ecc_byte_count_per_chunk(redundant_bits)
+        chunk_size = ReedSolomonErrorCorrection.REED_SOLOMON_CHUNK_SIZE
+        full_chunks = np.frombuffer(data, dtype=np.uint8)[:len(data) // chunk_size * chunk_size]
+        last_chunk = data[len(full_chunks):]
+        return (
+            full_chunks.reshape(-1, chunk_size)[:, :chunk_size - ecc_byte_count_per_chunk].tobytes()
+            + last_chunk[:max(0, len(last_chunk) - ecc_byte_count_per_chunk)]
+        )
 
-        rsc = RSCodec(ecc_byte_count_per_chunk)
+    @staticmethod
+    def _split_into_chunks(messages: Sequence[bytes], chunk_size: int) -> Tuple[np.ndarray, List[Tuple[int, int, int]]]:
+        """Stack the chunks of all messages as rows, the last chunk of each message is padded with zeros at the front
+
+        Returns the chunks and, for every message, the index of its first and last chunk and the padding of the last
+        """
+        chunks = np.zeros((sum(-(-len(message) // chunk_size) for message in messages), chunk_size), dtype=np.uint8)
+        locations = []
+        first_chunk = 0
+        for message in messages:
+            full_chunks, remainder = divmod(len(message), chunk_size)
+            message = np.frombuffer(message, dtype=np.uint8)
+            chunks[first_chunk:first_chunk + full_chunks] = message[:full_chunks * chunk_size].reshape(-1, chunk_size)
+            if remainder:
+                chunks[first_chunk + full_chunks, chunk_size - remainder:] = message[full_chunks * chunk_size:]
+            chunk_count = full_chunks + bool(remainder)
+            locations.append((first_chunk, first_chunk + chunk_count - 1, chunk_size - remainder if remainder else 0))
+            first_chunk += chunk_count
+        return chunks, locations
 
-        decoded_msg = rsc.decode(data)[0]
+    @staticmethod
+    def _map_chunks(function: Callable[[np.ndarray], np.ndarray], chunks: np.ndarray) -> np.ndarray:
+        """ Apply function to groups of chunks (rows) and concatenate the results, in parallel for large data """
+        row_size = chunks.shape[1]
+        parts = ErrorCorrectionPool.split(len(chunks) * row_size, row_size)
+        if len(parts) == 1:
+            return function(chunks)
+        return np.concatenate(ErrorCorrectionPool.map(
+            function, [chunks[part.start // row_size:part.stop // row_size] for part in parts]
+        ))
+
+    @staticmethod
+    def _correct_chunks(ecc_byte_count_per_chunk: int, chunks: List[bytes]) -> List[bytes]:
+        """ Correct the chunks with reedsolo, returns their data bytes """
+        codec = ReedSolomonErrorCorrection._get_codec(ecc_byte_count_per_chunk)
+        return [bytes(codec.decode(chunk)[0]) for chunk in chunks]
 
-        # important to return bytes, as rsc returns a bytearray, which causes errors in various encryptors
-        return bytes(decoded_msg)
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _get_codec(ecc_byte_count_per_chunk: int) -> RSCodec:
+        """ Building a codec computes its generator polynomial, so there is one per number of ecc bytes """
+        return RSCodec(ecc_byte_count_per_chunk)
@@ -1,9 +1,10 @@
-from typing import Optional
+from typing import Optional, Type
 
 from steganography.security.encryptors.aes_encryptor import AesEncryptor
 from steganography.security.enums.encryption_type import EncryptionType
 from steganography.security.encryptors.fernet_encryptor import FernetEncryptor
 from steganography.security.encryptors.generic_encryptor import GenericEncryptor
+from steganography.security.encryptors.hybrid_encryptor import HybridEncryptor
 from steganography.security.encryptors.none_encryptor import NoneEncryptor
 from steganography.security.encryptors.rsa_encryptor import RsaEncryptor
 from steganography.security.enums.hash_type import HashType
@@ -23,8 +24,13 @@ class EncryptionProvider:
             is_test: Optional[bool] = False,
             salt: Optional[bytes] = None,
             nonce: Optional[bytes] = None,
+            password: Optional[str] = None,
+            private_key: Optional[bytes] = None,
     ) -> GenericEncryptor:
-        """Return encryptor with given type, nonce will only be used if AES"""
+        """Return encryptor with given type, nonce will only be used if AES
+        RSA and hybrid encryptors use the given private key (PEM, encrypted with password), without one a new key
+        is created for encryption. Decryption requires the private key.
+        """
 
         hash_algo = HashProvider.get_hash(hash_type, is_test, salt)
 
@@ -38,6 +44,41 @@ class EncryptionProvider:
             return AesEncryptor(hash_algo, nonce)
 
         if encryption_type == EncryptionType.RSA:
-            return RsaEncryptor(decryption, is_test)
+            return EncryptionProvider.__get_rsa_encryptor(decryption, password, private_key)
+
+        if encryption_type == EncryptionType.HYBRID:
+            # The AES key is wrapped with the same RSA key as used for RSA encryption
+            return HybridEncryptor(EncryptionProvider.__get_rsa_encryptor(decryption, password, private_key))
+
+        raise ValueError('Could not get Encryptor')
+
+    @staticmethod
+    def __get_rsa_encryptor(decryption: bool, password: Optional[str], private_key: Optional[bytes]) -> RsaEncryptor:
+        if private_key is not None:
+            if password is None:
+                raise ValueError('The private key is encrypted, its password is required')
+            return RsaEncryptor(password=password, private_key=private_key)
+        if decryption:
+            raise ValueError('RSA decryption requires the private key, pass private_key and password or an encryptor')
+        return RsaEncryptor(password=password, create=True)
+
+    @staticmethod
+    def get_encryptor_class(encryption_type: EncryptionType) -> Type[GenericEncryptor]:
+        """Return encryptor class with given type, e.g. to calculate sizes without creating a key"""
+
+        if not encryption_type or encryption_type == EncryptionType.NONE:
+            return NoneEncryptor
+
+        if encryption_type == EncryptionType.FERNET:
+            return FernetEncryptor
+
+        if encryption_type == EncryptionType.AES:
+            return AesEncryptor
+
+        if encryption_type == EncryptionType.RSA:
+            return RsaEncryptor
+
+        if encryption_type == EncryptionType.HYBRID:
+            return HybridEncryptor
 
         raise ValueError('Could not get Encryptor')
@@ -3,6 +3,7 @@ from typing import Optional
 
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 
+from steganography.security.encryptors.encryption_context import EncryptionContext
 from steganography.security.enums.encryption_type import EncryptionType
 from steganography.security.hashing.generic_hash import GenericHash
 from steganography.security.encryptors.generic_encryptor import GenericEncryptor
@@ -45,11 +46,14 @@ class AesEncryptor(GenericEncryptor):
     def nonce(self):
         return self.__nonce
 
-    def encrypt(self, data: bytes) -> bytes:
+    @staticmethod
+    def encrypted_size(data_size: int) -> int:
+        # CTR mode is a stream cipher, the encrypted data is as long as the data
+        return data_size
 
-        self.__cipher.mode = modes.CTR(self.__nonce)
+    def encrypt(self, data: bytes) -> bytes:
 
-        encryptor = self.__cipher.encryptor()
+        encryptor = self.encryption_context()
 
         encrypted_data = encryptor.update(data) + encryptor.finalize()
 
@@ -57,8 +61,15 @@ class AesEncryptor(GenericEncryptor):
 
     def decrypt(self, data: bytes) -> bytes:
 
-        decryptor = self.__cipher.decryptor()
+        decryptor = self.decryption_context()
 
         decrypted_data = decryptor.update(data) + decryptor.finalize()
 
         return decrypted_data
+
+    def encryption_context(self) -> EncryptionContext:
+        # Every context starts at the nonce, the cipher contexts of cryptography are used directly
+        return self.__cipher.encryptor()
+
+    def decryption_context(self) -> EncryptionContext:
+        return self.__cipher.decryptor()
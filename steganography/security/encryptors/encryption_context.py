@@ -0,0 +1,71 @@
+from abc import ABC, abstractmethod
+from typing import Callable
+
+
+class EncryptionContext(ABC):
+    """Incremental encryption or decryption: update returns the output available so far, finalize the rest
+
+    The concatenated output of all update calls and finalize is the same as encrypting (decrypting) the
+    concatenated data at once. cryptography's cipher contexts have the same interface.
+    """
+
+    @abstractmethod
+    def update(self, data: bytes) -> bytes:
+        pass
+
+    @abstractmethod
+    def finalize(self) -> bytes:
+        pass
+
+
+class PassThroughEncryptionContext(EncryptionContext):
+
+    def update(self, data: bytes) -> bytes:
+        return bytes(data)
+
+    def finalize(self) -> bytes:
+        return b""
+
+
+class BufferedEncryptionContext(EncryptionContext):
+    """ For encryptors which cannot process data in pieces: the data is collected and transformed in finalize """
+
+    def __init__(self, transform: Callable[[bytes], bytes]):
+        self.__transform = transform
+        self.__buffer = bytearray()
+
+    def update(self, data: bytes) -> bytes:
+        self.__buffer += data
+        return b""
+
+    def finalize(self) -> bytes:
+        return self.__transform(bytes(self.__buffer))
+
+
+class FramedEncryptionContext(EncryptionContext):
+    """Transforms the data in frames of frame_size bytes, the output is the concatenation of the transformed frames
+
+    Only the last frame is shorter, but never empty unless there is no data at all. A full frame is therefore only
+    transformed once more data follows it.
+    """
+
+    def __init__(self, transform: Callable[[bytes], bytes], frame_size: int):
+        self.__transform = transform
+        self.__frame_size = frame_size
+        self.__buffer = bytearray()
+
+    def update(self, data: bytes) -> bytes:
+        self.__buffer += data
+        frame_count = (len(self.__buffer) - 1) // self.__frame_size
+        if frame_count <= 0:
+            return b""
+        frames_size = frame_count * self.__frame_size
+        output = b"".join(
+            self.__transform(bytes(self.__buffer[start:start + self.__frame_size]))
+            for start in range(0, frames_size, self.__frame_size)
+        )
+        del self.__buffer[:frames_size]
+        return output
+
+    def finalize(self) -> bytes:
+        return self.__transform(bytes(self.__buffer))
@@ -1,7 +1,8 @@
 import base64
 
-from cryptography.fernet import Fernet
+from cryptography.fernet import Fernet, InvalidToken
 
+from steganography.security.encryptors.encryption_context import EncryptionContext, FramedEncryptionContext
 from steganography.security.enums.encryption_type import EncryptionType
 from steganography.security.hashing.generic_hash import GenericHash
 from steganography.security.encryptors.generic_encryptor import GenericEncryptor
@@ -9,8 +10,18 @@ from steganography.security.hashing.none_hash import NoneHash
 
 
 class FernetEncryptor(GenericEncryptor):
+    """Fernet encryption of the data in frames of FRAME_SIZE bytes, the encrypted data is the concatenated tokens
+
+    Only the last frame is shorter, so all other tokens have the same size and are split at this size to decrypt.
+    Data up to FRAME_SIZE bytes is a single token, as before the framing. Data encrypted as a single token of a
+    larger size is still decrypted.
+    """
 
     # https://cryptography.io/en/latest/fernet/
+    # https://github.com/fernet/spec/blob/master/Spec.md: version (1), timestamp (8), IV (16) and HMAC (32)
+    TOKEN_OVERHEAD = 1 + 8 + 16 + 32
+    BLOCK_SIZE = 16
+    FRAME_SIZE = 2 ** 16
 
     def __init__(self, hash_algo: GenericHash, decryption: bool):
         super().__init__(EncryptionType.FERNET)
@@ -39,12 +50,44 @@ class FernetEncryptor(GenericEncryptor):
             return self.__hash_algo.salt
         return None
 
+    @staticmethod
+    def encrypted_size(data_size: int) -> int:
+        full_frame_count = max(0, -(-data_size // FernetEncryptor.FRAME_SIZE) - 1)
+        last_frame_size = data_size - full_frame_count * FernetEncryptor.FRAME_SIZE
+        return (
+            full_frame_count * FernetEncryptor._token_size(FernetEncryptor.FRAME_SIZE)
+            + FernetEncryptor._token_size(last_frame_size)
+        )
+
     def encrypt(self, data: bytes) -> bytes:
-        encrypted_data = self.__fernet.encrypt(data)
+        encryptor = self.encryption_context()
+
+        encrypted_data = encryptor.update(data) + encryptor.finalize()
 
         return encrypted_data
 
     def decrypt(self, data: bytes) -> bytes:
-        decrypted_data = self.__fernet.decrypt(data)
+        decryptor = self.decryption_context()
+
+        try:
+            decrypted_data = decryptor.update(data) + decryptor.finalize()
+        except InvalidToken:
+            if len(data) <= self._token_size(self.FRAME_SIZE):
+                raise
+            # Encrypted as a single token before the framing
+            decrypted_data = self.__fernet.decrypt(data)
 
         return decrypted_data
+
+    def encryption_context(self) -> EncryptionContext:
+        return FramedEncryptionContext(self.__fernet.encrypt, self.FRAME_SIZE)
+
+    def decryption_context(self) -> EncryptionContext:
+        return FramedEncryptionContext(self.__fernet.decrypt, self._token_size(self.FRAME_SIZE))
+
+    @staticmethod
+    def _token_size(data_size: int) -> int:
+        # The data is PKCS7 padded to full blocks (at least one byte of padding), the token is base64 encoded
+        padded_size = FernetEncryptor.BLOCK_SIZE * (data_size // FernetEncryptor.BLOCK_SIZE + 1)
+        token_size = FernetEncryptor.TOKEN_OVERHEAD + padded_size
+        return 4 * -(-token_size // 3)
@@ -1,10 +1,15 @@
 from abc import ABC, abstractmethod
+from typing import Optional
 
+from steganography.security.encryptors.encryption_context import BufferedEncryptionContext, EncryptionContext
 from steganography.security.enums.encryption_type import EncryptionType
 
 
 class GenericEncryptor(ABC):
 
+    # Largest number of bytes which can be encrypted at once, None if unlimited
+    MAX_DATA_SIZE: Optional[int] = None
+
     def __init__(self, encryption_type: EncryptionType):
         self.encryption_type: EncryptionType = encryption_type
 
@@ -15,3 +20,17 @@ class GenericEncryptor(ABC):
     @abstractmethod
     def decrypt(self, data: bytes) -> bytes:
         pass
+
+    def encryption_context(self) -> EncryptionContext:
+        """ Return a context to encrypt data in pieces, by default it collects the data and encrypts it at once """
+        return BufferedEncryptionContext(self.encrypt)
+
+    def decryption_context(self) -> EncryptionContext:
+        """ Return a context to decrypt data in pieces, by default it collects the data and decrypts it at once """
+        return BufferedEncryptionContext(self.decrypt)
+
+    @staticmethod
+    @abstractmethod
+    def encrypted_size(data_size: int) -> int:
+        """ Return the size of the encrypted data for data of data_size bytes """
+        pass
@@ -0,0 +1,57 @@
+import os
+
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+from steganography.security.encryptors.generic_encryptor import GenericEncryptor
+from steganography.security.encryptors.rsa_encryptor import RsaEncryptor
+from steganography.security.enums.encryption_type import EncryptionType
+
+
+class HybridEncryptor(GenericEncryptor):
+    """Envelope encryption: a random AES key and nonce are wrapped by an RSA encryptor, the data is AES-CTR encrypted
+
+    The encrypted data is the wrapped key (one RSA block) followed by the encrypted data, so the size of the data
+    is not limited by the RSA key and the RSA cost is the same for every message. key_encryptor is any RSA
+    encryptor with a key of RsaEncryptor.KEY_SIZE bits, e.g. RsaEncryptor or RsaEncryptorWithFile.
+    """
+
+    # https://cryptography.io/en/latest/hazmat/primitives/symmetric-encryption/#algorithms
+    KEY_LENGTH = 32
+    NONCE_LENGTH = 16
+    WRAPPED_KEY_SIZE = RsaEncryptor.KEY_SIZE // 8
+
+    def __init__(self, key_encryptor: GenericEncryptor):
+        super().__init__(EncryptionType.HYBRID)
+
+        if key_encryptor.encrypted_size(self.KEY_LENGTH + self.NONCE_LENGTH) != self.WRAPPED_KEY_SIZE:
+            raise ValueError(f'Hybrid encryption requires an RSA encryptor with a {RsaEncryptor.KEY_SIZE} bit key')
+
+        self.__key_encryptor = key_encryptor
+
+    @staticmethod
+    def encrypted_size(data_size: int) -> int:
+        # CTR mode is a stream cipher, only the wrapped key is added
+        return HybridEncryptor.WRAPPED_KEY_SIZE + data_size
+
+    def encrypt(self, data: bytes) -> bytes:
+
+        # A new key for every message, so the nonce never repeats for a key
+        key = os.urandom(self.KEY_LENGTH)
+        nonce = os.urandom(self.NONCE_LENGTH)
+        wrapped_key = self.__key_encryptor.encrypt(key + nonce)
+
+        encryptor = Cipher(algorithms.AES(key), modes.CTR(nonce)).encryptor()
+
+        return wrapped_key + encryptor.update(data) + encryptor.finalize()
+
+    def decrypt(self, data: bytes) -> bytes:
+
+        if len(data) < self.WRAPPED_KEY_SIZE:
+            raise ValueError('The encrypted data is shorter than the wrapped key')
+
+        key_and_nonce = self.__key_encryptor.decrypt(data[:self.WRAPPED_KEY_SIZE])
+        key, nonce = key_and_nonce[:self.KEY_LENGTH], key_and_nonce[self.KEY_LENGTH:]
+
+        decryptor = Cipher(algorithms.AES(key), modes.CTR(nonce)).decryptor()
+
+        return decryptor.update(data[self.WRAPPED_KEY_SIZE:]) + decryptor.finalize()
@@ -1,3 +1,4 @@
+from steganography.security.encryptors.encryption_context import EncryptionContext, PassThroughEncryptionContext
 from steganography.security.encryptors.generic_encryptor import GenericEncryptor
 from steganography.security.enums.encryption_type import EncryptionType
 
@@ -9,8 +10,18 @@ class NoneEncryptor(GenericEncryptor):
     def __init__(self):
         super().__init__(EncryptionType.NONE)
 
+    @staticmethod
+    def encrypted_size(data_size: int) -> int:
+        return data_size
+
     def encrypt(self, data: bytes) -> bytes:
         return data
 
     def decrypt(self, data: bytes) -> bytes:
         return data
+
+    def encryption_context(self) -> EncryptionContext:
+        return PassThroughEncryptionContext()
+
+    def decryption_context(self) -> EncryptionContext:
+        return PassThroughEncryptionContext()
@@ -1,15 +1,23 @@
+import hashlib
+import threading
+from collections import OrderedDict
 from getpass import getpass
+from typing import Optional
 
 from cryptography.hazmat.primitives import hashes, serialization
 from cryptography.hazmat.primitives.asymmetric import padding, rsa
 
 from steganography.security.encryptors.generic_encryptor import GenericEncryptor
 from steganography.security.enums.encryption_type import EncryptionType
+from steganography.security.hashing.key_cache import KeyCache
 
 
 class RsaEncryptorWithFile(GenericEncryptor):
 
     # https://cryptography.io/en/latest/hazmat/primitives/asymmetric/rsa/
+    KEY_SIZE = 2048
+    # OAEP with SHA256 uses 2 * 32 + 2 bytes of the key for padding
+    MAX_DATA_SIZE = KEY_SIZE // 8 - 2 * 32 - 2
 
     def __init__(self, decryption: bool, is_test: bool = False):
         super().__init__(EncryptionType.RSA)
@@ -23,13 +31,17 @@ class RsaEncryptorWithFile(GenericEncryptor):
             self.__public_key = self.__private_key.public_key()
 
         else:
-            self.__private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+            self.__private_key = rsa.generate_private_key(public_exponent=65537, key_size=self.KEY_SIZE)
             self.__public_key = self.__private_key.public_key()
 
             if not is_test:
                 private_key_password = getpass('Please enter a password for the private key (empty = no encryption): ')
                 self.__save_keys(private_key_password)
 
+    @staticmethod
+    def encrypted_size(data_size: int) -> int:
+        return RsaEncryptorWithFile.KEY_SIZE // 8
+
     def encrypt(self, data: bytes) -> bytes:
         encrypted_data = self.__public_key.encrypt(
             data,
@@ -99,20 +111,42 @@ class RsaEncryptorWithFile(GenericEncryptor):
 
 
 class RsaEncryptor(GenericEncryptor):
+    """RSA encryptor for a newly created or a given private key (PEM, encrypted with the password)
+
+    Given private keys are loaded once per process and cached by the music id, the digest of the PEM and a digest
+    of the password. The keys are only serialized when get_keys is called.
+    """
 
     # https://cryptography.io/en/latest/hazmat/primitives/asymmetric/rsa/
+    KEY_SIZE = 2048
+    # OAEP with SHA256 uses 2 * 32 + 2 bytes of the key for padding
+    MAX_DATA_SIZE = KEY_SIZE // 8 - 2 * 32 - 2
+    LOADED_KEYS_CACHE_SIZE = 64
 
-    def __init__(self, password: str = None, create: bool = False, private_key: bytes = None):
+    _loaded_keys: "OrderedDict[tuple, rsa.RSAPrivateKey]" = OrderedDict()
+    _loaded_keys_lock = threading.Lock()
+
+    def __init__(
+            self, password: str = None, create: bool = False, private_key: bytes = None, music_id: Optional[int] = None
+    ):
         super().__init__(EncryptionType.RSA)
 
+        # The password is only kept to serialize a created key in get_keys
+        self.__password = password if create else None
+        self.__private_pem = None
+        self.__public_pem = None
         if create:
-            self.__private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+            self.__private_key = rsa.generate_private_key(public_exponent=65537, key_size=self.KEY_SIZE)
             self.__public_key = self.__private_key.public_key()
         else:
-            self.__private_key = self.__load_private_key(password, private_key)
+            self.__private_key = self.__load_private_key(password, private_key, music_id)
             self.__public_key = self.__private_key.public_key()
+            # The given key is already encrypted with the password, so it does not have to be serialized again
+            self.__private_pem = private_key
 
-        self.__save_keys(password)
+    @staticmethod
+    def encrypted_size(data_size: int) -> int:
+        return RsaEncryptor.KEY_SIZE // 8
 
     def encrypt(self, data: bytes) -> bytes:
         encrypted_data = self.__public_key.encrypt(
@@ -139,25 +173,39 @@ class RsaEncryptor(GenericEncryptor):
         return encrypted_data
 
     def __save_keys(self, password: str):
-        encryption = serialization.BestAvailableEncryption(password.encode('UTF-8'))
-        self.__private_pem = self.__private_key.private_bytes(
-            encoding=serialization.Encoding.PEM,
-            format=serialization.PrivateFormat.PKCS8,
-            encryption_algorithm=encryption
-        )
+        if self.__private_pem is None:
+            encryption = serialization.BestAvailableEncryption(password.encode('UTF-8'))
+            self.__private_pem = self.__private_key.private_bytes(
+                encoding=serialization.Encoding.PEM,
+                format=serialization.PrivateFormat.PKCS8,
+                encryption_algorithm=encryption
+            )
         self.__public_pem = self.__public_key.public_bytes(
             encoding=serialization.Encoding.PEM,
             format=serialization.PublicFormat.SubjectPublicKeyInfo
         )
 
     def get_keys(self) -> [bytes, bytes]:
+        if self.__public_pem is None:
+            self.__save_keys(self.__password)
         return [self.__public_pem, self.__private_pem]
 
     @staticmethod
-    def __load_private_key(password_input: str, private_key: bytes):
+    def __load_private_key(password_input: str, private_key: bytes, music_id: Optional[int]):
         password = password_input.encode('UTF-8')
+        cache_key = (music_id, hashlib.sha256(private_key).digest(), KeyCache.password_digest(password))
+        with RsaEncryptor._loaded_keys_lock:
+            key = RsaEncryptor._loaded_keys.get(cache_key)
+            if key is not None:
+                RsaEncryptor._loaded_keys.move_to_end(cache_key)
+                return key
+
         key = serialization.load_pem_private_key(
             private_key,
             password=password,
         )
+        with RsaEncryptor._loaded_keys_lock:
+            RsaEncryptor._loaded_keys[cache_key] = key
+            while len(RsaEncryptor._loaded_keys) > RsaEncryptor.LOADED_KEYS_CACHE_SIZE:
+                RsaEncryptor._loaded_keys.popitem(last=False)
         return key
@@ -7,3 +7,4 @@ class EncryptionType(Enum):
     FERNET = 1
     AES = 2
     RSA = 3
+    HYBRID = 4
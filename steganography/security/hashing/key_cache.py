@@ -0,0 +1,56 @@
+import hashlib
+import hmac
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable
+
+
+class KeyCache:
+    """A bounded, process-local LRU cache of derived keys
+
+    Keys are cached by the hash type, the KDF parameters, the salt and a digest of the password. The digest is
+    an HMAC with a random secret of this process, so neither the password nor a plain hash of it is kept.
+    The cached keys are stored in bytearrays which are overwritten with zeros when they are evicted or cleared,
+    callers get a copy as bytes.
+    """
+
+    MAX_SIZE = 32
+
+    _secret = os.urandom(32)
+    _keys: "OrderedDict[Hashable, bytearray]" = OrderedDict()
+    _lock = threading.Lock()
+
+    @staticmethod
+    def password_digest(password_bytes: bytes) -> bytes:
+        return hmac.new(KeyCache._secret, password_bytes, hashlib.sha256).digest()
+
+    @staticmethod
+    def get_or_derive(cache_key: Hashable, derive: Callable[[], bytes]) -> bytes:
+        """ Return the cached key for cache_key, derive and cache it if it is not cached yet """
+        with KeyCache._lock:
+            key = KeyCache._keys.get(cache_key)
+            if key is not None:
+                KeyCache._keys.move_to_end(cache_key)
+                return bytes(key)
+
+        # Derive outside of the lock, a KDF is slow on purpose
+        key = derive()
+        with KeyCache._lock:
+            if cache_key not in KeyCache._keys:
+                KeyCache._keys[cache_key] = bytearray(key)
+            while len(KeyCache._keys) > KeyCache.MAX_SIZE:
+                _, evicted_key = KeyCache._keys.popitem(last=False)
+                KeyCache._zeroize(evicted_key)
+        return key
+
+    @staticmethod
+    def clear():
+        with KeyCache._lock:
+            for key in KeyCache._keys.values():
+                KeyCache._zeroize(key)
+            KeyCache._keys.clear()
+
+    @staticmethod
+    def _zeroize(key: bytearray):
+        key[:] = bytes(len(key))
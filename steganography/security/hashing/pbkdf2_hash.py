@@ -23,3 +23,6 @@ class Pbkdf2Hash(SaltedHash):
         )
 
         return kdf
+
+    def _get_kdf_parameters(self):
+        return Pbkdf2Hash.HASH_LENGTH, Pbkdf2Hash.HASH_ITERATIONS
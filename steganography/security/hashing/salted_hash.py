@@ -1,8 +1,9 @@
 import os
 from abc import abstractmethod
-from typing import Optional
+from typing import Optional, Tuple
 
 from steganography.security.hashing.generic_hash import GenericHash
+from steganography.security.hashing.key_cache import KeyCache
 from steganography.security.utils.hash_utils import HashUtils
 
 
@@ -12,6 +13,8 @@ class SaltedHash(GenericHash):
     If initialized with said salt, it will use it for all operations. Otherwise, the salt
     will be generated randomly with os.urandom when encrypting. Or it will be asked from
     stdin when decrypting.
+
+    Derived keys are kept in the KeyCache, so the KDF runs once per hash type, parameters, salt and password.
     """
     SALT_LENGTH = 16
 
@@ -48,15 +51,16 @@ class SaltedHash(GenericHash):
         return key
 
     def _derive_key(self, password_bytes: bytes) -> bytes:
-        kdf = self._get_kdf_instance()
-        key = kdf.derive(password_bytes)
-
-        kdf = self._get_kdf_instance()
-        kdf.verify(password_bytes, key)
+        cache_key = (self.HASH_TYPE, self._get_kdf_parameters(), self._salt, KeyCache.password_digest(password_bytes))
 
-        return key
+        return KeyCache.get_or_derive(cache_key, lambda: self._get_kdf_instance().derive(password_bytes))
 
     @abstractmethod
     def _get_kdf_instance(self):
         """Returns key derivation function which differs for each hash function"""
         pass
+
+    @abstractmethod
+    def _get_kdf_parameters(self) -> Tuple:
+        """Returns the parameters of the key derivation function except the salt, as part of the cache key"""
+        pass
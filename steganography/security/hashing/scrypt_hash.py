@@ -24,3 +24,6 @@ class ScryptHash(SaltedHash):
             p=ScryptHash.PARALLELIZATION,
         )
         return kdf
+
+    def _get_kdf_parameters(self):
+        return ScryptHash.HASH_LENGTH, ScryptHash.COST_PARAMETER, ScryptHash.BLOCK_SIZE, ScryptHash.PARALLELIZATION
@@ -0,0 +1,48 @@
+import pytest
+from cryptography.hazmat.primitives import serialization
+
+from steganography.security.encryptors.rsa_encryptor import RsaEncryptor
+from steganography.security.hashing.key_cache import KeyCache
+from steganography.security.hashing.pbkdf2_hash import Pbkdf2Hash
+
+
+def test_key_cache(monkeypatch):
+    KeyCache.clear()
+    derivations = []
+    get_kdf_instance = Pbkdf2Hash._get_kdf_instance
+    monkeypatch.setattr(Pbkdf2Hash, "_get_kdf_instance",
+                        lambda self: derivations.append(self.salt) or get_kdf_instance(self))
+
+    salt = b"s" * 16
+    key = Pbkdf2Hash(salt=salt)._derive_key(b"password")
+    assert Pbkdf2Hash(salt=salt)._derive_key(b"password") == key
+    assert Pbkdf2Hash(salt=salt)._derive_key(b"other password") != key
+    assert Pbkdf2Hash(salt=b"t" * 16)._derive_key(b"password") != key
+    # a single derivation per salt and password
+    assert derivations == [salt, salt, b"t" * 16]
+
+    monkeypatch.setattr(KeyCache, "MAX_SIZE", 3)
+    cached_keys = list(KeyCache._keys.values())
+    Pbkdf2Hash(salt=b"u" * 16)._derive_key(b"password")
+    assert cached_keys[0] == bytes(len(key)) and cached_keys[1] != bytes(len(key))
+    KeyCache.clear()
+    assert all(cached_key == bytes(len(key)) for cached_key in cached_keys)
+
+
+def test_rsa_key_loading(monkeypatch):
+    public_pem, private_pem = RsaEncryptor(password="password", create=True).get_keys()
+    assert b"ENCRYPTED PRIVATE KEY" in private_pem and b"PUBLIC KEY" in public_pem
+
+    loaded_keys = []
+    load_pem_private_key = serialization.load_pem_private_key
+    monkeypatch.setattr(serialization, "load_pem_private_key",
+                        lambda *args, **kwargs: loaded_keys.append(args) or load_pem_private_key(*args, **kwargs))
+    encryptor = RsaEncryptor(password="password", private_key=private_pem, music_id=1)
+    # the private key is decrypted once per music, key and password, and not serialized again
+    assert RsaEncryptor(password="password", private_key=private_pem, music_id=1).decrypt(
+        encryptor.encrypt(b"fingerprint")
+    ) == b"fingerprint"
+    assert encryptor.get_keys() == [public_pem, private_pem]
+    assert len(loaded_keys) == 1
+    with pytest.raises(ValueError):
+        RsaEncryptor(password="wrong password", private_key=private_pem, music_id=1)
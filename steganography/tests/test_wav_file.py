@@ -1,19 +1,42 @@
 import hashlib
+import io
 import random
 import string
+import struct
+import zlib
+from dataclasses import replace
 from pathlib import Path
 
+import numpy as np
 import pytest
+from reedsolo import ReedSolomonError, RSCodec
 
+from handlers.mp3 import AudioFingerprintHandler
+from steganography.error_correction.error_correction_pool import ErrorCorrectionPool
+from steganography.error_correction.error_correction_type import ErrorCorrectionType
 from steganography.error_correction.hamming_error_correction import HammingErrorCorrection
 from steganography.error_correction.none_error_correction import NoneErrorCorrection
 from steganography.error_correction.reed_solomon_error_correction import ReedSolomonErrorCorrection
 from steganography.security.encryption_provider import EncryptionProvider
+from steganography.security.encryptors.fernet_encryptor import FernetEncryptor
+from steganography.security.encryptors.hybrid_encryptor import HybridEncryptor
 from steganography.security.encryptors.none_encryptor import NoneEncryptor
 from steganography.security.encryptors.rsa_encryptor import RsaEncryptor
 from steganography.security.enums.encryption_type import EncryptionType
 from steganography.security.enums.hash_type import HashType
-from steganography.wav_steganography.wav_file import WAVFile
+from steganography.wav_steganography.bit_packing import BitPacking
+from steganography.wav_steganography.block_interleaver import BlockInterleaver
+from steganography.wav_steganography.capacity_planner import CapacityPlanner
+from steganography.wav_steganography.data_chunk import DataChunk
+from steganography.wav_steganography.embedding_config import EmbeddingConfig
+from steganography.wav_steganography.embedding_layout import EmbeddingLayout
+from steganography.wav_steganography.embedding_plan import EmbeddingPlan
+from steganography.wav_steganography.int24 import Int24
+from steganography.wav_steganography.majority_vote import MajorityVote
+from steganography.wav_steganography.message import Message
+from steganography.wav_steganography.scatter_positions import ScatterPositions
+from steganography.wav_steganography.verification_policy import VerificationPolicy
+from steganography.wav_steganography.wav_file import WAVFile, WAVStreamWriter
 
 audio_path = Path("audio")
 
@@ -30,6 +53,22 @@ def get_file_path(filename):
     return encoded_file_path
 
 
+def write_riff_file(file_path, chunks):
+    """ Write a RIFF/WAVE file consisting of the given (chunk_id, body) pairs """
+    body = b''.join(
+        struct.pack("<4sI", chunk_id, len(chunk)) + chunk + b"\0" * (len(chunk) & 1) for chunk_id, chunk in chunks
+    )
+    file_path.write_bytes(b"RIFF" + struct.pack("<I", len(body) + 4) + b"WAVE" + body)
+
+
+def write_wav_file(file_path, raw_samples, bits_per_sample, num_channels=1, audio_format=1, sample_rate=44100):
+    """ Write a WAV file with a plain fmt chunk and the given raw sample bytes """
+    block_align = num_channels * bits_per_sample // 8
+    fmt = struct.pack("<HHIIHH", audio_format, num_channels, sample_rate, sample_rate * block_align, block_align,
+                      bits_per_sample)
+    write_riff_file(file_path, [(b"fmt ", fmt), (b"data", raw_samples)])
+
+
 def test_loading_and_plotting_wav_file():
     for audio_file in audio_path.glob("*.wav"):
         print(f"Loading audio file {audio_file}")
@@ -91,6 +130,23 @@ def single_test_encoding_decoding_with_error_correction(
     return decoded_data
 
 
+def test_verification_policies(monkeypatch):
+    audio_file = audio_path / "voice_hello.wav"
+    data = get_random_string(1000).encode("UTF-8")
+    for verify in VerificationPolicy:
+        for stream in [False, True]:
+            file = WAVFile(audio_file, stream=stream)
+            file.encode(data, verify=verify)
+            assert file.decode() == data
+
+    # Writes which do not change the samples have to be detected by all policies but none
+    monkeypatch.setattr(WAVFile, "_set_last_n_bits_in_array", staticmethod(lambda data_slice, *_: data_slice))
+    for verify in ["header", "checksum"]:
+        with pytest.raises(AssertionError):
+            WAVFile(audio_file).encode(data, verify=verify)
+    WAVFile(audio_file).encode(data, verify="none")
+
+
 def test_multiple_encoding_decoding_with_error_correction():
     error_corrections = [NoneErrorCorrection(), HammingErrorCorrection(), ReedSolomonErrorCorrection()]
 
@@ -113,9 +169,10 @@ def test_multiple_encoding_with_error_correction_and_encryption():
     aes_pbkdf2_encryptor = EncryptionProvider.get_encryptor(EncryptionType.AES, HashType.PBKDF2, is_test=True)
     aes_scrypt_encryptor = EncryptionProvider.get_encryptor(EncryptionType.AES, HashType.SCRYPT, is_test=True)
     rsa_encryptor = EncryptionProvider.get_encryptor(EncryptionType.RSA, is_test=True)
+    hybrid_encryptor = EncryptionProvider.get_encryptor(EncryptionType.HYBRID, is_test=True)
 
     encryptors = [fernet_pbkdf2_encryptor, fernet_scrypt_encryptor,
-                  aes_pbkdf2_encryptor, aes_scrypt_encryptor, rsa_encryptor]
+                  aes_pbkdf2_encryptor, aes_scrypt_encryptor, rsa_encryptor, hybrid_encryptor]
 
     for encryptor in encryptors:
 
@@ -133,6 +190,82 @@ def test_multiple_encoding_with_error_correction_and_encryption():
             file.encode(data, redundant_bits=8, encryptor=encryptor)
 
 
+def test_hybrid_encryption():
+    _, private_pem = RsaEncryptor(password="password", create=True).get_keys()
+    encryptor = HybridEncryptor(RsaEncryptor(password="password", private_key=private_pem))
+
+    # far more data than RSA alone can encrypt, with a single RSA block added
+    data = get_random_string(10000).encode("UTF-8")
+    encrypted_data = encryptor.encrypt(data)
+    assert len(encrypted_data) == HybridEncryptor.encrypted_size(len(data)) == RsaEncryptor.KEY_SIZE // 8 + len(data)
+    assert encrypted_data != encryptor.encrypt(data)
+    assert HybridEncryptor(RsaEncryptor(password="password", private_key=private_pem)).decrypt(encrypted_data) == data
+
+    header_chunk, data_chunk = Message.encode_message(data, 2, 1, 8, encryptor=encryptor)
+    assert Message.decode_header(header_chunk.data).encryption_type == EncryptionType.HYBRID.value
+    assert Message.decode_message(header_chunk.data, data_chunk.data, encryptor) == data
+
+    with pytest.raises(ValueError):
+        HybridEncryptor(NoneEncryptor())
+
+
+def test_hybrid_decoding_without_encryptor(tmp_path):
+    public_pem, private_pem = RsaEncryptor(password="password", create=True).get_keys()
+    file_path = tmp_path / "hybrid.wav"
+    write_wav_file(file_path, np.random.randint(-2 ** 15, 2 ** 15, 100000).astype("<i2").tobytes(), 16)
+    data = get_random_string(1000).encode("UTF-8")
+    encryptor = EncryptionProvider.get_encryptor(EncryptionType.HYBRID, password="password", private_key=private_pem)
+    file = WAVFile(file_path)
+    file.encode(data, redundant_bits=8, encryptor=encryptor)
+
+    # the encryptor given by the header has no private key to unwrap the AES key with
+    for encryption_type in [EncryptionType.RSA, EncryptionType.HYBRID]:
+        with pytest.raises(ValueError, match="requires the private key"):
+            EncryptionProvider.get_encryptor(encryption_type, decryption=True)
+    with pytest.raises(ValueError, match="requires the private key"):
+        file.decode()
+    with pytest.raises(ValueError, match="password"):
+        EncryptionProvider.get_encryptor(EncryptionType.HYBRID, decryption=True, private_key=private_pem)
+
+    decryptor = EncryptionProvider.get_encryptor(
+        EncryptionType.HYBRID, decryption=True, password="password", private_key=private_pem
+    )
+    assert file.decode(encryptor=decryptor) == data
+
+
+def test_streaming_encryption(monkeypatch):
+    data = get_random_string(5000).encode("UTF-8")
+    aes_encryptor = EncryptionProvider.get_encryptor(EncryptionType.AES, HashType.PBKDF2, is_test=True)
+    fernet_encryptor = EncryptionProvider.get_encryptor(EncryptionType.FERNET, HashType.PBKDF2, is_test=True)
+    single_token = fernet_encryptor.encrypt(data)
+    assert fernet_encryptor.decrypt(single_token) == data
+
+    monkeypatch.setattr(FernetEncryptor, "FRAME_SIZE", 1000)
+    for encryptor in [NoneEncryptor(), aes_encryptor, fernet_encryptor]:
+        for data_size in [0, 1, 1000, 1001, 5000]:
+            encryption_context = encryptor.encryption_context()
+            encrypted_data = b"".join(encryption_context.update(data[start:min(start + 300, data_size)])
+                                      for start in range(0, data_size, 300)) + encryption_context.finalize()
+            assert len(encrypted_data) == encryptor.encrypted_size(data_size)
+            assert encryptor.decrypt(encrypted_data) == data[:data_size]
+    # data encrypted as a single token is still decrypted
+    assert fernet_encryptor.decrypt(single_token) == data
+
+    # streaming the data in blocks gives the same message as encoding it at once
+    for error_correction in [ReedSolomonErrorCorrection(), HammingErrorCorrection()]:
+        for encryptor in [NoneEncryptor(), aes_encryptor]:
+            encoded_message = Message.encode_message(data, 2, 1, 8, encryptor, error_correction, repeat_count=2)
+            with monkeypatch.context() as context:
+                context.setattr(Message, "STREAM_BLOCK_SIZE", 700)
+                assert Message.encode_message(
+                    io.BytesIO(data), 2, 1, 8, encryptor, error_correction, repeat_count=2
+                ) == encoded_message
+        header_chunk, data_chunk = Message.encode_message(
+            io.BytesIO(data), 2, 1, 8, fernet_encryptor, error_correction
+        )
+        assert Message.decode_message(header_chunk.data, data_chunk.data, fernet_encryptor, error_correction) == data
+
+
 def test_multiple_encoding_decoding_with_error_correction_and_oversized_data():
     with pytest.raises(ValueError):
         for audio_file in audio_path.glob("*.wav"):
@@ -169,3 +302,559 @@ def test_repeating_data():
         wav_file = WAVFile(audio_path / "voice_hello.wav")
         wav_file.encode(data, least_significant_bits=lsb, every_nth_byte=every_nth_byte, redundant_bits=redundant_bits,
                         repeat_data=True)
+
+
+def record_decoded_redundant_bits(monkeypatch):
+    """ Record the redundant bits of every Reed Solomon decoding, i.e. which data is error corrected """
+    decoded_redundant_bits = []
+    decode = ReedSolomonErrorCorrection.decode
+
+    def recording_decode(data_bytes, redundant_bits):
+        decoded_redundant_bits.append(redundant_bits)
+        return decode(data_bytes, redundant_bits)
+
+    monkeypatch.setattr(ReedSolomonErrorCorrection, "decode", staticmethod(recording_decode))
+    return decoded_redundant_bits
+
+
+def test_majority_vote_decoding(monkeypatch):
+    assert MajorityVote.vote(b"\x0f\x0f\x0e", 3) == b"\x0f"
+    assert MajorityVote.vote(b"ab" * 3, 3) == b"ab"
+
+    data = b"majority vote"
+    file = WAVFile(audio_path / "voice_hello.wav")
+    file.encode(data, least_significant_bits=1, redundant_bits=16, repeat_data=True)
+    _, _, header = file._get_header(ReedSolomonErrorCorrection())
+    assert header.repeat_count > 2
+    assert header.data_size == ReedSolomonErrorCorrection.encoded_size(len(data), 16)
+
+    # destroy the first copy completely, the majority of the copies is still intact and needs no error correction
+    decoded_redundant_bits = record_decoded_redundant_bits(monkeypatch)
+    data_start = Message.header_byte_size(ReedSolomonErrorCorrection()) * 8
+    file.data[data_start:data_start + header.data_size * 8] ^= 1
+    assert file.decode() == data
+    assert 16 not in decoded_redundant_bits
+
+
+def test_skipping_error_correction_of_intact_data(monkeypatch):
+    data = get_random_string(1000).encode("UTF-8")
+    decoded_redundant_bits = record_decoded_redundant_bits(monkeypatch)
+    for error_correction in [ReedSolomonErrorCorrection(), HammingErrorCorrection()]:
+        file = WAVFile(audio_path / "voice_hello.wav")
+        file.encode(data, redundant_bits=16, error_correction=error_correction)
+        _, _, header = file._get_header(error_correction)
+        assert header.data_checksum == zlib.crc32(data)
+
+        decoded_redundant_bits.clear()
+        assert file.decode(error_correction=error_correction) == data
+        assert 16 not in decoded_redundant_bits
+
+        # a damaged byte does not match the checksum, so the data is error corrected
+        data_start = Message.header_byte_size(error_correction) * 8
+        file.data[data_start + 100] ^= 0b10
+        assert file.decode(error_correction=error_correction) == data
+        if isinstance(error_correction, ReedSolomonErrorCorrection):
+            assert 16 in decoded_redundant_bits
+
+
+def test_capacity_planner():
+    fernet_encryptor = EncryptionProvider.get_encryptor(EncryptionType.FERNET, HashType.PBKDF2, is_test=True)
+    planner = CapacityPlanner.from_wav_file(WAVFile(audio_path / "voice_hello.wav"))
+    for encryptor in [NoneEncryptor(), fernet_encryptor]:
+        for error_correction in [NoneErrorCorrection(), ReedSolomonErrorCorrection(), HammingErrorCorrection()]:
+            # Keep the capacity small, the error corrections are slow for large payloads
+            config = EmbeddingConfig(
+                least_significant_bits=random.randint(1, 8),
+                every_nth_byte=random.randint(4, 10),
+                redundant_bits=random.randint(0, 50),
+                encryption_type=encryptor.encryption_type,
+                error_correction_type=error_correction.error_correction_type,
+            )
+            capacity = planner.payload_capacity(config)
+            for payload_size, fits in [(capacity, True), (capacity + 1, False)]:
+                data = get_random_string(payload_size).encode("UTF-8")
+                _, data_chunk = Message.encode_message(
+                    data, config.least_significant_bits, config.every_nth_byte, config.redundant_bits,
+                    encryptor, error_correction,
+                )
+                assert len(data_chunk.data) == planner.data_byte_size(payload_size, config)
+                assert planner.fits(payload_size, config) == fits
+
+                wav_file = WAVFile(audio_path / "voice_hello.wav")
+                arguments = dict(least_significant_bits=config.least_significant_bits,
+                                 every_nth_byte=config.every_nth_byte, redundant_bits=config.redundant_bits,
+                                 encryptor=encryptor, error_correction=error_correction, verify="checksum")
+                if fits:
+                    wav_file.encode(data, **arguments)
+                else:
+                    with pytest.raises(ValueError):
+                        wav_file.encode(data, **arguments)
+
+    config = planner.best_config(1000, redundant_bits=8)
+    assert planner.fits(1000, config)
+    assert not planner.fits(1000, replace(config, every_nth_byte=config.every_nth_byte + 1))
+    assert config.least_significant_bits == 1 or not planner.fits(1000, replace(config, least_significant_bits=1))
+    assert planner.best_config(planner.sample_count * 2) is None
+
+
+def test_embedding_plan():
+    arguments = (60000, 2, 3, 2, 8, ErrorCorrectionType.REED_SOLOMON, EmbeddingLayout.CONTIGUOUS, 100)
+    plan = EmbeddingPlan.get(*arguments)
+    assert plan is EmbeddingPlan.get(*arguments)
+    assert plan.header_byte_size == Message.header_byte_size(ReedSolomonErrorCorrection())
+    header_end = plan.header_byte_size * 8
+    assert plan.header_amplitudes == slice(0, header_end, 1)
+    # 800 bits in 267 symbols of 3 bits, written to every 2nd amplitude after the header
+    assert plan.data_streams == [(slice(0, 100), slice(header_end, header_end + 534, 2))]
+    assert plan.amplitudes_required == header_end + 533
+    assert plan.fits
+    assert not replace(plan, sample_count=plan.amplitudes_required - 1).fits
+
+    # Striped over 2 channels: 50 bytes (134 symbols) in every 2nd sample of each channel, i.e. every 4th amplitude
+    plan = replace(plan, layout=EmbeddingLayout.CHANNEL_STRIPED)
+    assert plan.data_streams == [
+        (slice(0, 50), slice(header_end, header_end + 536, 4)),
+        (slice(50, 100), slice(header_end + 1, header_end + 537, 4)),
+    ]
+    assert plan.amplitudes_required == header_end + 534
+
+
+def test_memory_mapped_loading():
+    for audio_file in audio_path.glob("*.wav"):
+        file = WAVFile(audio_file)
+        mapped_file = WAVFile(audio_file, mmap_mode="r")
+        assert mapped_file.data.dtype == mapped_file._get_data_dtype()
+        assert (mapped_file.data == file.data).all(), "Memory-mapped samples differ from the loaded ones!"
+
+
+def test_memory_mapped_encoding_decoding():
+    for audio_file in audio_path.glob("*.wav"):
+        md5checksum = hashlib.md5(open(audio_file, 'rb').read()).hexdigest()
+        data = get_random_string(1000).encode("UTF-8")
+
+        file = WAVFile(audio_file, mmap_mode="c")
+        file.encode(data, least_significant_bits=16, redundant_bits=8)
+        assert file.decode() == data
+
+        assert md5checksum == hashlib.md5(open(audio_file, 'rb').read()).hexdigest(), "Copy-on-write file changed!"
+
+
+def test_patching_wav_file(tmp_path):
+    for audio_file in audio_path.glob("*.wav"):
+        patched_file_path = tmp_path / audio_file.name
+        patched_file_path.write_bytes(audio_file.read_bytes())
+        data = get_random_string(100).encode("UTF-8")
+
+        file = WAVFile(patched_file_path)
+        file.encode(data, every_nth_byte=3, redundant_bits=8)
+        written_file_path = get_file_path(audio_file.name)
+        file.write(written_file_path, overwrite=True)
+        file.write(patched_file_path, overwrite=True, patch=True)
+
+        assert patched_file_path.read_bytes() == written_file_path.read_bytes(), "Patched file differs!"
+        assert WAVFile(patched_file_path).decode() == data
+
+        with pytest.raises(ValueError):
+            file.write(written_file_path, overwrite=True, patch=True)
+
+
+def test_streaming_encoding_decoding():
+    for audio_file in audio_path.glob("*.wav"):
+        data = get_random_string(1000).encode("UTF-8")
+
+        file = WAVFile(audio_file)
+        streamed_file = WAVFile(audio_file, stream=True)
+        streamed_file.STREAM_BLOCK_SAMPLES = 1000
+        assert (np.concatenate(list(streamed_file.iter_blocks(999))) == file.data).all()
+
+        file.encode(data, every_nth_byte=3, redundant_bits=8)
+        streamed_file.encode(data, every_nth_byte=3, redundant_bits=8)
+        assert streamed_file.decode() == data
+
+        encoded_file_path = get_file_path(audio_file.name)
+        streamed_file_path = get_file_path("streamed_" + audio_file.name)
+        file.write(encoded_file_path, overwrite=True)
+        streamed_file.write(streamed_file_path, overwrite=True)
+        assert encoded_file_path.read_bytes() == streamed_file_path.read_bytes(), "Streamed file differs!"
+
+        with WAVStreamWriter(streamed_file_path, streamed_file, overwrite=True) as writer:
+            for block in streamed_file.iter_blocks(1000, stop=len(file.data) // 2):
+                writer.write_block(block)
+        assert (WAVFile(streamed_file_path).data == file.data[:len(file.data) // 2]).all()
+
+
+def test_scattered_encoding_decoding(tmp_path, monkeypatch):
+    # The permutation must not change between versions, otherwise scattered messages cannot be decoded anymore
+    assert ScatterPositions.permute(b"key", 10, np.arange(10)).tolist() == [5, 4, 9, 6, 2, 3, 7, 0, 1, 8]
+    for sample_count in [1, 2, 17, 1000, 4097]:
+        positions = ScatterPositions.permute(b"key", sample_count, np.arange(sample_count))
+        assert sorted(positions.tolist()) == list(range(sample_count))
+    assert ScatterPositions.get_positions(b"key", 4097, 10, 100, 3).tolist() == sorted(positions[10:100:3])
+
+    # only the positions are cached, up to CACHE_BYTES
+    ScatterPositions.clear()
+    monkeypatch.setattr(ScatterPositions, "CACHE_BYTES", 1000)
+    first_positions = ScatterPositions.get_positions(b"key", 10 ** 9, 0, 100, 1)
+    assert ScatterPositions.get_positions(b"key", 10 ** 9, 0, 100, 1) is first_positions
+    ScatterPositions.get_positions(b"key", 10 ** 9, 100, 200, 1)
+    assert ScatterPositions.get_positions(b"key", 10 ** 9, 0, 100, 1) is not first_positions
+    assert ScatterPositions._cached_bytes <= 1000
+
+    # a streamed file only reads the scattered samples, with the changes of encode applied
+    file_path = tmp_path / "scattered.wav"
+    write_wav_file(file_path, np.random.randint(-2 ** 15, 2 ** 15, 200000).astype("<i2").tobytes(), 16)
+    data = get_random_string(1000).encode("UTF-8")
+    streamed_file = WAVFile(file_path, stream=True)
+    streamed_file.encode(data, every_nth_byte=3, redundant_bits=8, scatter_key=b"key")
+    monkeypatch.setattr(WAVFile, "iter_blocks", None)
+    assert streamed_file.decode(scatter_key=b"key") == data
+    monkeypatch.undo()
+    written_file_path = tmp_path / "written_scattered.wav"
+    streamed_file.write(written_file_path)
+
+    # patching only writes the scattered samples, not the span between the first and the last of them
+    patched_bytes = []
+    samples_to_bytes = WAVFile._samples_to_bytes
+    monkeypatch.setattr(WAVFile, "iter_blocks", None)
+    monkeypatch.setattr(
+        WAVFile, "_samples_to_bytes",
+        lambda self, samples: patched_bytes.append(samples.nbytes) or samples_to_bytes(self, samples)
+    )
+    streamed_file.write(file_path, overwrite=True, patch=True)
+    monkeypatch.undo()
+    # 2 bytes per sample: the header with 1 bit per sample, the encoded data with 2 bits per sample
+    header_samples = Message.header_byte_size(ReedSolomonErrorCorrection()) * 8
+    data_samples = -(-ReedSolomonErrorCorrection.encoded_size(len(data), 8) * 8 // 2)
+    assert sum(patched_bytes) == 2 * (header_samples + data_samples)
+    assert file_path.read_bytes() == written_file_path.read_bytes(), "Patched file differs!"
+    assert WAVFile.decode_from_path(file_path, scatter_key=b"key") == data
+
+    for audio_file in audio_path.glob("*.wav"):
+        data = get_random_string(1000).encode("UTF-8")
+        scatter_key = get_random_string(16).encode("UTF-8")
+
+        file = WAVFile(audio_file)
+        streamed_file = WAVFile(audio_file, stream=True)
+        streamed_file.STREAM_BLOCK_SAMPLES = 1000
+        file.encode(data, every_nth_byte=3, redundant_bits=8, scatter_key=scatter_key)
+        streamed_file.encode(data, every_nth_byte=3, redundant_bits=8, scatter_key=scatter_key, verify="checksum")
+        assert file.decode(scatter_key=scatter_key) == data
+        assert streamed_file.decode(scatter_key=scatter_key) == data
+        with pytest.raises(ReedSolomonError):
+            file.decode()
+
+        encoded_file_path = get_file_path(audio_file.name)
+        streamed_file_path = get_file_path("streamed_" + audio_file.name)
+        file.write(encoded_file_path, overwrite=True)
+        streamed_file.write(streamed_file_path, overwrite=True)
+        assert encoded_file_path.read_bytes() == streamed_file_path.read_bytes(), "Streamed file differs!"
+        assert WAVFile.decode_from_path(encoded_file_path, scatter_key=scatter_key) == data
+
+
+def test_channel_striped_encoding_decoding(tmp_path):
+    for num_channels in [1, 2, 6]:
+        file_path = tmp_path / f"{num_channels}_channels.wav"
+        write_wav_file(file_path, bytes(random.choices(range(256), k=2 * 30000)), 16, num_channels)
+        data = get_random_string(random.randint(1, 1000)).encode("UTF-8")
+
+        for stream in [False, True]:
+            file = WAVFile(file_path, stream=stream)
+            file.encode(data, every_nth_byte=2, redundant_bits=8, layout=EmbeddingLayout.CHANNEL_STRIPED)
+            assert file.decode() == data
+            file.write(tmp_path / "encoded.wav", overwrite=True)
+            assert WAVFile.probe(tmp_path / "encoded.wav").layout == EmbeddingLayout.CHANNEL_STRIPED.value
+            assert WAVFile.decode_from_path(tmp_path / "encoded.wav") == data
+
+            # the samples of all channels are read block by block, without loading them
+            encoded_file = WAVFile(tmp_path / "encoded.wav", stream=stream)
+            encoded_file.STREAM_BLOCK_SAMPLES = 1001
+            assert encoded_file.decode() == data
+            assert encoded_file._data is None
+
+        planner = CapacityPlanner.from_wav_file(WAVFile(file_path))
+        config = EmbeddingConfig(every_nth_byte=2, redundant_bits=8, layout=EmbeddingLayout.CHANNEL_STRIPED)
+        capacity = planner.payload_capacity(config)
+        WAVFile(file_path).encode(b"a" * capacity, every_nth_byte=2, redundant_bits=8, verify="none",
+                                  layout=EmbeddingLayout.CHANNEL_STRIPED)
+        with pytest.raises(ValueError):
+            WAVFile(file_path).encode(b"a" * (capacity + 1), every_nth_byte=2, redundant_bits=8, verify="none",
+                                      layout=EmbeddingLayout.CHANNEL_STRIPED)
+
+
+def test_interleaved_encoding_decoding(tmp_path):
+    assert BlockInterleaver.interleave(b"abcdefgh", 3) == b"adgbehcf"
+    assert BlockInterleaver.deinterleave(b"adgbehcf", 3) == b"abcdefgh"
+    for data_size in [0, 1, 10, 1001]:
+        data = bytes(random.choices(range(256), k=data_size))
+        for depth in [1, 2, 7, 2000]:
+            assert BlockInterleaver.deinterleave(BlockInterleaver.interleave(data, depth), depth) == data
+
+    data = bytes(random.choices(range(256), k=2000))
+    for audio_file in audio_path.glob("*.wav"):
+        file = WAVFile(audio_file)
+        with pytest.raises(ValueError):
+            file.encode(data, interleave_depth=0)
+        file.encode(data, redundant_bits=8, interleave_depth=16)
+        file.write(tmp_path / "interleaved.wav", overwrite=True)
+        assert WAVFile.probe(tmp_path / "interleaved.wav").interleave_depth == 16
+
+        # a burst of 200 damaged bytes after the header would destroy a whole Reed Solomon chunk without interleaving
+        burst_start = Message.header_byte_size(ReedSolomonErrorCorrection()) * 8 + 1000 * 4
+        file.data[burst_start:burst_start + 200 * 4] ^= 0b11
+        assert file.decode() == data
+
+
+def test_preserving_unknown_chunks(tmp_path):
+    for audio_file in audio_path.glob("*.wav"):
+        file = WAVFile(audio_file)
+        h = file.header
+        # WAVE_FORMAT_EXTENSIBLE: cbSize, ValidBitsPerSample, ChannelMask, SubFormat (KSDATAFORMAT_SUBTYPE_PCM)
+        fmt = struct.pack("<HHIIHH", 0xFFFE, h["NumChannels"], h["SampleRate"], h["ByteRate"], h["BlockAlign"],
+                          h["BitsPerSample"])
+        fmt += struct.pack("<HHI", 22, h["BitsPerSample"], 0) + b"\x01\x00\x00\x00\x00\x00\x10\x00\x80\x00\x00\xaa\x00\x38\x9b\x71"
+        chunks = [
+            (b"bext", get_random_string(603).encode("UTF-8")),
+            (b"fmt ", fmt),
+            (b"data", file.data.astype(file._get_data_dtype()).tobytes()),
+            (b"LIST", b"INFOINAM" + struct.pack("<I", 5) + b"Test\0\0"),
+        ]
+        bwf_file_path = tmp_path / audio_file.name
+        write_riff_file(bwf_file_path, chunks)
+
+        bwf_file = WAVFile(bwf_file_path)
+        assert [chunk.chunk_id for chunk in bwf_file.riff_chunks] == [b"bext", b"fmt ", b"data", b"LIST"]
+        assert bwf_file._data is None, "Samples are loaded without being used!"
+        assert bwf_file.read_riff_chunk(b"bext") == chunks[0][1]
+
+        copied_file_path = tmp_path / ("copied_" + audio_file.name)
+        bwf_file.write(copied_file_path)
+        assert copied_file_path.read_bytes() == bwf_file_path.read_bytes(), "Chunks are not preserved!"
+
+        data = get_random_string(100).encode("UTF-8")
+        bwf_file.encode(data, redundant_bits=8)
+        bwf_file.write(bwf_file_path, overwrite=True)
+        encoded_file = WAVFile(bwf_file_path)
+        assert encoded_file.decode() == data
+        assert encoded_file.read_riff_chunk(b"LIST") == chunks[3][1]
+
+
+def test_int24_conversion():
+    raw = bytes(random.choices(range(256), k=3 * 1000))
+    for endianness in "<>":
+        samples = Int24.unpack(raw, endianness)
+        assert -2 ** 23 <= samples.min() and samples.max() < 2 ** 23
+        assert Int24.pack(samples, endianness).tobytes() == raw
+    assert Int24.unpack(b"\x01\x02\xff").tolist() == [-65023]
+
+
+def test_bytes_to_symbols(tmp_path):
+    file_path = tmp_path / "16_bit.wav"
+    write_wav_file(file_path, np.random.randint(-2 ** 15, 2 ** 15, 100000).astype("<i2").tobytes(), 16)
+    # the number of bits of some of the lengths is not a multiple of each symbol width
+    for data_size in [0, 1, 1000, 1001]:
+        data = bytes(random.choices(range(256), k=data_size))
+        bit_string = "".join(f"{byte:08b}" for byte in data)
+        for bits_per_symbol in range(1, 9):
+            assert BitPacking.bytes_to_symbols(data, bits_per_symbol).tolist() == [
+                int(bit_string[start:start + bits_per_symbol], 2)
+                for start in range(0, len(bit_string), bits_per_symbol)
+            ]
+            file = WAVFile(file_path)
+            file.encode(data, least_significant_bits=bits_per_symbol)
+            assert file.decode() == data
+
+
+def test_bit_packing():
+    assert BitPacking.bytes_to_symbols(b"\xa5", 3).tolist() == [5, 1, 1]
+    assert BitPacking.symbols_to_bytes(np.array([5, 1, 1], dtype=np.uint16), 3, 1) == b"\xa5"
+    # bits above bits_per_symbol are ignored
+    assert BitPacking.symbols_to_bytes(np.array([0xfd, 0xf9, 0xf1], dtype=np.uint16), 3, 1) == b"\xa5"
+    data = bytes(random.choices(range(256), k=1001))
+    for bits_per_symbol in range(1, 17):
+        symbols = BitPacking.bytes_to_symbols(data, bits_per_symbol).astype(np.uint16)
+        assert BitPacking.symbols_to_bytes(symbols, bits_per_symbol, len(data)) == data
+
+
+def test_hamming_error_correction():
+    # the codewords are unchanged from the bit string based implementation
+    assert HammingErrorCorrection.encode(b"Hi!", 4) == bytes.fromhex("1985c94510")
+    assert HammingErrorCorrection.encode(b"\x00\xff", 4) == bytes.fromhex("000eef")
+    assert HammingErrorCorrection.decode(bytes.fromhex("1985c94510"), 4) == b"Hi!"
+
+    data = bytes(random.choices(range(256), k=1001))
+    encoded = bytearray(HammingErrorCorrection.encode(data, 4))
+    assert len(encoded) == HammingErrorCorrection.encoded_size(len(data), 4)
+    # flip one random bit in every codeword
+    for codeword_index in range(len(data)):
+        bit_index = codeword_index * 12 + random.randrange(12)
+        encoded[bit_index // 8] ^= 0x80 >> (bit_index % 8)
+    assert HammingErrorCorrection.decode(bytes(encoded), 4) == data
+
+
+def test_hamming_decoding_of_trailing_zero_bytes():
+    # a zero byte is an all-zero codeword, at the end of the data it must not be taken for the padding
+    for data in [b"\x00", b"\x00\x00", b"a\x00", b"ab\x00", b"abc\x00\x00\x00", bytes(1000)]:
+        assert HammingErrorCorrection.decode(HammingErrorCorrection.encode(data, 4), 4) == data
+
+    # the header has an even length, which ends in zero bytes (the data checksum) for this data
+    error_correction = HammingErrorCorrection()
+    header_chunk, _ = Message.encode_message(b"", 2, 1, 0, error_correction=error_correction)
+    assert struct.calcsize(Message.HEADER_FORMAT) % 2 == 0
+    assert Message.decode_header(header_chunk.data, error_correction).data_checksum == 0
+
+
+def test_legacy_header(tmp_path):
+    # a message written before the header had a marker and a format version
+    data = get_random_string(100).encode("UTF-8")
+    encoded_data = ReedSolomonErrorCorrection.encode(data, 8)
+    legacy_header = ReedSolomonErrorCorrection.encode(struct.pack(
+        Message.LEGACY_HEADER_FORMAT, 2, 3, 8, EncryptionType.NONE.value, HashType.PBKDF2.value, b"0" * 16, b"0" * 16,
+        len(encoded_data),
+    ), 8)
+    file_path = tmp_path / "legacy.wav"
+    write_wav_file(file_path, np.random.randint(-2 ** 15, 2 ** 15, 20000).astype("<i2").tobytes(), 16)
+    file = WAVFile(file_path)
+    header_end = len(legacy_header) * 8
+    file._write_symbols(DataChunk(legacy_header, 1, 1), slice(0, header_end, 1))
+    file._write_symbols(DataChunk(encoded_data, 2, 3), slice(header_end, header_end + len(encoded_data) * 4 * 3, 3))
+    file.write(file_path, overwrite=True)
+
+    header = WAVFile.probe(file_path)
+    assert (header.format_version, header.least_significant_bits, header.every_nth_byte) == (1, 2, 3)
+    assert header.data_checksum is None
+    assert WAVFile(file_path).decode() == WAVFile(file_path, stream=True).decode() == data
+
+    header_chunk, _ = Message.encode_message(data, 2, 1, 8)
+    assert Message.decode_header(header_chunk.data).format_version == Message.HEADER_FORMAT_VERSION
+    header_values = list(struct.unpack(Message.HEADER_FORMAT, ReedSolomonErrorCorrection.decode(header_chunk.data, 8)))
+    for index, value in [(1, Message.HEADER_FORMAT_VERSION + 1), (0, b"X")]:
+        changed_header = ReedSolomonErrorCorrection.encode(
+            struct.pack(Message.HEADER_FORMAT, *header_values[:index], value, *header_values[index + 1:]), 8
+        )
+        with pytest.raises(ValueError):
+            Message.decode_header(changed_header)
+
+
+def test_reed_solomon_error_correction():
+    for redundant_bits in [8, 16, 100]:
+        ecc_byte_count = ReedSolomonErrorCorrection._get_ecc_byte_count_per_chunk(redundant_bits)
+        messages = [bytes(random.choices(range(256), k=size)) for size in [0, 1, 200, 254, 255, 600]]
+        encoded_messages = ReedSolomonErrorCorrection.encode_many(messages, redundant_bits)
+        # same ecc bytes as reedsolo on its own
+        assert encoded_messages == [bytes(RSCodec(ecc_byte_count).encode(message)) for message in messages]
+        assert ReedSolomonErrorCorrection.decode_many(encoded_messages, redundant_bits) == messages
+
+        encoded = bytearray(encoded_messages[-1])
+        encoded[3] ^= 0xff
+        encoded[-1] ^= 0xff
+        assert ReedSolomonErrorCorrection.decode(bytes(encoded), redundant_bits) == messages[-1]
+
+
+def test_parallel_error_correction(monkeypatch):
+    data = bytes(random.choices(range(256), k=5001))
+    encoded = {
+        error_correction: bytearray(error_correction.encode(data, 16))
+        for error_correction in [ReedSolomonErrorCorrection, HammingErrorCorrection]
+    }
+    for encoded_data in encoded.values():
+        for index in random.sample(range(len(encoded_data)), 20):
+            encoded_data[index] ^= 1 << random.randrange(8)
+    serial_results = [(error_correction.encode(data, 16), error_correction.decode(bytes(encoded_data), 16))
+                      for error_correction, encoded_data in encoded.items()]
+
+    monkeypatch.setattr(ErrorCorrectionPool, "MIN_PARALLEL_SIZE", 1)
+    monkeypatch.setattr(ErrorCorrectionPool, "MAX_WORKERS", 3)
+    assert len(ErrorCorrectionPool.split(len(data), 2)) == 3
+    parallel_results = [(error_correction.encode(data, 16), error_correction.decode(bytes(encoded_data), 16))
+                        for error_correction, encoded_data in encoded.items()]
+    assert parallel_results == serial_results
+    assert parallel_results[0][1] == data
+
+    assert ErrorCorrectionPool._executor is not None
+    ErrorCorrectionPool.shutdown()
+    assert ErrorCorrectionPool._executor is None
+    assert ErrorCorrectionPool.map(bytes, [b"a", b"b"]) == [b"a", b"b"]
+    ErrorCorrectionPool.shutdown()
+
+
+def test_24_bit_and_float_samples(tmp_path):
+    for audio_file in audio_path.glob("*.wav"):
+        file = WAVFile(audio_file)
+        samples = file.data * 256 + np.random.randint(0, 256, len(file.data))
+        formats = {
+            "24_bit": (Int24.pack(samples).tobytes(), 24, WAVFile.WAVE_FORMAT_PCM),
+            "float": ((samples / 2 ** 23).astype("<f4").tobytes(), 32, WAVFile.WAVE_FORMAT_IEEE_FLOAT),
+        }
+        for name, (raw_samples, bits_per_sample, audio_format) in formats.items():
+            file_path = tmp_path / f"{name}_{audio_file.name}"
+            write_wav_file(file_path, raw_samples, bits_per_sample, file.num_channels, audio_format)
+
+            converted_file = WAVFile(file_path)
+            copied_file_path = tmp_path / f"copied_{name}_{audio_file.name}"
+            converted_file.write(copied_file_path)
+            assert copied_file_path.read_bytes() == file_path.read_bytes(), "Checksums mismatch!"
+
+            data = get_random_string(1000).encode("UTF-8")
+            converted_file.encode(data, least_significant_bits=converted_file._get_embeddable_bits())
+            converted_file.write(copied_file_path, overwrite=True)
+            encoded_file = WAVFile(copied_file_path, stream=True)
+            assert encoded_file.decode() == data
+
+            if audio_format == WAVFile.WAVE_FORMAT_IEEE_FLOAT:
+                # Only the mantissa may change, sign and exponent of every sample stay the same
+                original = np.frombuffer(raw_samples, "<u4")
+                encoded = WAVFile(copied_file_path, mmap_mode="r").data.view("<u4")
+                assert (original >> 23 == encoded >> 23).all()
+
+
+def test_fingerprinting_24_bit_file(tmp_path):
+    file_path = tmp_path / "24_bit.wav"
+    samples = np.random.randint(-2 ** 23, 2 ** 23, 200000)
+    write_wav_file(file_path, Int24.pack(samples).tobytes(), 24, num_channels=2)
+    _, private_key = RsaEncryptor(password="password", create=True).get_keys()
+
+    AudioFingerprintHandler(file_path, private_key, "password").set_fingerprint("fingerprint")
+    assert AudioFingerprintHandler(file_path, private_key, "password").read_fingerprint() == "fingerprint"
+    assert WAVFile(file_path).header["BitsPerSample"] == 24
+
+
+def test_rf64_wav_file(tmp_path, monkeypatch):
+    for audio_file in audio_path.glob("*.wav"):
+        file = WAVFile(audio_file)
+        rf64_file_path = tmp_path / audio_file.name
+        with monkeypatch.context() as patched:
+            patched.setattr(WAVStreamWriter, "RF64_THRESHOLD", 0)
+            file.write(rf64_file_path)
+
+        rf64_file = WAVFile(rf64_file_path)
+        assert rf64_file_path.read_bytes()[:4] == b"RF64"
+        assert [chunk.chunk_id for chunk in rf64_file.riff_chunks] == [b"ds64", b"fmt ", b"data"]
+        assert rf64_file.header["Subchunk2Size"] == file.header["Subchunk2Size"]
+        assert (WAVFile(rf64_file_path, mmap_mode="r").data == file.data).all()
+
+        copied_file_path = tmp_path / ("copied_" + audio_file.name)
+        rf64_file.write(copied_file_path)
+        assert copied_file_path.read_bytes() == rf64_file_path.read_bytes(), "RF64 file changed when copying!"
+
+        data = get_random_string(100).encode("UTF-8")
+        streamed_file = WAVFile(rf64_file_path, stream=True)
+        streamed_file.encode(data, redundant_bits=8)
+        streamed_file.write(rf64_file_path, overwrite=True, patch=True)
+        assert WAVFile(rf64_file_path, stream=True).decode() == data
+
+
+def test_header_first_decoding():
+    for audio_file in audio_path.glob("*.wav"):
+        data = get_random_string(100).encode("UTF-8")
+        file = WAVFile(audio_file)
+        file.encode(data, least_significant_bits=3, every_nth_byte=5, redundant_bits=8)
+        encoded_file_path = get_file_path(audio_file.name)
+        file.write(encoded_file_path, overwrite=True)
+
+        header = WAVFile.probe(encoded_file_path)
+        assert (header.least_significant_bits, header.every_nth_byte, header.redundant_bits) == (3, 5, 8)
+        assert WAVFile.decode_from_path(encoded_file_path) == data
+
+        encoded_file = WAVFile(encoded_file_path)
+        assert encoded_file.decode() == data
+        assert encoded_file._data is None, "Decoding loaded all samples!"
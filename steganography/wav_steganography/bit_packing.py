@@ -0,0 +1,46 @@
+import numpy as np
+
+
+class BitPacking:
+    """ Vectorized conversion between bytes and symbols of n bits each, as they are embedded into the amplitudes
+
+    The bits of all bytes are read from the most significant bit of the first byte onwards and split into
+    symbols of n bits. If the number of bits is not divisible by n, the last symbol consists of the
+    remaining bits only, e.g. b"\\xa5" = 0b10100101 with n = 3: "101", "001", "01" -> [5, 1, 1]
+    """
+
+    @staticmethod
+    def bytes_to_symbols(data: bytes, bits_per_symbol: int) -> np.ndarray:
+        """ Returns the symbols of bits_per_symbol bits (1 to 64) of the given data as uint64 array """
+        bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8))
+        full_symbol_count, remainder = divmod(len(bits), bits_per_symbol)
+
+        symbols = np.zeros(full_symbol_count + (remainder != 0), dtype=np.uint64)
+        full_symbol_bits = bits[:full_symbol_count * bits_per_symbol].reshape(-1, bits_per_symbol)
+        for bit_index in range(bits_per_symbol):
+            symbols[:full_symbol_count] <<= np.uint64(1)
+            symbols[:full_symbol_count] |= full_symbol_bits[:, bit_index]
+
+        for bit in bits[full_symbol_count * bits_per_symbol:]:
+            symbols[-1] = (symbols[-1] << np.uint64(1)) | np.uint64(bit)
+        return symbols
+
+    @staticmethod
+    def symbols_to_bytes(symbols: np.ndarray, bits_per_symbol: int, byte_count: int) -> bytes:
+        """ Inverse of bytes_to_symbols, returns byte_count bytes from the lowest bits_per_symbol bits of symbols
+        Bits above bits_per_symbol are ignored, symbols has to be an unsigned integer array.
+        """
+        full_symbol_count, remainder = divmod(byte_count * 8, bits_per_symbol)
+        full_symbols = symbols[:full_symbol_count]
+
+        bits = np.empty((full_symbol_count * bits_per_symbol + remainder), dtype=np.uint8)
+        full_symbol_bits = bits[:full_symbol_count * bits_per_symbol].reshape(-1, bits_per_symbol)
+        for bit_index in range(bits_per_symbol):
+            shift = full_symbols.dtype.type(bits_per_symbol - 1 - bit_index)
+            full_symbol_bits[:, bit_index] = (full_symbols >> shift) & 1
+
+        if remainder > 0:
+            last_symbol = int(symbols[full_symbol_count])
+            for bit_index in range(remainder):
+                bits[full_symbol_count * bits_per_symbol + bit_index] = (last_symbol >> (remainder - 1 - bit_index)) & 1
+        return np.packbits(bits).tobytes()
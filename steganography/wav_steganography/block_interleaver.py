@@ -0,0 +1,62 @@
+from typing import Tuple
+
+import numpy as np
+
+
+class BlockInterleaver:
+    """Block interleaver between the error correction and the embedding of the data
+
+    The data is written row by row into a matrix with depth rows and read column by column, so bytes which are
+    next to each other in the data end up depth bytes apart. A burst of damaged amplitudes then hits at most
+    ceil(burst / depth) bytes of each row instead of a contiguous run of bytes. With a depth equal to the number
+    of error correction chunks (e.g. the Reed Solomon codewords), each chunk is spread across the whole data.
+
+    The last row may be shorter, the data is not padded and keeps its size. A depth of 1 leaves the data unchanged.
+    The matrix is a reshaped view of the data, which is transposed while copying it, no index arrays are used.
+    """
+
+    MAX_DEPTH = 2 ** 16 - 1
+
+    @staticmethod
+    def interleave(data: bytes, depth: int) -> bytes:
+        if BlockInterleaver._check_depth(depth) == 1 or not data:
+            return data
+        full_rows, row_length, long_columns = BlockInterleaver._get_shape(len(data), depth)
+        data = np.frombuffer(data, dtype=np.uint8)
+        rows = data[:full_rows * row_length].reshape(full_rows, row_length)
+        last_row = data[full_rows * row_length:]
+
+        # The first columns also contain a byte of the last (shorter) row
+        return (
+            np.vstack([rows[:, :long_columns], last_row]).T.tobytes()
+            + rows[:, long_columns:].T.tobytes()
+        )
+
+    @staticmethod
+    def deinterleave(data: bytes, depth: int) -> bytes:
+        if BlockInterleaver._check_depth(depth) == 1 or not data:
+            return data
+        full_rows, row_length, long_columns = BlockInterleaver._get_shape(len(data), depth)
+        data = np.frombuffer(data, dtype=np.uint8)
+        long_column_bytes = long_columns * (full_rows + 1)
+        long_columns_data = data[:long_column_bytes].reshape(long_columns, full_rows + 1).T
+
+        deinterleaved = np.empty(len(data), dtype=np.uint8)
+        rows = deinterleaved[:full_rows * row_length].reshape(full_rows, row_length)
+        rows[:, :long_columns] = long_columns_data[:full_rows]
+        rows[:, long_columns:] = data[long_column_bytes:].reshape(row_length - long_columns, full_rows).T
+        deinterleaved[full_rows * row_length:] = long_columns_data[full_rows]
+        return deinterleaved.tobytes()
+
+    @staticmethod
+    def _get_shape(data_size: int, depth: int) -> Tuple[int, int, int]:
+        """ Return the number of full rows, the row length and the length of the last row (the long columns) """
+        row_length = -(-data_size // depth)
+        full_rows, long_columns = divmod(data_size, row_length)
+        return full_rows, row_length, long_columns
+
+    @staticmethod
+    def _check_depth(depth: int) -> int:
+        if not 1 <= depth <= BlockInterleaver.MAX_DEPTH:
+            raise ValueError(f"ERROR: Interleaving depth must be between 1 and {BlockInterleaver.MAX_DEPTH}: {depth}")
+        return depth
@@ -0,0 +1,152 @@
+from dataclasses import replace
+from typing import Optional
+
+from steganography.error_correction.error_correction_provider import ErrorCorrectionProvider
+from steganography.error_correction.error_correction_type import ErrorCorrectionType
+from steganography.security.encryption_provider import EncryptionProvider
+from steganography.security.enums.encryption_type import EncryptionType
+from steganography.wav_steganography.embedding_config import EmbeddingConfig
+from steganography.wav_steganography.embedding_layout import EmbeddingLayout
+from steganography.wav_steganography.embedding_plan import EmbeddingPlan
+from steganography.wav_steganography.message import Message
+
+
+class CapacityPlanner:
+    """ Calculates how many payload bytes fit into a number of amplitudes, without encoding anything
+    The sizes are derived from the header, the encryption and the error correction, e.g. with Fernet,
+    Reed Solomon and redundant_bits=8 a 100 byte payload becomes a 228 byte Fernet token, which is
+    encoded into 484 bytes. Usage:
+        planner = CapacityPlanner.from_wav_file(wav_file)
+        planner.payload_capacity(EmbeddingConfig(least_significant_bits=2, every_nth_byte=4))
+        planner.best_config(len(payload))
+    """
+
+    # Largest values which can be stored in the header fields, see Message.HEADER_FORMAT
+    MAX_LEAST_SIGNIFICANT_BITS = 2 ** 8 - 1
+    MAX_EVERY_NTH_BYTE = 2 ** 16 - 1
+    MAX_DATA_SIZE = 2 ** 32 - 1
+    MAX_REPEAT_COUNT = 2 ** 32 - 1
+
+    def __init__(self, sample_count: int, embeddable_bits: int, num_channels: int = 1):
+        self.sample_count = sample_count
+        self.embeddable_bits = embeddable_bits
+        self.num_channels = num_channels
+
+    @classmethod
+    def from_wav_file(cls, wav_file) -> "CapacityPlanner":
+        return cls(wav_file._get_sample_count(), wav_file._get_embeddable_bits(), wav_file.num_channels)
+
+    @staticmethod
+    def data_byte_size(payload_size: int, config: EmbeddingConfig) -> int:
+        """ Return the size of the data chunk for a payload of payload_size bytes, i.e. encrypted and encoded """
+        encryptor_class = EncryptionProvider.get_encryptor_class(config.encryption_type)
+        error_correction = ErrorCorrectionProvider.get_error_correction(config.error_correction_type)
+        return error_correction.encoded_size(encryptor_class.encrypted_size(payload_size), config.redundant_bits)
+
+    @staticmethod
+    def header_amplitudes(config: EmbeddingConfig) -> slice:
+        return EmbeddingPlan.header_amplitudes_for(Message.header_byte_size_for(config.error_correction_type))
+
+    def data_amplitudes_available(self, config: EmbeddingConfig) -> int:
+        """ Return the number of amplitudes after the header """
+        return max(0, self.sample_count - self.header_amplitudes(config).stop)
+
+    def fits(self, payload_size: int, config: EmbeddingConfig) -> bool:
+        """ Return whether a payload of payload_size bytes can be encoded with the given config """
+        if not 1 <= config.least_significant_bits <= min(self.embeddable_bits, self.MAX_LEAST_SIGNIFICANT_BITS):
+            return False
+        if not 1 <= config.every_nth_byte <= self.MAX_EVERY_NTH_BYTE:
+            return False
+        max_encryptable_size = EncryptionProvider.get_encryptor_class(config.encryption_type).MAX_DATA_SIZE
+        if max_encryptable_size is not None and payload_size > max_encryptable_size:
+            return False
+
+        data_byte_size = self.data_byte_size(payload_size, config)
+        return data_byte_size <= self.MAX_DATA_SIZE and self._data_fits(data_byte_size, config)
+
+    def _data_fits(self, data_byte_size: int, config: EmbeddingConfig) -> bool:
+        """ Return whether data_byte_size bytes of (encrypted and encoded) data fit after the header """
+        header_amplitudes = self.header_amplitudes(config)
+        data_streams = EmbeddingPlan.data_streams_for(
+            header_amplitudes.stop,
+            data_byte_size,
+            config.least_significant_bits,
+            config.every_nth_byte,
+            config.layout,
+            self.num_channels,
+        )
+        amplitudes_required = EmbeddingPlan.amplitudes_spanned(
+            [header_amplitudes] + [amplitudes for _, amplitudes in data_streams]
+        )
+        return amplitudes_required <= self.sample_count
+
+    def payload_capacity(self, config: EmbeddingConfig) -> int:
+        """ Return the largest number of payload bytes which can be encoded with the given config, -1 if none
+        -1 means that not even an empty payload fits, e.g. because the Fernet token of it is too large.
+        """
+        # The encrypted and encoded sizes grow monotonically with the payload size, therefore the largest
+        # payload which fits can be found by bisection. As the encoded size is at least the payload size,
+        # the number of bits after the header is an upper bound.
+        low, high = -1, self.data_amplitudes_available(config) * config.least_significant_bits // 8
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.fits(middle, config):
+                low = middle
+            else:
+                high = middle - 1
+        return low
+
+    def repeat_count(self, payload_size: int, config: EmbeddingConfig) -> int:
+        """ Return how many copies of the encoded payload of payload_size bytes fit (as with repeat_data=True) """
+        if payload_size <= 0:
+            raise ValueError(f"ERROR: Cannot repeat a payload of {payload_size} bytes.")
+        if not self.fits(payload_size, config):
+            return 0
+
+        copy_size = self.data_byte_size(payload_size, config)
+        bits_available = self.data_amplitudes_available(config) * config.least_significant_bits
+        low, high = 1, min(self.MAX_REPEAT_COUNT, bits_available // (8 * copy_size))
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self._data_fits(middle * copy_size, config):
+                low = middle
+            else:
+                high = middle - 1
+        return low
+
+    def best_config(
+            self,
+            payload_size: int,
+            redundant_bits: int = 0,
+            encryption_type: EncryptionType = EncryptionType.NONE,
+            error_correction_type: ErrorCorrectionType = ErrorCorrectionType.REED_SOLOMON,
+            layout: EmbeddingLayout = EmbeddingLayout.CONTIGUOUS,
+    ) -> Optional[EmbeddingConfig]:
+        """ Return the least audible config for the payload, None if the payload does not fit at all
+        This uses as few least significant bits as possible and then spreads the data as far as possible,
+        i.e. the largest every_nth_byte for which the data still fits.
+        """
+        config = EmbeddingConfig(
+            least_significant_bits=1,
+            every_nth_byte=1,
+            redundant_bits=redundant_bits,
+            encryption_type=encryption_type,
+            error_correction_type=error_correction_type,
+            layout=layout,
+        )
+
+        for least_significant_bits in range(1, min(self.embeddable_bits, self.MAX_LEAST_SIGNIFICANT_BITS) + 1):
+            config = replace(config, least_significant_bits=least_significant_bits)
+            if not self.fits(payload_size, config):
+                continue
+
+            # The required amplitudes grow with every_nth_byte, so the largest one which fits is found by bisection
+            low, high = 1, self.MAX_EVERY_NTH_BYTE
+            while low < high:
+                middle = (low + high + 1) // 2
+                if self.fits(payload_size, replace(config, every_nth_byte=middle)):
+                    low = middle
+                else:
+                    high = middle - 1
+            return replace(config, every_nth_byte=low)
+        return None
@@ -0,0 +1,16 @@
+from dataclasses import dataclass
+
+from steganography.error_correction.error_correction_type import ErrorCorrectionType
+from steganography.security.enums.encryption_type import EncryptionType
+from steganography.wav_steganography.embedding_layout import EmbeddingLayout
+
+
+@dataclass(frozen=True)
+class EmbeddingConfig:
+    """ The parameters of WAVFile.encode which determine how many amplitudes a message requires """
+    least_significant_bits: int = 2
+    every_nth_byte: int = 1
+    redundant_bits: int = 0
+    encryption_type: EncryptionType = EncryptionType.NONE
+    error_correction_type: ErrorCorrectionType = ErrorCorrectionType.REED_SOLOMON
+    layout: EmbeddingLayout = EmbeddingLayout.CONTIGUOUS
@@ -0,0 +1,11 @@
+from enum import Enum
+
+
+class EmbeddingLayout(Enum):
+    """ How the data of a message is distributed over the amplitudes after the header
+    CONTIGUOUS: every nth amplitude of the interleaved samples, regardless of the channel
+    CHANNEL_STRIPED: the data is split into one part per channel, each written to every nth sample of its channel
+    """
+
+    CONTIGUOUS = 0
+    CHANNEL_STRIPED = 1
@@ -0,0 +1,126 @@
+from dataclasses import dataclass
+from functools import cached_property, lru_cache
+from typing import List, Tuple
+
+from steganography.error_correction.error_correction_type import ErrorCorrectionType
+from steganography.wav_steganography.embedding_layout import EmbeddingLayout
+from steganography.wav_steganography.message import Message
+
+
+@dataclass(frozen=True)
+class EmbeddingPlan:
+    """ Where the header and the data of a message are located in the amplitudes
+    A plan only depends on its fields, so it is shared between all files with the same format and length
+    carrying a message of the same size, e.g. when fingerprinting many copies of the same master.
+    Use EmbeddingPlan.get to get a cached plan, the derived values are computed once per plan.
+    """
+
+    # Number of plans kept by EmbeddingPlan.get
+    CACHE_SIZE = 256
+
+    sample_count: int
+    num_channels: int
+    least_significant_bits: int
+    every_nth_byte: int
+    redundant_bits: int
+    error_correction_type: ErrorCorrectionType
+    layout: EmbeddingLayout
+    # Size of the (encrypted and encoded) data in bytes, as stored in the header
+    data_size: int
+
+    @staticmethod
+    @lru_cache(maxsize=CACHE_SIZE)
+    def get(
+            sample_count: int,
+            num_channels: int,
+            least_significant_bits: int,
+            every_nth_byte: int,
+            redundant_bits: int,
+            error_correction_type: ErrorCorrectionType,
+            layout: EmbeddingLayout,
+            data_size: int,
+    ) -> "EmbeddingPlan":
+        return EmbeddingPlan(
+            sample_count,
+            num_channels,
+            least_significant_bits,
+            every_nth_byte,
+            redundant_bits,
+            error_correction_type,
+            layout,
+            data_size,
+        )
+
+    @cached_property
+    def header_byte_size(self) -> int:
+        return Message.header_byte_size_for(self.error_correction_type)
+
+    @cached_property
+    def header_amplitudes(self) -> slice:
+        """ The amplitudes holding the header, to be used as data[header_amplitudes] """
+        return self.header_amplitudes_for(self.header_byte_size)
+
+    @cached_property
+    def data_streams(self) -> List[Tuple[slice, slice]]:
+        """ The parts of the data as (byte range, amplitudes), see data_streams_for """
+        return self.data_streams_for(
+            self.header_amplitudes.stop,
+            self.data_size,
+            self.least_significant_bits,
+            self.every_nth_byte,
+            self.layout,
+            self.num_channels,
+        )
+
+    @cached_property
+    def amplitudes_required(self) -> int:
+        """ Number of amplitudes from the start of the file up to and including the last one holding data """
+        return self.amplitudes_spanned([self.header_amplitudes] + [amplitudes for _, amplitudes in self.data_streams])
+
+    @property
+    def fits(self) -> bool:
+        return self.amplitudes_required <= self.sample_count
+
+    @staticmethod
+    def header_amplitudes_for(header_byte_size: int) -> slice:
+        symbol_count = -(-header_byte_size * 8 // Message.HEADER_LSB_COUNT)
+        return slice(0, symbol_count * Message.HEADER_EVERY_NTH_BYTE, Message.HEADER_EVERY_NTH_BYTE)
+
+    @staticmethod
+    def data_streams_for(
+            start: int,
+            data_size: int,
+            least_significant_bits: int,
+            every_nth_byte: int,
+            layout: EmbeddingLayout,
+            num_channels: int,
+    ) -> List[Tuple[slice, slice]]:
+        """ Split data of data_size bytes written from amplitude start on into (byte range, amplitudes) parts
+        CONTIGUOUS is a single part. CHANNEL_STRIPED splits the data into num_channels parts of equal size
+        (the last one may be shorter), part c is written to every nth sample of channel c, starting with
+        the first frame after start. E.g. in a stereo file with nth = 2, the first part is written to the
+        amplitudes start, start + 4, ... and the second one to start + 1, start + 5, ... (start being even).
+        """
+        if layout == EmbeddingLayout.CONTIGUOUS:
+            symbol_count = -(-data_size * 8 // least_significant_bits)
+            return [(slice(0, data_size), slice(start, start + symbol_count * every_nth_byte, every_nth_byte))]
+
+        first_frame = -(-start // num_channels)
+        part_size = -(-data_size // num_channels)
+        streams = []
+        for channel in range(num_channels):
+            byte_range = slice(min(channel * part_size, data_size), min((channel + 1) * part_size, data_size))
+            symbol_count = -(-(byte_range.stop - byte_range.start) * 8 // least_significant_bits)
+            step = every_nth_byte * num_channels
+            channel_start = first_frame * num_channels + channel
+            streams.append((byte_range, slice(channel_start, channel_start + symbol_count * step, step)))
+        return streams
+
+    @staticmethod
+    def amplitudes_spanned(amplitudes: List[slice]) -> int:
+        """ Number of amplitudes from the start up to and including the last one of any of the given slices """
+        return max(
+            (part.start + (len(range(part.start, part.stop, part.step)) - 1) * part.step + 1
+             for part in amplitudes if part.stop > part.start),
+            default=0,
+        )
@@ -0,0 +1,31 @@
+import numpy as np
+
+
+class Int24:
+    """ Vectorized conversion between packed 24-bit PCM samples and 32-bit integers
+
+    There is no 24-bit numpy dtype, therefore each 3 byte sample is placed in the upper 3 bytes of a
+    4 byte integer (the lowest byte being 0), which is the sample shifted left by 8. An arithmetic
+    shift right by 8 then results in the sign extended 32-bit sample, e.g. for little-endian:
+        b"\x01\x02\xff"  ->  b"\x00\x01\x02\xff"  =  0xff020100  ->  >> 8  ->  0xffff0201
+    Packing reverses this: shift left by 8 and drop the lowest byte of each integer.
+    """
+    BYTE_COUNT = 3
+
+    @staticmethod
+    def unpack(raw: bytes, endianness: str = '<') -> np.ndarray:
+        """ Returns the samples of the packed 24-bit buffer as int32 """
+        packed = np.frombuffer(raw, dtype=np.uint8).reshape(-1, Int24.BYTE_COUNT)
+        padded = np.zeros((len(packed), 4), dtype=np.uint8)
+        if endianness == '<':
+            padded[:, 1:] = packed
+        else:
+            padded[:, :3] = packed
+        return (padded.view(f"{endianness}i4").ravel() >> 8).astype(np.int32, copy=False)
+
+    @staticmethod
+    def pack(samples: np.ndarray, endianness: str = '<') -> np.ndarray:
+        """ Returns the samples as (n, 3) array of bytes, which can be written with tofile/tobytes """
+        shifted = (samples.astype(np.int32) << 8).astype(f"{endianness}i4", copy=False)
+        as_bytes = shifted.view(np.uint8).reshape(-1, 4)
+        return np.ascontiguousarray(as_bytes[:, 1:] if endianness == '<' else as_bytes[:, :3])
@@ -0,0 +1,19 @@
+import numpy as np
+
+
+class MajorityVote:
+    """ Combines several copies of the same data into one by a bitwise majority vote """
+
+    @staticmethod
+    def vote(data: bytes, copy_count: int) -> bytes:
+        """ Return the majority of each bit of the copy_count copies in data
+        Bits with a tie (only possible with an even number of copies) are unset.
+        """
+        if copy_count < 1 or len(data) % copy_count:
+            raise ValueError(f"ERROR: Cannot split {len(data)} bytes into {copy_count} copies.")
+        copies = np.frombuffer(data, dtype=np.uint8).reshape(copy_count, len(data) // copy_count)
+        if (copies == copies[0]).all():
+            return copies[0].tobytes()
+
+        votes = np.unpackbits(copies, axis=1).sum(axis=0, dtype=np.uint32)
+        return np.packbits(votes * 2 > copy_count).tobytes()
@@ -1,58 +1,139 @@
 import struct
-from typing import Union, Optional, Tuple
+import zlib
+from functools import lru_cache
+from typing import BinaryIO, Iterable, Iterator, Union, Optional, Tuple, NamedTuple
 
+from reedsolo import ReedSolomonError
 
+from steganography.error_correction.error_correction_provider import ErrorCorrectionProvider
+from steganography.error_correction.error_correction_type import ErrorCorrectionType
 from steganography.error_correction.generic_error_correction import GenericErrorCorrection
 from steganography.error_correction.reed_solomon_error_correction import ReedSolomonErrorCorrection
 from steganography.security.encryption_provider import EncryptionProvider
 from steganography.security.encryptors.aes_encryptor import AesEncryptor
+from steganography.security.encryptors.encryption_context import EncryptionContext
 from steganography.security.encryptors.generic_encryptor import GenericEncryptor
 from steganography.security.encryptors.none_encryptor import NoneEncryptor
 from steganography.security.enums.encryption_type import EncryptionType
 from steganography.security.enums.hash_type import HashType
 from steganography.security.hashing.salted_hash import SaltedHash
+from steganography.wav_steganography.block_interleaver import BlockInterleaver
 from steganography.wav_steganography.data_chunk import DataChunk
+from steganography.wav_steganography.embedding_layout import EmbeddingLayout
+from steganography.wav_steganography.majority_vote import MajorityVote
+
+
+class MessageHeader(NamedTuple):
+    """ The decoded header values, in the order of Message.HEADER_FORMAT """
+    marker: bytes
+    format_version: int
+    least_significant_bits: int
+    every_nth_byte: int
+    layout: int
+    redundant_bits: int
+    interleave_depth: int
+    encryption_type: int
+    hash_type: int
+    salt: bytes
+    nonce: bytes
+    repeat_count: int
+    data_size: int
+    # None for a legacy header, the error correction is always applied then
+    data_checksum: Optional[int]
 
 
 class Message:
     """ A message class implementing an Encoder and an Decoder
     This header is used to encode the meta information for the message before the actual data part.
-    Currently, this consists of 8 values:
+    Currently, this consists of 14 values:
+        * The header marker (HEADER_MARKER)
+        * The version of the header format (HEADER_FORMAT_VERSION)
         * The least significant bits used in the data
         * The nth bits used in the data
+        * The layout of the data (as defined in EmbeddingLayout)
         * The number of redundant bits per byte used in the data (4 means a byte becomes 12 bits in size)
-        * The encryption type (0 to 3, as defined in EncryptionType)
+        * The depth of the block interleaver applied after the error correction (1 means no interleaving)
+        * The encryption type (0 to 4, as defined in EncryptionType)
         * The hash type (0 to 2, as defined in HashType)
         * The password hash salt (hardcoded as 16 bytes, only used if encryption is used)
         * The nonce (hardcoded as 16 bytes, only used if encryption is AES)
-        * The length of the data in bytes (excluding the header)
+        * The number of copies of the data which are written one after the other
+        * The length of (one copy of) the data in bytes (excluding the header)
+        * The CRC32 of the encrypted data before error correction, to skip the error correction for intact data
     For the header, the values are defined below.
+    The legacy header (LEGACY_HEADER_FORMAT, format version 1) has no marker and no version, nor the values
+    which were added with them. It starts with the least significant bits, which are never the marker, so it is
+    recognized by decode_header and returned with a contiguous layout, a single copy and no data checksum.
     """
-    HEADER_FORMAT = f"<BHHBB{SaltedHash.SALT_LENGTH}s{AesEncryptor.NONCE_LENGTH}sI"
+    HEADER_FORMAT = f"<cBBHBHHBB{SaltedHash.SALT_LENGTH}s{AesEncryptor.NONCE_LENGTH}sIII"
+    HEADER_MARKER = b"V"
+    HEADER_FORMAT_VERSION = 2
+    LEGACY_HEADER_FORMAT = f"<BHHBB{SaltedHash.SALT_LENGTH}s{AesEncryptor.NONCE_LENGTH}sI"
     HEADER_LSB_COUNT = 1
     HEADER_EVERY_NTH_BYTE = 1
     HEADER_REDUNDANT_BITS = 8
+    # The data is encrypted and error corrected in blocks of about this size
+    STREAM_BLOCK_SIZE = 2 ** 22
 
     @staticmethod
     def header_byte_size(error_correction) -> int:
-        return len(error_correction.encode(b'a' * struct.calcsize(Message.HEADER_FORMAT),
-                                                     Message.HEADER_REDUNDANT_BITS))
+        return Message.header_byte_size_for(error_correction.error_correction_type)
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def header_byte_size_for(error_correction_type: ErrorCorrectionType) -> int:
+        """ The header size only depends on the error correction, so it is calculated once per type """
+        error_correction = ErrorCorrectionProvider.get_error_correction(error_correction_type)
+        return error_correction.encoded_size(struct.calcsize(Message.HEADER_FORMAT), Message.HEADER_REDUNDANT_BITS)
+
+    @staticmethod
+    def legacy_header_byte_size(error_correction) -> int:
+        return error_correction.encoded_size(
+            struct.calcsize(Message.LEGACY_HEADER_FORMAT), Message.HEADER_REDUNDANT_BITS
+        )
 
     @staticmethod
     def encode_message(
-            data: Union[bytes, str],
+            data: Union[bytes, str, BinaryIO],
             least_significant_bits: int,
             every_nth_byte: int,
             redundant_bits: int,
             encryptor: GenericEncryptor = NoneEncryptor(),
-            error_correction: GenericErrorCorrection = ReedSolomonErrorCorrection()
+            error_correction: GenericErrorCorrection = ReedSolomonErrorCorrection(),
+            layout: EmbeddingLayout = EmbeddingLayout.CONTIGUOUS,
+            interleave_depth: int = 1,
+            repeat_count: int = 1,
     ) -> Tuple[DataChunk, DataChunk]:
+        """Returns the header and the data, which consists of repeat_count copies of the encoded message
+
+        data may also be a binary file object, which is read in blocks of STREAM_BLOCK_SIZE bytes. The blocks are
+        passed through the encryption and the error correction one after the other, so neither the message nor the
+        encrypted message are held in memory as a whole. The encoded data is, and the returned data chunk holds all
+        repeat_count copies of it, as they are written into the samples together.
+        """
+
+        # Encrypt first, then add error correction and interleave in this order
+        encrypted_blocks = Message.__encrypted_blocks(
+            Message.__message_blocks(data, Message.STREAM_BLOCK_SIZE), encryptor.encryption_context()
+        )
+        error_correction_block_size = error_correction.block_size(redundant_bits)
+        error_correction_block_size *= max(1, Message.STREAM_BLOCK_SIZE // error_correction_block_size)
 
-        data: bytes = Message.__message_as_bytes(data)
+        data_checksum = 0
+        pending_data = bytearray()
+        encoded_blocks = []
+        for encrypted_block in encrypted_blocks:
+            data_checksum = zlib.crc32(encrypted_block, data_checksum)
+            pending_data += encrypted_block
+            encodable_size = len(pending_data) // error_correction_block_size * error_correction_block_size
+            if encodable_size:
+                encoded_blocks.append(error_correction.encode(bytes(pending_data[:encodable_size]), redundant_bits))
+                del pending_data[:encodable_size]
+        encoded_blocks.append(error_correction.encode(bytes(pending_data), redundant_bits))
 
-        # Encrypt first, then add error correction in this order
-        data = encryptor.encrypt(data)
-        data = error_correction.encode(data, redundant_bits)
+        data = BlockInterleaver.interleave(b"".join(encoded_blocks), interleave_depth)
+        # The blocks are copied into data, they are not kept for the copies of the data below
+        del encoded_blocks
 
         # Get salt/nonce values if the given encryptor has these values, otherwise use all 0 default salt/nonce
         salt = getattr(encryptor, "salt", b"0" * SaltedHash.SALT_LENGTH)
@@ -62,25 +143,55 @@ class Message:
         # Pack header data according to structure described in message
         header_data = struct.pack(
             Message.HEADER_FORMAT,
+            Message.HEADER_MARKER,
+            Message.HEADER_FORMAT_VERSION,
             least_significant_bits,
             every_nth_byte,
+            layout.value,
             redundant_bits,
+            interleave_depth,
             encryptor.encryption_type.value,
             hash_type.value,
             salt,
             nonce,
+            repeat_count,
             len(data),
+            data_checksum,
         )
 
         header_data = error_correction.encode(header_data, Message.HEADER_REDUNDANT_BITS)
         header_chunk = DataChunk(header_data, Message.HEADER_LSB_COUNT, Message.HEADER_EVERY_NTH_BYTE)
-        data_chunk = DataChunk(data, least_significant_bits, every_nth_byte)
+        data_chunk = DataChunk(data * repeat_count, least_significant_bits, every_nth_byte)
         return header_chunk, data_chunk
 
     @staticmethod
-    def decode_header(header_bytes, error_correction: GenericErrorCorrection = ReedSolomonErrorCorrection()):
-        header_bytes = error_correction.decode(header_bytes, Message.HEADER_REDUNDANT_BITS)
-        return struct.unpack(Message.HEADER_FORMAT, header_bytes)
+    def decode_header(
+            header_bytes,
+            error_correction: GenericErrorCorrection = ReedSolomonErrorCorrection()
+    ) -> MessageHeader:
+        """ Decode the header, a legacy header is returned with the values added since then set to their defaults """
+        try:
+            header = MessageHeader._make(struct.unpack(
+                Message.HEADER_FORMAT, error_correction.decode(header_bytes, Message.HEADER_REDUNDANT_BITS)
+            ))
+        except ReedSolomonError:
+            # The legacy header is shorter, the bytes after it belong to the data
+            legacy_header = Message.__decode_legacy_header(header_bytes, error_correction)
+            if legacy_header is None:
+                raise
+            return legacy_header
+
+        if header.marker != Message.HEADER_MARKER:
+            legacy_header = Message.__decode_legacy_header(header_bytes, error_correction)
+            if legacy_header is None:
+                raise ValueError("ERROR: No message header found.")
+            return legacy_header
+        if header.format_version != Message.HEADER_FORMAT_VERSION:
+            raise ValueError(
+                f"ERROR: Unsupported header format version {header.format_version}, "
+                f"only versions 1 and {Message.HEADER_FORMAT_VERSION} can be decoded."
+            )
+        return header
 
     @staticmethod
     def decode_message(
@@ -89,26 +200,80 @@ class Message:
             encryptor: Optional[GenericEncryptor] = None,
             error_correction: GenericErrorCorrection = ReedSolomonErrorCorrection(),
     ):
-        *_, redundant_bits, encryption_type, hash_type, salt, nonce, data_size = \
-            Message.decode_header(header_bytes, error_correction)
+        header = Message.decode_header(header_bytes, error_correction)
 
         if encryptor is None:
             encryptor = EncryptionProvider.get_encryptor(
-                EncryptionType(encryption_type),
-                HashType(hash_type),
+                EncryptionType(header.encryption_type),
+                HashType(header.hash_type),
                 decryption=True,
-                salt=salt,
-                nonce=nonce,
+                salt=header.salt,
+                nonce=header.nonce,
             )
 
-        data = error_correction.decode(data_bytes, redundant_bits)
+        data = MajorityVote.vote(data_bytes, header.repeat_count)
+        data = BlockInterleaver.deinterleave(data, header.interleave_depth)
+
+        # Intact data matches the checksum without error correction, which is only applied otherwise
+        extracted_data = error_correction.extract(data, header.redundant_bits)
+        if zlib.crc32(extracted_data) == header.data_checksum:
+            data = extracted_data
+        else:
+            data = error_correction.decode(data, header.redundant_bits)
         data = encryptor.decrypt(data)
 
         return data
 
     @staticmethod
-    def __message_as_bytes(message: Union[bytes, str]):
+    def __decode_legacy_header(
+            header_bytes: bytes, error_correction: GenericErrorCorrection
+    ) -> Optional[MessageHeader]:
+        """ Decode the legacy header at the start of header_bytes, None if there is no valid one """
+        try:
+            (least_significant_bits, every_nth_byte, redundant_bits, encryption_type, hash_type, salt, nonce,
+             data_size) = struct.unpack(
+                Message.LEGACY_HEADER_FORMAT,
+                error_correction.decode(
+                    header_bytes[:Message.legacy_header_byte_size(error_correction)], Message.HEADER_REDUNDANT_BITS
+                ),
+            )
+        except (ReedSolomonError, struct.error):
+            return None
+        # At most 32 bits per sample, the legacy encryption types are 0 to 3
+        if not (1 <= least_significant_bits <= 32 and every_nth_byte >= 1
+                and encryption_type <= EncryptionType.RSA.value and hash_type in {hash_.value for hash_ in HashType}):
+            return None
+        return MessageHeader(
+            marker=b"",
+            format_version=1,
+            least_significant_bits=least_significant_bits,
+            every_nth_byte=every_nth_byte,
+            layout=EmbeddingLayout.CONTIGUOUS.value,
+            redundant_bits=redundant_bits,
+            interleave_depth=1,
+            encryption_type=encryption_type,
+            hash_type=hash_type,
+            salt=salt,
+            nonce=nonce,
+            repeat_count=1,
+            data_size=data_size,
+            data_checksum=None,
+        )
+
+    @staticmethod
+    def __message_blocks(message: Union[bytes, str, BinaryIO], block_size: int) -> Iterator[bytes]:
         if isinstance(message, str):
             message = message.encode("UTF-8")
 
-        return message
+        if hasattr(message, "read"):
+            yield from iter(lambda: message.read(block_size), b"")
+        else:
+            message = memoryview(message)
+            for start in range(0, len(message), block_size):
+                yield message[start:start + block_size]
+
+    @staticmethod
+    def __encrypted_blocks(blocks: Iterable[bytes], encryption_context: EncryptionContext) -> Iterator[bytes]:
+        for block in blocks:
+            yield encryption_context.update(block)
+        yield encryption_context.finalize()
@@ -0,0 +1,13 @@
+from dataclasses import dataclass
+
+
+@dataclass
+class RiffChunk:
+    chunk_id: bytes
+    offset: int
+    size: int
+
+    @property
+    def padded_size(self):
+        """Chunk bodies are padded to an even size, e.g. a body of 3 bytes is followed by 1 pad byte"""
+        return self.size + (self.size & 1)
@@ -0,0 +1,103 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Tuple
+
+import numpy as np
+
+
+class ScatterPositions:
+    """ Keyed pseudo-random positions of the amplitudes of a file, used instead of writing the message in order
+    The amplitude indices are permuted by a balanced Feistel network over the smallest domain of 2 ** (2 * h)
+    indices which contains range(sample_count). Its round function mixes the right half with a round key derived
+    from the key (splitmix64). Indices which are mapped outside of range(sample_count) are permuted again until
+    they are inside (cycle walking), which gives a permutation of range(sample_count). Only the requested indices
+    are permuted, with plain uint64 arithmetic, so the positions do not depend on the numpy version.
+    The amplitudes [start:stop:step] of a message are written to the permuted positions in ascending order,
+    which keeps reading and writing them close to sequential.
+    """
+
+    # Four rounds make a Feistel network with pseudo-random round functions a strong pseudo-random permutation
+    ROUNDS = 4
+    # Bytes of position arrays kept by ScatterPositions.get_positions
+    CACHE_BYTES = 2 ** 26
+
+    GOLDEN_GAMMA = np.uint64(0x9E3779B97F4A7C15)
+    MIX_MULTIPLIERS = (np.uint64(0xBF58476D1CE4E5B9), np.uint64(0x94D049BB133111EB))
+
+    _positions: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+    _cached_bytes = 0
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get_positions(key: bytes, sample_count: int, start: int, stop: int, step: int) -> np.ndarray:
+        """ Return the (read only) ascending positions of the amplitudes [start:stop:step] for the given key """
+        cache_key = (key, sample_count, start, stop, step)
+        with ScatterPositions._lock:
+            positions = ScatterPositions._positions.get(cache_key)
+            if positions is not None:
+                ScatterPositions._positions.move_to_end(cache_key)
+                return positions
+
+        indices = np.arange(*slice(start, stop, step).indices(sample_count), dtype=np.uint64)
+        positions = np.sort(ScatterPositions.permute(key, sample_count, indices))
+        positions.flags.writeable = False
+        with ScatterPositions._lock:
+            if cache_key not in ScatterPositions._positions:
+                ScatterPositions._positions[cache_key] = positions
+                ScatterPositions._cached_bytes += positions.nbytes
+            while ScatterPositions._cached_bytes > ScatterPositions.CACHE_BYTES and ScatterPositions._positions:
+                _, evicted_positions = ScatterPositions._positions.popitem(last=False)
+                ScatterPositions._cached_bytes -= evicted_positions.nbytes
+        return positions
+
+    @staticmethod
+    def permute(key: bytes, sample_count: int, indices: np.ndarray) -> np.ndarray:
+        """ Return the positions of the given amplitude indices (all below sample_count) for the given key """
+        half_bits = max(1, -(-(sample_count - 1).bit_length() // 2))
+        round_keys = ScatterPositions._get_round_keys(key)
+
+        positions = indices.astype(np.uint64)
+        walking = np.arange(len(positions))
+        while len(walking):
+            permuted = ScatterPositions._feistel(positions[walking], round_keys, half_bits)
+            positions[walking] = permuted
+            walking = walking[permuted >= sample_count]
+        return positions.astype(np.int64)
+
+    @staticmethod
+    def clear():
+        with ScatterPositions._lock:
+            ScatterPositions._positions.clear()
+            ScatterPositions._cached_bytes = 0
+
+    @staticmethod
+    def _feistel(values: np.ndarray, round_keys: Tuple[np.uint64, ...], half_bits: int) -> np.ndarray:
+        """ One pass of the Feistel network over values of 2 * half_bits bits """
+        mask = np.uint64((1 << half_bits) - 1)
+        left, right = values >> np.uint64(half_bits), values & mask
+        # The operations are done in place, on arrays of the same size as values
+        mixed, shifted = np.empty_like(values), np.empty_like(values)
+        with np.errstate(over="ignore"):
+            for round_key in round_keys:
+                np.multiply(right, ScatterPositions.GOLDEN_GAMMA, out=mixed)
+                mixed += round_key
+                for shift, multiplier in zip((30, 27), ScatterPositions.MIX_MULTIPLIERS):
+                    np.right_shift(mixed, np.uint64(shift), out=shifted)
+                    mixed ^= shifted
+                    mixed *= multiplier
+                np.right_shift(mixed, np.uint64(31), out=shifted)
+                mixed ^= shifted
+                mixed &= mask
+                mixed ^= left
+                left, right, mixed = right, mixed, left
+        left <<= np.uint64(half_bits)
+        left |= right
+        return left
+
+    @staticmethod
+    def _get_round_keys(key: bytes) -> Tuple[np.uint64, ...]:
+        digest = hashlib.sha512(key).digest()
+        return tuple(
+            np.uint64(int.from_bytes(digest[8 * i:8 * (i + 1)], "little")) for i in range(ScatterPositions.ROUNDS)
+        )
@@ -0,0 +1,15 @@
+from enum import Enum
+
+
+class VerificationPolicy(Enum):
+    """ How WAVFile.encode checks the written message
+    FULL: decode the whole message again, including error correction and decryption
+    HEADER: read back only the header region and compare it with the written header
+    CHECKSUM: compare a CRC32 of the read back symbols with the one of the written symbols
+    NONE: no check
+    """
+
+    FULL = "full"
+    HEADER = "header"
+    CHECKSUM = "checksum"
+    NONE = "none"
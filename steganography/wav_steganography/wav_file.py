@@ -1,8 +1,10 @@
-import textwrap
+import os
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import struct
-from typing import Optional, Union, List, Tuple
+import zlib
+from typing import Callable, Optional, Union, List, Tuple, Iterator
 
 import numpy as np
 import pandas as pd
@@ -11,8 +13,18 @@ from steganography.error_correction.generic_error_correction import GenericError
 from steganography.error_correction.reed_solomon_error_correction import ReedSolomonErrorCorrection
 from steganography.security.encryptors.generic_encryptor import GenericEncryptor
 from steganography.security.encryptors.none_encryptor import NoneEncryptor
+from steganography.wav_steganography.bit_packing import BitPacking
+from steganography.wav_steganography.block_interleaver import BlockInterleaver
+from steganography.wav_steganography.capacity_planner import CapacityPlanner
 from steganography.wav_steganography.data_chunk import DataChunk
-from steganography.wav_steganography.message import Message
+from steganography.wav_steganography.embedding_config import EmbeddingConfig
+from steganography.wav_steganography.embedding_layout import EmbeddingLayout
+from steganography.wav_steganography.embedding_plan import EmbeddingPlan
+from steganography.wav_steganography.int24 import Int24
+from steganography.wav_steganography.message import Message, MessageHeader
+from steganography.wav_steganography.riff_chunk import RiffChunk
+from steganography.wav_steganography.scatter_positions import ScatterPositions
+from steganography.wav_steganography.verification_policy import VerificationPolicy
 
 
 class WAVFile:
@@ -24,55 +36,202 @@ class WAVFile:
         (name, format, byte_count, [allowed_values])
     * `name` will be used to store the variable in the WAVFile.header dictionary.
     * `format` is the byte format required for struct: https://docs.python.org/3/library/struct.html
+      without the byte order, which is little-endian for RIFF and big-endian for RIFX files.
     * `bytes` is the number of bytes to read from the file
     * `[allowed_values]` is a list of allowed values for this entry, if None, no check is made
+    All other chunks (e.g. LIST, bext, cue) are indexed, but not read, see WAVFile.riff_chunks.
+    RF64 files (EBU Tech 3306) store sizes above 4 GB in the ds64 chunk, the 32-bit sizes are then 0xFFFFFFFF.
     """
 
-    _wav_header_specification: List[Tuple[str, str, int, Optional[List]]] = [
-        # === RIFF Chunk ===
-        ("ChunkID", '>4s', 4, [b"RIFF", b"RIFX"]),
-        ("ChunkSize", '<i', 4, None),
-        ("Format", '>4s', 4, [b"WAVE"]),
-
-        # === FORMAT Subchunk ===
-        ("Subchunk1ID", '>4s', 4, [b"fmt "]),
-        ("Subchunk1Size", '<i', 4, [16]),
-        ("AudioFormat", '<h', 2, [1]),
-        ("NumChannels", '<h', 2, [1, 2]),
-        ("SampleRate", '<i', 4, None),
-        ("ByteRate", '<i', 4, None),
-        ("BlockAlign", '<h', 2, None),
-        ("BitsPerSample", '<h', 2, [8, 16, 32]),
-
-        # === DATA Subchunk ===
-        ("Subchunk2ID", '>4s', 4, [b"data"]),
-        ("Subchunk2Size", '<i', 4, None),
+    WAVE_FORMAT_PCM = 1
+    WAVE_FORMAT_IEEE_FLOAT = 3
+    WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+    _riff_header_specification: List[Tuple[str, str, int, Optional[List]]] = [
+        ("ChunkID", '4s', 4, [b"RIFF", b"RIFX", b"RF64"]),
+        ("ChunkSize", 'I', 4, None),
+        ("Format", '4s', 4, [b"WAVE"]),
+    ]
+
+    _chunk_header_specification: List[Tuple[str, str, int, Optional[List]]] = [
+        ("ID", '4s', 4, None),
+        ("Size", 'I', 4, None),
     ]
 
-    def __init__(self, filename: Union[Path, str]):
-        """ Parse WAV file given a path to audio file """
+    # ds64 chunk of RF64 files, followed by TableLength entries of (ChunkID '4s', ChunkSize 'Q')
+    _ds64_specification: List[Tuple[str, str, int, Optional[List]]] = [
+        ("RiffSize", 'Q', 8, None),
+        ("DataSize", 'Q', 8, None),
+        ("SampleCount", 'Q', 8, None),
+        ("TableLength", 'I', 4, None),
+    ]
+    # Chunk size which means that the actual size is stored in the ds64 chunk
+    RF64_SIZE_IN_DS64 = 0xFFFFFFFF
+
+    _fmt_specification: List[Tuple[str, str, int, Optional[List]]] = [
+        ("AudioFormat", 'H', 2, [WAVE_FORMAT_PCM, WAVE_FORMAT_IEEE_FLOAT, WAVE_FORMAT_EXTENSIBLE]),
+        # Up to the 18 speaker positions of WAVE_FORMAT_EXTENSIBLE, e.g. 6 for 5.1 and 8 for 7.1
+        ("NumChannels", 'H', 2, list(range(1, 19))),
+        ("SampleRate", 'I', 4, None),
+        ("ByteRate", 'I', 4, None),
+        ("BlockAlign", 'H', 2, None),
+        ("BitsPerSample", 'H', 2, [8, 16, 24, 32]),
+    ]
+
+    # Allowed sizes of the fmt chunk: plain PCM, PCM with (empty) extension, WAVE_FORMAT_EXTENSIBLE
+    _fmt_sizes = [16, 18, 40]
+    # Allowed formats, with WAVE_FORMAT_EXTENSIBLE the format are the first 2 bytes of the SubFormat GUID
+    _audio_formats = [WAVE_FORMAT_PCM, WAVE_FORMAT_IEEE_FLOAT]
+
+    # Number of mantissa bits of a 32-bit float, only these are used for embedding data in float samples
+    FLOAT_MANTISSA_BITS = 23
+
+    # Number of samples held in memory at a time when writing or decoding a streamed file
+    STREAM_BLOCK_SAMPLES = 2 ** 20
+
+    def __init__(self, filename: Union[Path, str], mmap_mode: Optional[str] = None, stream: bool = False):
+        """ Parse WAV file given a path to audio file
+        Only the chunk headers and the fmt chunk are read, the samples are read when self.data is first used.
+        If mmap_mode is given ('r', 'r+' or 'c', see numpy.memmap), the samples are not read into memory,
+        instead self.data is a memory-mapped view of the data chunk with the native sample dtype.
+        Use 'c' (copy-on-write) to encode without modifying the file on disk.
+        If stream is True, the samples are not loaded at all (self.data is None). Encoding then only
+        records the changes, which are applied block by block in iter_blocks, write and decode.
+        """
         self._created_from_filename = filename
+        self._mmap_mode = mmap_mode
+        self._stream = stream
+        self._data: Optional[np.ndarray] = None
+        self._written_ranges: List[Tuple[int, int]] = []
+        self._written_positions: List[np.ndarray] = []
+        self._pending_writes: List[Tuple[Union[slice, np.ndarray], np.ndarray, int]] = []
+        self.riff_chunks: List[RiffChunk] = []
         self.header = h = OrderedDict()
         with open(filename, 'rb') as wav_file:
+            riff_header = wav_file.read(12)
+            endianness = '>' if riff_header[:4] == b"RIFX" else '<'
+            h.update(self._unpack(self._riff_header_specification, riff_header, endianness))
+
+            # Index all chunks in one pass, skipping the chunk bodies (except for the small ds64 chunk)
+            rf64_sizes = {}
+            while len(chunk_header := wav_file.read(8)) == 8:
+                chunk_header = self._unpack(self._chunk_header_specification, chunk_header, endianness)
+                chunk = RiffChunk(chunk_header["ID"], wav_file.tell(), chunk_header["Size"])
+                if chunk.chunk_id == b"ds64":
+                    rf64_sizes = self._parse_ds64(wav_file.read(chunk.size))
+                    h["ChunkSize"] = rf64_sizes.pop(b"RIFF")
+                    wav_file.seek(chunk.offset)
+                elif chunk.size == self.RF64_SIZE_IN_DS64 and chunk.chunk_id in rf64_sizes:
+                    chunk.size = rf64_sizes[chunk.chunk_id]
+                self.riff_chunks.append(chunk)
+                wav_file.seek(chunk.padded_size, os.SEEK_CUR)
+
+        fmt_chunk = self._find_riff_chunk(b"fmt ")
+        h["Subchunk1ID"], h["Subchunk1Size"] = fmt_chunk.chunk_id, fmt_chunk.size
+        assert fmt_chunk.size in self._fmt_sizes, f"Subchunk1Size is {fmt_chunk.size}, not among {self._fmt_sizes}!"
+        fmt = self.read_riff_chunk(b"fmt ")
+        h.update(self._unpack(self._fmt_specification, fmt[:16], endianness))
+        self._fmt_extension = fmt[16:]
+        audio_format = self._get_audio_format()
+        assert audio_format in self._audio_formats, f"AudioFormat is {audio_format}, not among {self._audio_formats}!"
+        if audio_format == self.WAVE_FORMAT_IEEE_FLOAT:
+            assert h["BitsPerSample"] == 32, f"BitsPerSample is {h['BitsPerSample']}, only 32-bit floats are supported!"
+
+        data_chunk = self._find_riff_chunk(b"data")
+        h["Subchunk2ID"], h["Subchunk2Size"] = data_chunk.chunk_id, data_chunk.size
+        self._data_offset = data_chunk.offset
+
+        # Make assertions about expected size
+        assert h["BlockAlign"] == h['NumChannels'] * h['BitsPerSample'] // 8
+        assert h["ByteRate"] == h['SampleRate'] * h['NumChannels'] * h['BitsPerSample'] // 8
 
-            # Parse according to specification
-            for name, formatting, byte_count, allowed_values in self._wav_header_specification:
-                h[name] = struct.unpack(formatting, wav_file.read(byte_count))[0]
-                if allowed_values is not None:
-                    if "ID" in name:
-                        while h[name] not in allowed_values:
-                            subchunk_size = struct.unpack("<i", wav_file.read(4))[0]
-                            wav_file.read(subchunk_size)
-                            h[name] = struct.unpack(formatting, wav_file.read(byte_count))[0]
-
-                    assert h[name] in allowed_values, f"{name} is {h[name]}, not among {allowed_values}!"
+    @staticmethod
+    def _unpack(specification: List[Tuple[str, str, int, Optional[List]]], buffer: bytes, endianness: str) -> dict:
+        """ Unpack the buffer according to the given specification and check the allowed values """
+        values = OrderedDict()
+        offset = 0
+        for name, formatting, byte_count, allowed_values in specification:
+            values[name] = struct.unpack_from(f"{endianness}{formatting}", buffer, offset)[0]
+            offset += byte_count
+            if allowed_values is not None:
+                assert values[name] in allowed_values, f"{name} is {values[name]}, not among {allowed_values}!"
+        return values
+
+    def _parse_ds64(self, ds64: bytes) -> dict:
+        """ Returns the 64-bit sizes of the ds64 chunk as dictionary: chunk id -> size, the RIFF size as b"RIFF" """
+        values = self._unpack(self._ds64_specification, ds64, '<')
+        sizes = {b"RIFF": values["RiffSize"], b"data": values["DataSize"]}
+        for i in range(values["TableLength"]):
+            chunk_id, size = struct.unpack_from("<4sQ", ds64, 28 + 12 * i)
+            sizes[chunk_id] = size
+        return sizes
 
-            # Make assertions about expected size
-            assert h["BlockAlign"] == h['NumChannels'] * h['BitsPerSample'] // 8
-            assert h["ByteRate"] == h['SampleRate'] * h['NumChannels'] * h['BitsPerSample'] // 8
+    @staticmethod
+    def _pack(specification: List[Tuple[str, str, int, Optional[List]]], values: dict, endianness: str) -> bytes:
+        for name, *_ in specification:
+            assert name in values, f"Parameter {name} not found in header!"
+        return b''.join(struct.pack(f"{endianness}{formatting}", values[name]) for name, formatting, *_ in specification)
+
+    def _find_riff_chunk(self, chunk_id: bytes) -> RiffChunk:
+        for chunk in self.riff_chunks:
+            if chunk.chunk_id == chunk_id:
+                return chunk
+        raise AssertionError(f"Chunk {chunk_id} not found among {[chunk.chunk_id for chunk in self.riff_chunks]}!")
+
+    def read_riff_chunk(self, chunk_id: bytes) -> bytes:
+        """ Read the body of the first chunk with the given id (e.g. b"bext") from the file """
+        chunk = self._find_riff_chunk(chunk_id)
+        with open(self._created_from_filename, 'rb') as wav_file:
+            wav_file.seek(chunk.offset)
+            return wav_file.read(chunk.size)
+
+    def _get_audio_format(self) -> int:
+        """ Returns the AudioFormat, for WAVE_FORMAT_EXTENSIBLE the format given by the SubFormat GUID """
+        if self.header["AudioFormat"] != self.WAVE_FORMAT_EXTENSIBLE:
+            return self.header["AudioFormat"]
+        # Extension: cbSize (2), ValidBitsPerSample (2), ChannelMask (4), SubFormat (16)
+        return struct.unpack_from(f"{self._get_endianness()}H", self._fmt_extension, 8)[0]
 
-            # Parse the actual data
-            self.data = np.array(struct.unpack(self._get_data_format(), wav_file.read(h['Subchunk2Size'])))
+    @property
+    def data(self) -> Optional[np.ndarray]:
+        """ The samples, loaded (or memory-mapped) on first use, always None for streamed files """
+        if self._data is None and not self._stream:
+            self._data = self._load_data()
+        return self._data
+
+    @data.setter
+    def data(self, data: np.ndarray):
+        self._data = data
+
+    def _load_data(self) -> np.ndarray:
+        if self._mmap_mode is not None:
+            if self.header["BitsPerSample"] == 24:
+                raise ValueError("24-bit samples cannot be memory-mapped, use stream=True instead!")
+            return np.memmap(
+                self._created_from_filename,
+                dtype=self._get_data_dtype(),
+                mode=self._mmap_mode,
+                offset=self._data_offset,
+                shape=(self._get_sample_count(),),
+            )
+        with open(self._created_from_filename, 'rb') as wav_file:
+            wav_file.seek(self._data_offset)
+            samples = self._samples_from_bytes(wav_file.read(self._get_sample_count() * self._get_sample_width()))
+        if self._is_float():
+            return samples.astype(np.float32)
+        return samples.astype(np.int64)
+
+    def _samples_from_bytes(self, raw: bytes) -> np.ndarray:
+        """ Returns the samples of the given raw data, with the dtype given by _get_data_dtype """
+        if self.header["BitsPerSample"] == 24:
+            return Int24.unpack(raw, self._get_endianness()).astype(self._get_data_dtype(), copy=False)
+        return np.frombuffer(raw, self._get_data_dtype())
+
+    def _samples_to_bytes(self, samples: np.ndarray) -> np.ndarray:
+        """ Returns the samples converted to the format in the file, to be written with tofile """
+        if self.header["BitsPerSample"] == 24:
+            return Int24.pack(samples, self._get_endianness())
+        return samples.astype(self._get_data_dtype(), copy=False)
 
     def _data_as_channel_data_frame(self, data_arr: np.ndarray) -> pd.DataFrame:
         return pd.DataFrame(data={
@@ -80,22 +239,234 @@ class WAVFile:
             for i in range(0, self.header['NumChannels'])
         })
 
-    def _get_data_format(self) -> str:
-        """ Returns the data format string required for struct (e.g. "<88200h") """
-        endianness = ('<' if self.header["ChunkID"] == b"RIFF" else ">")
-        integer_count = self.header['Subchunk2Size'] * 8 // self.header['BitsPerSample']
-        integer_size = {8: 'b', 16: 'h', 32: 'i'}[self.header['BitsPerSample']]
-        return f"{endianness}{integer_count}{integer_size}"
+    def _get_endianness(self) -> str:
+        return '>' if self.header["ChunkID"] == b"RIFX" else "<"
 
-    def write(self, filename: Union[Path, str], overwrite: bool = False):
-        """ Create a WAVFile with given filename """
-        if not overwrite and filename.exists():
-            raise FileExistsError
-        with open(filename, 'wb') as file:
-            for name, formatting, byte_count, allowed_values in self._wav_header_specification:
-                assert name in self.header, f"Parameter {name} not found in header!"
-                file.write(struct.pack(formatting, self.header[name]))
-            file.write(struct.pack(self._get_data_format(), *list(self.data)))
+    def _get_sample_count(self) -> int:
+        return self.header['Subchunk2Size'] * 8 // self.header['BitsPerSample']
+
+    def _get_data_dtype(self) -> np.dtype:
+        """ Returns the native numpy dtype of the samples as stored in the file (e.g. "<i2")
+        24-bit samples have no numpy dtype, they are unpacked to 32-bit integers, see Int24.
+        """
+        if self._is_float():
+            return np.dtype(f"{self._get_endianness()}f4")
+        integer_size = {8: 'i1', 16: 'i2', 24: 'i4', 32: 'i4'}[self.header['BitsPerSample']]
+        return np.dtype(f"{self._get_endianness()}{integer_size}")
+
+    def _get_sample_width(self) -> int:
+        """ Returns the number of bytes of a single sample in the file """
+        return self.header['BitsPerSample'] // 8
+
+    def _is_float(self) -> bool:
+        return self._get_audio_format() == self.WAVE_FORMAT_IEEE_FLOAT
+
+    def _get_embeddable_bits(self) -> int:
+        """ Returns the number of bits per sample which can be used for embedding, i.e. the integer bits
+        of PCM samples and the mantissa bits of float samples (changing these keeps sign and exponent) """
+        return self.FLOAT_MANTISSA_BITS if self._is_float() else self.header["BitsPerSample"]
+
+    def _get_sample_bits(self) -> np.ndarray:
+        """ Returns self.data viewed as unsigned integers of the same width (e.g. "<i2" -> "<u2")
+        Bit operations on the least significant bits are then well-defined for every sample dtype,
+        e.g. setting 16 LSBs of an int16 does not overflow. The view shares memory with self.data.
+        """
+        return self._as_unsigned(self.data)
+
+    @staticmethod
+    def _as_unsigned(samples: np.ndarray) -> np.ndarray:
+        """ View integer or float samples as unsigned integers with the same width and byte order """
+        return samples.view(np.dtype(f"u{samples.dtype.itemsize}").newbyteorder(samples.dtype.byteorder))
+
+    def iter_blocks(self, block_samples: int, start: int = 0, stop: Optional[int] = None) -> Iterator[np.ndarray]:
+        """ Iterate over the samples from index start to stop in blocks of (at most) block_samples
+        If the samples are loaded, the blocks are views of self.data. Otherwise (e.g. for a streamed file) the
+        blocks are read from the file one at a time, with the changes recorded by encode applied to each block.
+        """
+        sample_count = self._get_sample_count()
+        stop = sample_count if stop is None else min(stop, sample_count)
+        if self._data is not None:
+            for block_start in range(start, stop, block_samples):
+                yield self.data[block_start:min(block_start + block_samples, stop)]
+            return
+
+        sample_width = self._get_sample_width()
+        with open(self._created_from_filename, 'rb') as wav_file:
+            wav_file.seek(self._data_offset + start * sample_width)
+            for block_start in range(start, stop, block_samples):
+                raw = bytearray(min(block_samples, stop - block_start) * sample_width)
+                wav_file.readinto(raw)
+                block = self._samples_from_bytes(raw)
+                self._apply_pending_writes(block, block_start)
+                yield block
+
+    def _apply_pending_writes(self, block: np.ndarray, block_start: int):
+        """ Apply the writes recorded by _write_symbols (for streamed files) that fall into the given block """
+        block_bits = self._as_unsigned(block)
+        for positions, symbols, lsb_count in self._pending_writes:
+            if isinstance(positions, np.ndarray):
+                # Scattered positions are ascending, see ScatterPositions
+                first, last = np.searchsorted(positions, [block_start, block_start + len(block)])
+                block_positions = positions[first:last] - block_start
+                block_bits[block_positions] = self._set_last_n_bits_in_array(
+                    block_bits[block_positions],
+                    symbols[first:last].astype(block_bits.dtype),
+                    lsb_count,
+                )
+                continue
+
+            # Index range of the symbols whose amplitude lies within [block_start, block_start + len(block))
+            at_byte, nth = positions.start, positions.step
+            first = max(0, -(-(block_start - at_byte) // nth))
+            last = min(len(symbols), -(-(block_start + len(block) - at_byte) // nth))
+            if first >= last:
+                continue
+            from_index = at_byte + first * nth - block_start
+            to_index = from_index + (last - first - 1) * nth + 1
+            block_bits[from_index:to_index:nth] = self._set_last_n_bits_in_array(
+                block_bits[from_index:to_index:nth],
+                symbols[first:last].astype(block_bits.dtype),
+                lsb_count,
+            )
+
+    def _apply_pending_writes_at(self, sample_bits: np.ndarray, positions: np.ndarray):
+        """ Apply the writes recorded by _write_symbols (for streamed files) to the samples at ascending positions """
+        for write_positions, symbols, lsb_count in self._pending_writes:
+            if len(symbols) == 0:
+                continue
+            if isinstance(write_positions, np.ndarray):
+                symbol_indices = np.minimum(np.searchsorted(write_positions, positions), len(write_positions) - 1)
+                written = write_positions[symbol_indices] == positions
+            else:
+                offsets = positions - write_positions.start
+                symbol_indices = offsets // write_positions.step
+                written = (offsets >= 0) & (offsets % write_positions.step == 0) & (symbol_indices < len(symbols))
+            if not np.any(written):
+                continue
+            sample_bits[written] = self._set_last_n_bits_in_array(
+                sample_bits[written],
+                symbols[symbol_indices[written]].astype(sample_bits.dtype),
+                lsb_count,
+            )
+
+    def _read_sample_positions(self, positions: Union[slice, np.ndarray]) -> np.ndarray:
+        """ Returns the samples at the given positions (a slice or an ascending index array) as unsigned integers """
+        if isinstance(positions, slice):
+            return self._read_sample_bits(positions.start, positions.stop, positions.step)
+        if self._data is not None:
+            return self._get_sample_bits()[positions]
+
+        # Only the samples at the (scattered) positions are read, through read-only memory maps of one block of
+        # STREAM_BLOCK_SAMPLES at a time, so the mapped pages of a block are released before the next one
+        sample_width, sample_count = self._get_sample_width(), self._get_sample_count()
+        block_samples = self.STREAM_BLOCK_SAMPLES
+        raw = np.empty((len(positions), sample_width), dtype=np.uint8)
+        blocks = np.unique(positions // block_samples)
+        bounds = np.searchsorted(positions, np.append(blocks, blocks[-1:] + 1) * block_samples)
+        for block, first, last in zip(blocks.tolist(), bounds[:-1], bounds[1:]):
+            block_start = block * block_samples
+            block_raw = np.memmap(
+                self._created_from_filename,
+                dtype=np.uint8,
+                mode='r',
+                offset=self._data_offset + block_start * sample_width,
+                shape=(min(block_samples, sample_count - block_start), sample_width),
+            )
+            raw[first:last] = block_raw[positions[first:last] - block_start]
+            del block_raw
+        sample_bits = self._as_unsigned(self._samples_from_bytes(raw.tobytes()).copy())
+        self._apply_pending_writes_at(sample_bits, positions)
+        return sample_bits
+
+    def _read_sample_bits(self, from_amplitude: int, to_amplitude: int, nth: int) -> np.ndarray:
+        """ Returns the samples [from_amplitude:to_amplitude:nth] as unsigned integers, see _get_sample_bits
+        If the samples are not loaded, only the span from_amplitude to to_amplitude is read from the file.
+        """
+        if self._data is not None:
+            return self._get_sample_bits()[from_amplitude:to_amplitude:nth]
+
+        # Blocks are a multiple of nth long, so every block starts on an amplitude that has to be read
+        block_samples = nth * max(1, self.STREAM_BLOCK_SAMPLES // nth)
+        blocks = [
+            self._as_unsigned(block[::nth])
+            for block in self.iter_blocks(block_samples, from_amplitude, to_amplitude)
+        ]
+        if not blocks:
+            return self._as_unsigned(np.empty(0, self._get_data_dtype()))
+        return np.concatenate(blocks)
+
+    def _read_sample_streams(self, streams: List[slice]) -> List[np.ndarray]:
+        """ Returns the samples of each of the slices as unsigned integers, see _read_sample_bits
+        If the samples are not loaded, the span of all slices is read from the file once, block by block.
+        """
+        if self._data is not None or len(streams) <= 1:
+            return [self._read_sample_bits(stream.start, stream.stop, stream.step) for stream in streams]
+
+        start, stop = min(stream.start for stream in streams), max(stream.stop for stream in streams)
+        stream_blocks = [[] for _ in streams]
+        block_start = start
+        for block in self.iter_blocks(self.STREAM_BLOCK_SAMPLES, start, stop):
+            block_bits = self._as_unsigned(block)
+            for stream, blocks in zip(streams, stream_blocks):
+                # The first amplitude of the stream within the block
+                first = max(stream.start, block_start + (stream.start - block_start) % stream.step)
+                if first < min(stream.stop, block_start + len(block)):
+                    blocks.append(block_bits[first - block_start:stream.stop - block_start:stream.step])
+            block_start += len(block)
+        return [
+            np.concatenate(blocks) if blocks else self._as_unsigned(np.empty(0, self._get_data_dtype()))
+            for blocks in stream_blocks
+        ]
+
+    def write(self, filename: Union[Path, str], overwrite: bool = False, patch: bool = False):
+        """ Create a WAVFile with given filename
+        With patch=True the file has to be the one this WAVFile was created from. Instead of rewriting
+        the whole file, only the sample ranges (or scattered samples) written by encode since loading (or the last
+        patch) are written in place. Changes made to self.data directly are not tracked and therefore not patched.
+        """
+        filename = Path(filename)
+        if patch:
+            if not overwrite:
+                raise FileExistsError
+            self._patch(filename)
+            return
+        block_samples = self.STREAM_BLOCK_SAMPLES if self._data is None else max(1, len(self._data))
+        with WAVStreamWriter(filename, self, overwrite) as writer:
+            for block in self.iter_blocks(block_samples):
+                writer.write_block(block)
+
+    def _get_fmt_bytes(self) -> bytes:
+        """ Returns the body of the fmt chunk, including the (unchanged) extension if there is one """
+        return self._pack(self._fmt_specification, self.header, self._get_endianness()) + self._fmt_extension
+
+    def _patch(self, filename: Path):
+        """ Write the sample ranges changed since loading into the (unchanged) source file """
+        if filename.resolve() != Path(self._created_from_filename).resolve():
+            raise ValueError(f"Can only patch the source file {self._created_from_filename}, not {filename}!")
+        # Read all changed samples before writing, as streamed files read the unchanged samples from the same file
+        changed_blocks = []
+        for from_amplitude, to_amplitude in self._written_ranges:
+            blocks = self.iter_blocks(self.STREAM_BLOCK_SAMPLES, from_amplitude, to_amplitude)
+            changed_blocks.append((from_amplitude, self._samples_to_bytes(np.concatenate(list(blocks)))))
+        changed_samples = [
+            (positions, self._samples_to_bytes(self._read_sample_positions(positions).view(self._get_data_dtype())))
+            for positions in self._written_positions
+        ]
+        sample_width = self._get_sample_width()
+        with open(filename, 'r+b') as file:
+            for from_amplitude, block in changed_blocks:
+                file.seek(self._data_offset + from_amplitude * sample_width)
+                block.tofile(file)
+            # Scattered positions are written one run of consecutive positions at a time, mostly single samples
+            for positions, samples in changed_samples:
+                raw = samples.tobytes()
+                run_starts = np.flatnonzero(np.diff(positions) != 1) + 1
+                for start, stop in zip([0, *run_starts.tolist()], [*run_starts.tolist(), len(positions)]):
+                    file.seek(self._data_offset + int(positions[start]) * sample_width)
+                    file.write(raw[start * sample_width:stop * sample_width])
+        self._written_ranges.clear()
+        self._written_positions.clear()
+        self._pending_writes.clear()
 
     def time_to_index(self, at_time_s: float) -> int:
         """ Returns index of data, given as second, if None then returns len """
@@ -170,69 +541,157 @@ class WAVFile:
             encryptor: GenericEncryptor = NoneEncryptor(),
             error_correction: GenericErrorCorrection = ReedSolomonErrorCorrection(),
             repeat_data: bool = False,
+            verify: Union[VerificationPolicy, str] = VerificationPolicy.FULL,
+            scatter_key: Optional[bytes] = None,
+            layout: EmbeddingLayout = EmbeddingLayout.CONTIGUOUS,
+            interleave_depth: int = 1,
     ):
         """ Encode a message in the given WAVFile
         This is done by writing to every nth bytes some number of least significant bits.
         A short header is written first, then the message.
+        The message is encoded and written as a whole, including all copies with repeat_data (see Message).
+        Afterwards the written message is checked as given by verify, see VerificationPolicy.
+        With a scatter_key, the header and the message are written to the amplitudes in the keyed order of
+        ScatterPositions instead of from the start of the file, the same key is required to decode it.
+        With layout=EmbeddingLayout.CHANNEL_STRIPED, the data is split into one part per channel, which are
+        written concurrently. The layout is stored in the header.
+        With an interleave_depth above 1, the error corrected data is interleaved with a BlockInterleaver of this
+        depth, so that a burst of damaged amplitudes is spread over several error correction chunks.
+        With repeat_data, the encoded message is written as often as it fits. Decoding takes the bitwise majority
+        of the copies, and only applies the error correction if the copies differ.
         """
-        assert least_significant_bits <= self.header["BitsPerSample"]
-
-        # The loop will run once if repeat_data = False, and twice if it is True. The loop is used
-        # to avoid code duplication. Calculating the needed data size in advance when repeating is hard,
-        # (would have to account for redundancy, encryption, etc.), therefore the first iteration is
-        # used as an estimate for the needed size in the second run.
-        while True:
-            header_chunk, data_chunk = Message.encode_message(
-                data,
+        assert least_significant_bits <= self._get_embeddable_bits()
+        verify = VerificationPolicy(verify)
+        if scatter_key is not None and layout != EmbeddingLayout.CONTIGUOUS:
+            raise ValueError(f"ERROR: Scattering requires the {EmbeddingLayout.CONTIGUOUS.name} layout.")
+        if not 1 <= interleave_depth <= BlockInterleaver.MAX_DEPTH:
+            raise ValueError(f"ERROR: Interleaving depth must be between 1 and {BlockInterleaver.MAX_DEPTH}.")
+
+        repeat_count = 1
+        if repeat_data:
+            config = EmbeddingConfig(
                 least_significant_bits,
                 every_nth_byte,
                 redundant_bits,
-                encryptor,
-                error_correction,
+                encryptor.encryption_type,
+                error_correction.error_correction_type,
+                layout,
             )
-            amplitudes_available = len(self.data) - header_chunk.amplitudes_required
-            if repeat_data:
-                data *= amplitudes_available // data_chunk.amplitudes_required
-                repeat_data = False
-            else:
-                break
+            repeat_count = max(1, CapacityPlanner.from_wav_file(self).repeat_count(len(data), config))
+
+        header_chunk, data_chunk = Message.encode_message(
+            data,
+            least_significant_bits,
+            every_nth_byte,
+            redundant_bits,
+            encryptor,
+            error_correction,
+            layout,
+            interleave_depth,
+            repeat_count,
+        )
+        plan = self._get_embedding_plan(
+            least_significant_bits, every_nth_byte, redundant_bits, error_correction, layout, len(data_chunk.data)
+        )
 
-        if amplitudes_available < data_chunk.amplitudes_required:
+        if not plan.fits:
+            header_amplitudes = plan.header_amplitudes.stop
+            amplitudes_available = self._get_sample_count() - header_amplitudes
+            data_amplitudes = plan.amplitudes_required - header_amplitudes
             raise ValueError(
                 f"ERROR: File not large enough for the given message! "
-                f"Required amplitudes: header = {header_chunk.amplitudes_required}, "
-                f"data = {data_chunk.amplitudes_required}.\n\tAmplitudes available in total: {len(self.data)}. "
+                f"Required amplitudes: header = {header_amplitudes}, "
+                f"data = {data_amplitudes}.\n\tAmplitudes available in total: {self._get_sample_count()}. "
                 f"After encoding header not enough amplitudes left: "
-                f"{amplitudes_available} < {data_chunk.amplitudes_required}."
+                f"{amplitudes_available} < {data_amplitudes}."
             )
 
-        self._write_chunks([header_chunk, data_chunk])
-
-        decoded_message = self.decode(encryptor=encryptor, error_correction=error_correction)
-
-        assert decoded_message == data, \
-            f'Cannot decode encrypted message: "{decoded_message}" != "{data}"'
-
-    def _write_chunks(self, chunks: List[DataChunk], at_byte: int = 0):
-        """ Encode the given chunks on after another, starting at at_byte """
-        for chunk in chunks:
-            at_byte = self._write_chunk(chunk, at_byte)
+        chunk_amplitudes = [(header_chunk, plan.header_amplitudes)] + [
+            (DataChunk(data_chunk.data[byte_range], least_significant_bits, every_nth_byte), amplitudes)
+            for byte_range, amplitudes in plan.data_streams
+        ]
+        self._write_symbols(header_chunk, plan.header_amplitudes, scatter_key)
+        self._map_data_streams(
+            lambda chunk, amplitudes: self._write_symbols(chunk, amplitudes, scatter_key), chunk_amplitudes[1:]
+        )
 
-    def _write_chunk(self, chunk: DataChunk, at_byte: int) -> int:
-        """ Encode a given chunk at the specified byte index """
-        nth = chunk.every_nth_byte
+        if verify == VerificationPolicy.FULL:
+            decoded_message = self.decode(
+                encryptor=encryptor, error_correction=error_correction, scatter_key=scatter_key
+            )
+            assert decoded_message == data, \
+                f'Cannot decode encrypted message: "{decoded_message}" != "{data}"'
+        elif verify == VerificationPolicy.HEADER:
+            header_bytes = self._read_bytes(
+                plan.header_amplitudes, Message.HEADER_LSB_COUNT, len(header_chunk.data), scatter_key
+            )
+            assert header_bytes == header_chunk.data, \
+                f'Cannot read back header: "{header_bytes}" != "{header_chunk.data}"'
+        elif verify == VerificationPolicy.CHECKSUM:
+            for chunk, amplitudes in chunk_amplitudes:
+                chunk_bytes = self._read_bytes(amplitudes, chunk.least_significant_bits, len(chunk.data), scatter_key)
+                assert zlib.crc32(chunk_bytes) == zlib.crc32(chunk.data), \
+                    f"Checksum of the written symbols does not match at amplitude {amplitudes.start}"
+
+    def _get_embedding_plan(
+            self,
+            least_significant_bits: int,
+            every_nth_byte: int,
+            redundant_bits: int,
+            error_correction: GenericErrorCorrection,
+            layout: EmbeddingLayout,
+            data_size: int,
+    ) -> EmbeddingPlan:
+        return EmbeddingPlan.get(
+            self._get_sample_count(),
+            self.num_channels,
+            least_significant_bits,
+            every_nth_byte,
+            redundant_bits,
+            error_correction.error_correction_type,
+            layout,
+            data_size,
+        )
 
-        binary_data = ''.join(map(lambda b: f"{b:08b}", chunk.data))  # e.g. "0010101011101100"
-        lsb_bits = textwrap.wrap(binary_data, chunk.least_significant_bits)  # e.g. ["00", "10", ...]
-        binary_data_split_up = list(map(lambda b: int(b, 2), lsb_bits))  # e.g. [0, 2, ...]
-        end_byte_index = len(binary_data_split_up) * nth + at_byte  # e.g. 32 on first iteration
+    def _map_data_streams(self, function: Callable, data_streams: List[Tuple]) -> List:
+        """ Call function for the arguments of each data stream, concurrently if there are multiple streams
+        The streams write to and read from disjoint amplitudes and numpy releases the GIL while processing them.
+        The samples are not loaded here: encode has loaded them when writing the header (unless streamed), and
+        decode reads the samples of all streams beforehand, see _read_sample_streams.
+        """
+        if len(data_streams) <= 1:
+            return [function(*arguments) for arguments in data_streams]
+
+        with ThreadPoolExecutor(max_workers=len(data_streams)) as executor:
+            return list(executor.map(lambda arguments: function(*arguments), data_streams))
+
+    def _write_symbols(self, chunk: DataChunk, amplitudes: slice, scatter_key: Optional[bytes] = None):
+        """ Encode a given chunk into the amplitudes, which have to match the number of symbols of the chunk """
+        symbols = BitPacking.bytes_to_symbols(chunk.data, chunk.least_significant_bits)  # e.g. [0, 2, ...]
+        positions = self._get_positions(amplitudes, scatter_key)
+
+        if self._stream:
+            self._pending_writes.append((positions, symbols, chunk.least_significant_bits))
+        else:
+            sample_bits = self._get_sample_bits()
+            sample_bits[positions] = self._set_last_n_bits_in_array(
+                sample_bits[positions],
+                symbols.astype(sample_bits.dtype),
+                chunk.least_significant_bits,
+            )
 
-        self.data[at_byte:end_byte_index:nth] = self._set_last_n_bits_in_array(
-            self.data[at_byte:end_byte_index:nth],
-            binary_data_split_up,
-            chunk.least_significant_bits,
+        if isinstance(positions, slice):
+            self._written_ranges.append((positions.start, positions.stop))
+        elif len(positions) > 0:
+            self._written_positions.append(positions)
+
+    def _get_positions(self, amplitudes: slice, scatter_key: Optional[bytes]) -> Union[slice, np.ndarray]:
+        """ Map amplitudes in message order to the positions in the file, see ScatterPositions """
+        if scatter_key is None:
+            return amplitudes
+        return ScatterPositions.get_positions(
+            scatter_key, self._get_sample_count(), amplitudes.start, amplitudes.stop, amplitudes.step
         )
-        return end_byte_index
 
     @staticmethod
     def _set_last_n_bits_in_array(data_slice: np.ndarray, binary_data_split_up, n_bits_to_set: int):
@@ -247,63 +706,211 @@ class WAVFile:
         data_bits_with_zeros ^ message_bits  =  0b10111000 ^ 0b10 = 0b10111010
         The LSBs bits have been set to message_bits after this operation.
         """
-        below_power_of_two = np.full_like(data_slice, 2 ** n_bits_to_set - 1)
+        below_power_of_two = data_slice.dtype.type(2 ** n_bits_to_set - 1)
         flipped_last_n_bits = data_slice & below_power_of_two
         data_slice_with_zeroed_n_last_bits = data_slice ^ flipped_last_n_bits
         data_slice_with_message_bits_set = data_slice_with_zeroed_n_last_bits ^ binary_data_split_up
         return data_slice_with_message_bits_set
 
-    def _get_bytes(self, from_amplitude: int, bits: int, lsb_count: int, nth_byte: int) -> Tuple[int, bytes]:
-        """ Return bytes by reading every lsb_count bits from every nth_byte from from_amplitude """
-
-        # Calculate number of amplitudes required for entire message (account for possible remainder)
-        divisor, remainder = divmod(bits, lsb_count)
-        amplitudes_required = divisor + (remainder != 0)
-
-        # Get an array of size amplitudes_required, such that each number is 1 below a power of 2, e.g. 0b111
-        ones = np.full(amplitudes_required, 2 ** lsb_count - 1)
-        if remainder > 0:
-            ones[-1] = 2 ** remainder - 1
-
-        # Calculate last byte position with the given message account for nth_byte as well
-        to_amplitude = from_amplitude + len(ones) * nth_byte
-
-        # &-ing with ones will get only the relevant bits required for saving the message
-        relevant_bits = self.data[from_amplitude:to_amplitude:nth_byte] & ones
-
-        # Convert relevant_bits to a large string of bits by formatting the relevant number of bits as a string
-        bits_to_format = (np.log2(ones + 1)).astype(int)
-        bits_as_str = ''.join(f"{data:0{format_bits}b}" for data, format_bits in zip(relevant_bits, bits_to_format))
-
-        # Wrap the string every 8 bits and cast each to an integer, which is then converted to bytes
-        message_wrapped_as_bytes = bytes(map(lambda b: int(b, 2), textwrap.wrap(bits_as_str, 8)))
-        return to_amplitude, message_wrapped_as_bytes
-
-    def _get_message(self, error_correction):
+    def _read_bytes(
+            self, amplitudes: slice, lsb_count: int, byte_count: int, scatter_key: Optional[bytes] = None
+    ) -> bytes:
+        """ Return byte_count bytes by reading lsb_count bits from each of the amplitudes """
+        sample_bits = self._read_sample_positions(self._get_positions(amplitudes, scatter_key))
+
+        # The last amplitude only holds the remaining bits if the bits are not divisible by lsb_count
+        return BitPacking.symbols_to_bytes(sample_bits, lsb_count, byte_count)
+
+    def _get_header(
+            self, error_correction, scatter_key: Optional[bytes] = None
+    ) -> Tuple[int, bytes, MessageHeader]:
+        """ Decode the header from this WAVFile, returns the amplitude after the header, its bytes and values """
+        header_byte_size = Message.header_byte_size(error_correction)
+        symbol_count = -(-header_byte_size * 8 // Message.HEADER_LSB_COUNT)
+        header_amplitudes = slice(0, symbol_count * Message.HEADER_EVERY_NTH_BYTE, Message.HEADER_EVERY_NTH_BYTE)
+        header_bytes = self._read_bytes(header_amplitudes, Message.HEADER_LSB_COUNT, header_byte_size, scatter_key)
+        return header_amplitudes.stop, header_bytes, Message.decode_header(header_bytes, error_correction)
+
+    def _get_message(self, error_correction, scatter_key: Optional[bytes] = None):
         """ Decode message from this WAVFile """
-        header_bits = Message.header_byte_size(error_correction) * 8
-        to_byte, header_bytes = self._get_bytes(0, header_bits, Message.HEADER_LSB_COUNT, Message.HEADER_EVERY_NTH_BYTE)
-
-        least_significant_bits, every_nth_byte, *_, data_size = Message.decode_header(header_bytes, error_correction)
+        _, header_bytes, header = self._get_header(error_correction, scatter_key)
 
-        message_bits = data_size * 8
-        _, message_bytes = self._get_bytes(to_byte, message_bits, least_significant_bits, every_nth_byte)
+        plan = self._get_embedding_plan(
+            header.least_significant_bits, header.every_nth_byte, header.redundant_bits, error_correction,
+            EmbeddingLayout(header.layout), header.repeat_count * header.data_size,
+        )
+        data_streams = plan.data_streams
+        if header.format_version == 1:
+            # The legacy data is contiguous and follows its shorter header, see Message
+            header_amplitudes = EmbeddingPlan.header_amplitudes_for(Message.legacy_header_byte_size(error_correction))
+            data_streams = EmbeddingPlan.data_streams_for(
+                header_amplitudes.stop, header.data_size, header.least_significant_bits, header.every_nth_byte,
+                EmbeddingLayout.CONTIGUOUS, self.num_channels,
+            )
+        if len(data_streams) == 1:
+            (byte_range, amplitudes), = data_streams
+            message_bytes = self._read_bytes(
+                amplitudes, header.least_significant_bits, byte_range.stop - byte_range.start, scatter_key
+            )
+        else:
+            # The striped streams interleave within the same span of samples, which is read once for all of them
+            byte_ranges, amplitudes = zip(*data_streams)
+            message_bytes = b''.join(self._map_data_streams(
+                lambda sample_bits, byte_range: BitPacking.symbols_to_bytes(
+                    sample_bits, header.least_significant_bits, byte_range.stop - byte_range.start
+                ),
+                list(zip(self._read_sample_streams(list(amplitudes)), byte_ranges)),
+            ))
 
         return header_bytes, message_bytes
 
+    @classmethod
+    def probe(
+            cls,
+            filename: Union[Path, str],
+            error_correction: GenericErrorCorrection = ReedSolomonErrorCorrection(),
+            scatter_key: Optional[bytes] = None,
+    ) -> MessageHeader:
+        """ Returns the header of the message in the given file, reading only the samples of the header """
+        _, _, header = cls(filename, stream=True)._get_header(error_correction, scatter_key)
+        return header
+
+    @classmethod
+    def decode_from_path(
+            cls,
+            filename: Union[Path, str],
+            encryptor: Optional[GenericEncryptor] = None,
+            error_correction: GenericErrorCorrection = ReedSolomonErrorCorrection(),
+            scatter_key: Optional[bytes] = None,
+    ) -> bytes:
+        """ Decode the message in the given file, reading only the samples of the header and the message
+        The header is read first, then only the span of samples it describes, e.g. a few hundred KB for a
+        fingerprint, regardless of the file size. See decode for the parameters.
+        """
+        return cls(filename, stream=True).decode(encryptor, error_correction, scatter_key)
+
     def decode(
             self,
             encryptor: Optional[GenericEncryptor] = None,
-            error_correction: GenericErrorCorrection = ReedSolomonErrorCorrection()
+            error_correction: GenericErrorCorrection = ReedSolomonErrorCorrection(),
+            scatter_key: Optional[bytes] = None,
     ) -> bytes:
 
         """Decode message, getting all parameters from internal header
         Encryptor is optional, can be supplied to avoid asking for password twice when verifying.
         If Encryptor is not supplied, then it will extract the used encryptor from the header in the message.
+        If the samples have not been loaded yet, only the samples of the header and the message are read.
+        scatter_key has to be the key the message was encoded with, if any.
         """
 
-        header_bytes, data_bytes = self._get_message(error_correction)
+        header_bytes, data_bytes = self._get_message(error_correction, scatter_key)
 
         decoded_message = Message.decode_message(header_bytes, data_bytes, encryptor, error_correction)
 
         return decoded_message
+
+
+class WAVStreamWriter:
+    """ Write a WAV file block by block, using the format and chunks of a given WAVFile
+    All chunks of the given WAVFile other than data (e.g. LIST, bext, cue) are copied unchanged, the samples
+    are written in between with write_block. The sizes in the header are set when closing the writer.
+    The file is first written next to the target and replaces it on close, so a WAVFile can be written
+    to the file it was read from. An RF64 file (with ds64 chunk) is written if the given WAVFile is an RF64
+    file or if its size exceeds RF64_THRESHOLD, since 32-bit sizes cannot describe files larger than 4 GB.
+    Usage:
+        with WAVStreamWriter(filename, wav_file) as writer:
+            for block in wav_file.iter_blocks(block_samples):
+                writer.write_block(block)
+    """
+
+    # Number of bytes to copy at a time for chunks other than data
+    COPY_BUFFER_SIZE = 2 ** 20
+    # Largest RIFF size which can be written without RF64
+    RF64_THRESHOLD = 0xFFFFFFFF
+
+    def __init__(self, filename: Union[Path, str], wav_file: WAVFile, overwrite: bool = False):
+        filename = Path(filename)
+        if not overwrite and filename.exists():
+            raise FileExistsError
+        self._filename = filename
+        self._temporary_filename = filename.with_name(f".{filename.name}.tmp")
+        self._wav_file = wav_file
+        self._endianness = wav_file._get_endianness()
+        self._data_bytes_written = 0
+
+        riff_chunks = [chunk for chunk in wav_file.riff_chunks if chunk.chunk_id != b"ds64"]
+        data_index = [chunk.chunk_id for chunk in riff_chunks].index(b"data")
+        self._chunks_after_data = riff_chunks[data_index + 1:]
+
+        expected_riff_size = 4 + sum(8 + chunk.padded_size for chunk in riff_chunks)
+        self._rf64 = wav_file.header["ChunkID"] == b"RF64" or expected_riff_size > self.RF64_THRESHOLD
+        chunk_id = b"RF64" if self._rf64 else wav_file.header["ChunkID"]
+
+        self._file = open(self._temporary_filename, 'wb')
+        self._file.write(struct.pack(f"{self._endianness}4sI4s", chunk_id, 0, b"WAVE"))
+        if self._rf64:
+            self._write_riff_chunk_header(b"ds64", struct.calcsize("<QQQI"))
+            self._ds64_offset = self._file.tell()
+            self._file.write(struct.pack("<QQQI", 0, 0, 0, 0))
+        for chunk in riff_chunks[:data_index]:
+            self._copy_riff_chunk(chunk)
+        self._data_size_offset = self._file.tell() + 4
+        self._write_riff_chunk_header(b"data", 0)
+
+    def write_block(self, block: np.ndarray):
+        """ Append the given samples to the data chunk, they are converted to the format of the file """
+        self._wav_file._samples_to_bytes(block).tofile(self._file)
+        self._data_bytes_written += len(block) * self._wav_file._get_sample_width()
+
+    def _write_riff_chunk_header(self, chunk_id: bytes, size: int):
+        self._file.write(struct.pack(f"{self._endianness}4sI", chunk_id, size))
+
+    def _copy_riff_chunk(self, chunk: RiffChunk):
+        if chunk.chunk_id == b"fmt ":
+            fmt = self._wav_file._get_fmt_bytes()
+            self._write_riff_chunk_header(chunk.chunk_id, len(fmt))
+            self._file.write(fmt)
+            return
+
+        self._write_riff_chunk_header(chunk.chunk_id, chunk.size)
+        with open(self._wav_file._created_from_filename, 'rb') as source:
+            source.seek(chunk.offset)
+            for copied in range(0, chunk.padded_size, self.COPY_BUFFER_SIZE):
+                self._file.write(source.read(min(self.COPY_BUFFER_SIZE, chunk.padded_size - copied)))
+
+    def close(self):
+        if self._data_bytes_written & 1:
+            self._file.write(b"\0")
+        for chunk in self._chunks_after_data:
+            self._copy_riff_chunk(chunk)
+
+        riff_size = self._file.tell() - 8
+        data_size = self._data_bytes_written
+        if self._rf64:
+            sample_count = data_size // self._wav_file.header["BlockAlign"]
+            self._file.seek(self._ds64_offset)
+            self._file.write(struct.pack("<QQQ", riff_size, data_size, sample_count))
+            riff_size = data_size = WAVFile.RF64_SIZE_IN_DS64
+        elif riff_size > self.RF64_THRESHOLD:
+            self._discard()
+            raise ValueError(f"RIFF size {riff_size} exceeds 4 GB, write an RF64 file instead!")
+
+        self._file.seek(4)
+        self._file.write(struct.pack(f"{self._endianness}I", riff_size))
+        self._file.seek(self._data_size_offset)
+        self._file.write(struct.pack(f"{self._endianness}I", data_size))
+        self._file.close()
+        os.replace(self._temporary_filename, self._filename)
+
+    def __enter__(self) -> "WAVStreamWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._discard()
+
+    def _discard(self):
+        self._file.close()
+        self._temporary_filename.unlink()